@@ -1,3 +1,4 @@
+import os
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
@@ -13,6 +14,10 @@ target_metadata = Base.metadata
 # access to the values within the .ini file in use.
 config = context.config
 
+# 👇 та же БД, что у приложения (DATABASE_URL), alembic.ini — запасной вариант
+if os.getenv("DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"].replace("%", "%%"))
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
@@ -15,6 +15,8 @@ branch_labels = None
 depends_on = None
 
 def upgrade():
+    if not sa.inspect(op.get_bind()).has_table("invoices"):
+        return  # пустая БД: таблицы (уже с этими колонками) создаст a1a7ebb9b11e
     # новые колонки в invoices
     op.add_column("invoices", sa.Column("seller_employee_id", sa.Integer(), nullable=True))
     op.add_column("invoices", sa.Column("seller_name", sa.String(), nullable=True))
@@ -0,0 +1,30 @@
+"""indexes for invoice lists
+
+Revision ID: 5b0e6c2d9f41
+Revises: a1a7ebb9b11e
+Create Date: 2026-10-19 11:20:00.000000
+
+Списки накладных читают invoices по user_id и позиции по invoice_id — обоих
+индексов не было (seq scan на каждый список, LATERAL по позициям — на каждую
+накладную). Индексы строятся CONCURRENTLY, без блокировки записи.
+"""
+from alembic import op
+
+revision = '5b0e6c2d9f41'
+down_revision = 'a1a7ebb9b11e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index("ix_invoices_user_id_id", "invoices", ["user_id", "id"],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index("ix_items_invoice_id", "items", ["invoice_id"],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_items_invoice_id", table_name="items", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_invoices_user_id_id", table_name="invoices", postgresql_concurrently=True, if_exists=True)
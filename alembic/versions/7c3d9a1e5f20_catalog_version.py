@@ -0,0 +1,34 @@
+"""catalog version for product delta sync
+
+Revision ID: 7c3d9a1e5f20
+Revises: 5b0e6c2d9f41
+Create Date: 2026-10-19 14:00:00.000000
+
+users.catalog_version — счётчик версий номенклатуры арендатора,
+products.catalog_version — версия последнего изменения товара.
+Колонки с константным DEFAULT добавляются без перезаписи таблиц;
+индекс для /products/changes строится CONCURRENTLY.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '7c3d9a1e5f20'
+down_revision = '5b0e6c2d9f41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("users", sa.Column("catalog_version", sa.BigInteger(), nullable=False, server_default="0"))
+    op.add_column("products", sa.Column("catalog_version", sa.BigInteger(), nullable=False, server_default="0"))
+    with op.get_context().autocommit_block():
+        op.create_index("ix_products_user_id_catalog_version", "products", ["user_id", "catalog_version"],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_products_user_id_catalog_version", table_name="products",
+                      postgresql_concurrently=True, if_exists=True)
+    op.drop_column("products", "catalog_version")
+    op.drop_column("users", "catalog_version")
@@ -0,0 +1,67 @@
+"""unique product name per tenant
+
+Revision ID: 9e4b2f7a0c13
+Revises: 7c3d9a1e5f20
+Create Date: 2026-10-19 16:00:00.000000
+
+product_name_key(name) — ключ названия товара: пробелы по краям и повторные
+пробелы убраны, ё → е, нижний регистр. Дубликаты по ключу в пределах
+арендатора сливаются в товар с наименьшим id (цена — последняя изменённая),
+затем строится уникальный индекс (user_id, product_name_key(name)).
+Слияние и индекс — в одной транзакции под SHARE ROW EXCLUSIVE: чтение
+номенклатуры не блокируется, а новый дубль не вставится между слиянием и индексом.
+"""
+from alembic import op
+
+revision = '9e4b2f7a0c13'
+down_revision = '7c3d9a1e5f20'
+branch_labels = None
+depends_on = None
+
+
+NAME_KEY_FUNCTION = r"""
+CREATE OR REPLACE FUNCTION product_name_key(name text) RETURNS text
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+AS $$ SELECT lower(btrim(regexp_replace(translate(name, 'Ёё', 'Ее'), '\s+', ' ', 'g'))) $$
+"""
+
+
+def upgrade():
+    op.execute(NAME_KEY_FUNCTION)
+    op.execute("LOCK TABLE products IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("""
+        CREATE TEMP TABLE product_dups ON COMMIT DROP AS
+        SELECT id,
+               min(id) OVER g AS keep_id,
+               first_value(last_price) OVER (g ORDER BY updated_at DESC NULLS LAST, id DESC) AS last_price,
+               max(updated_at) OVER g AS updated_at
+        FROM (
+            SELECT id, user_id, product_name_key(name) AS name_key, last_price, updated_at,
+                   count(*) OVER (PARTITION BY user_id, product_name_key(name)) AS n
+            FROM products
+        ) p
+        WHERE n > 1
+        WINDOW g AS (PARTITION BY user_id, name_key)
+    """)
+    # новая версия номенклатуры затронутым арендаторам: ETag и дельты увидят слияние
+    op.execute("""
+        WITH bumped AS (
+            UPDATE users u SET catalog_version = u.catalog_version + 1
+            WHERE u.id IN (SELECT p.user_id FROM products p JOIN product_dups d ON d.id = p.id)
+            RETURNING u.id, u.catalog_version
+        )
+        UPDATE products p
+        SET last_price = d.last_price, updated_at = d.updated_at, catalog_version = b.catalog_version
+        FROM product_dups d, bumped b
+        WHERE p.id = d.id AND d.id = d.keep_id AND b.id = p.user_id
+    """)
+    op.execute("DELETE FROM products WHERE id IN (SELECT id FROM product_dups WHERE id <> keep_id)")
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_products_user_id_name_key
+        ON products (user_id, product_name_key(name))
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ux_products_user_id_name_key")
+    op.execute("DROP FUNCTION IF EXISTS product_name_key(text)")
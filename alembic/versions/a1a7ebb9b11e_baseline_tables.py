@@ -0,0 +1,134 @@
+"""baseline tables (schema only via alembic)
+
+Revision ID: a1a7ebb9b11e
+Revises: 213e2bd3314d
+Create Date: 2026-10-19 10:40:00.000000
+
+Раньше часть таблиц создавал Base.metadata.create_all() при старте приложения
+(employees, products, feedbacks и исходные users/clients/invoices/items).
+Теперь схема — только миграции: здесь создаём то, чего в БД ещё нет.
+На существующей БД миграция ничего не делает.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'a1a7ebb9b11e'
+down_revision = '213e2bd3314d'
+branch_labels = None
+depends_on = None
+
+
+def _missing(name: str) -> bool:
+    return not sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if _missing("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("company", sa.String(), nullable=True),
+            sa.Column("email", sa.String(), nullable=False, unique=True),
+            sa.Column("phone", sa.String(), nullable=False, unique=True),
+            sa.Column("password_hash", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("plan", sa.String(), nullable=True),
+            sa.Column("plan_expires", sa.DateTime(), nullable=True),
+            sa.Column("payment_status", sa.String(), nullable=True),
+            sa.Column("terms_accepted_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+
+    if _missing("clients"):
+        op.create_table(
+            "clients",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("phone", sa.String(), nullable=False, unique=True),
+        )
+        op.create_index("ix_clients_id", "clients", ["id"])
+
+    if _missing("employees"):
+        op.create_table(
+            "employees",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("phone", sa.String(), nullable=False, unique=True),
+            sa.Column("password_hash", sa.String(), nullable=False),
+            sa.Column("is_blocked", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_employees_id", "employees", ["id"])
+
+    if _missing("invoices"):
+        op.create_table(
+            "invoices",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("client", sa.String(), nullable=False),
+            sa.Column("amount", sa.Integer(), nullable=False),
+            sa.Column("paid_amount", sa.Integer(), nullable=True),
+            sa.Column("status", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+            sa.Column("invoice_number", sa.String(), nullable=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("seller_employee_id", sa.Integer(), nullable=True),
+            sa.Column("seller_name", sa.String(), nullable=True),
+            sa.ForeignKeyConstraint(["seller_employee_id"], ["employees.id"],
+                                    name="fk_invoices_seller_employee", ondelete="SET NULL"),
+        )
+        op.create_index("ix_invoices_id", "invoices", ["id"])
+        op.create_index("ix_invoices_invoice_number", "invoices", ["invoice_number"], unique=True)
+        op.create_index("ix_invoices_seller_employee_id", "invoices", ["seller_employee_id"])
+
+    if _missing("items"):
+        op.create_table(
+            "items",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("invoice_id", sa.Integer(), sa.ForeignKey("invoices.id"), nullable=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("price", sa.Integer(), nullable=False),
+        )
+        op.create_index("ix_items_id", "items", ["id"])
+
+    if _missing("subscriptions"):
+        op.create_table(
+            "subscriptions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("type", sa.String(), nullable=True),
+            sa.Column("start_date", sa.DateTime(), nullable=True),
+            sa.Column("end_date", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_subscriptions_id", "subscriptions", ["id"])
+
+    if _missing("feedbacks"):
+        op.create_table(
+            "feedbacks",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("name", sa.String(), nullable=True),
+            sa.Column("message", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_feedbacks_id", "feedbacks", ["id"])
+
+    if _missing("products"):
+        op.create_table(
+            "products",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("last_price", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_products_id", "products", ["id"])
+
+
+def downgrade():
+    # базовые таблицы не удаляем: на существующих БД их создала не эта миграция
+    pass
@@ -0,0 +1,61 @@
+"""append-only payments ledger
+
+Revision ID: a3e9c7d1f5b8
+Revises: f1d6b3a8c5e2
+Create Date: 2026-10-20 14:00:00.000000
+
+payments — оплаты накладных, только вставки. invoices.paid_amount и status
+остаются итогом: POST /invoices/{id}/payments увеличивает их тем же
+UPDATE, что блокирует строку накладной, — параллельные оплаты одной
+накладной идут по очереди, читателям ничего суммировать не нужно.
+Начальный журнал — по одной оплате на накладную с paid_amount > 0 (на
+момент создания накладной), чтобы сумма журнала сходилась с paid_amount.
+status раньше приходил от клиента как есть — выводится из paid_amount и
+amount по тому же правилу, что при записи (routes/invoice.invoice_status).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'a3e9c7d1f5b8'
+down_revision = 'f1d6b3a8c5e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "payments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("invoice_id", sa.Integer(), sa.ForeignKey("invoices.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("employee_id", sa.Integer(), sa.ForeignKey("employees.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("amount", sa.Integer(), nullable=False),
+        sa.Column("paid_at", sa.DateTime(), nullable=False),
+    )
+    op.execute("LOCK TABLE invoices IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("""
+        INSERT INTO payments (invoice_id, user_id, employee_id, amount, paid_at)
+        SELECT id, user_id, seller_employee_id, paid_amount, COALESCE(created_at, now() AT TIME ZONE 'utc')
+        FROM invoices
+        WHERE paid_amount > 0
+        ORDER BY id
+    """)
+    op.execute("""
+        UPDATE invoices SET status = s.status
+        FROM (
+            SELECT id,
+                   CASE
+                       WHEN COALESCE(paid_amount, 0) = 0 THEN 'не оплачен'
+                       WHEN paid_amount >= amount THEN 'оплачен'
+                       ELSE 'частично оплачен'
+                   END AS status
+            FROM invoices
+        ) s
+        WHERE invoices.id = s.id AND invoices.status IS DISTINCT FROM s.status
+    """)
+    op.create_index("ix_payments_invoice_id_id", "payments", ["invoice_id", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_payments_invoice_id_id", table_name="payments")
+    op.drop_table("payments")
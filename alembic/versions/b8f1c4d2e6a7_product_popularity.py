@@ -0,0 +1,65 @@
+"""product sale counters and popularity for suggest
+
+Revision ID: b8f1c4d2e6a7
+Revises: 9e4b2f7a0c13
+Create Date: 2026-10-19 18:00:00.000000
+
+products.sale_count / last_sold_at / popularity. popularity — затухающий
+счёт продаж в лог-шкале с «прямым» затуханием: продажа в момент t добавляет
+exp(t / τ) (t — от эпохи 2025-01-01, τ = период полураспада / ln 2), хранится
+ln суммы. Порядок по такому счёту со временем не меняется, поэтому его можно
+держать в индексе и не пересчитывать. Бэкфилл — по позициям прошлых накладных
+(одна накладная — одна продажа), с периодом полураспада по умолчанию (30 дней).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'b8f1c4d2e6a7'
+down_revision = '9e4b2f7a0c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("products", sa.Column("sale_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("products", sa.Column("last_sold_at", sa.DateTime(), nullable=True))
+    op.add_column("products", sa.Column("popularity", sa.Float(), nullable=False, server_default="0"))
+    op.execute("""
+        UPDATE products p
+        SET sale_count = s.n, last_sold_at = s.last_sold_at, popularity = s.popularity
+        FROM (
+            SELECT user_id, name_key, count(*) AS n, max(created_at) AS last_sold_at,
+                   max(max_w) + ln(sum(exp(w - max_w))) AS popularity
+            FROM (
+                SELECT user_id, name_key, created_at, w,
+                       max(w) OVER (PARTITION BY user_id, name_key) AS max_w
+                FROM (
+                    SELECT DISTINCT i.id, i.user_id, product_name_key(x.name) AS name_key, i.created_at,
+                           extract(epoch FROM i.created_at - timestamp '2025-01-01') * ln(2) / (30 * 86400) AS w
+                    FROM items x
+                    JOIN invoices i ON i.id = x.invoice_id
+                    WHERE i.created_at IS NOT NULL
+                ) sales
+            ) weighted
+            GROUP BY user_id, name_key
+        ) s
+        WHERE p.user_id = s.user_id AND product_name_key(p.name) = s.name_key
+    """)
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_user_id_name_key_prefix
+            ON products (user_id, product_name_key(name) text_pattern_ops)
+        """)
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_user_id_popularity
+            ON products (user_id, popularity DESC)
+        """)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_products_user_id_popularity")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_products_user_id_name_key_prefix")
+    op.drop_column("products", "popularity")
+    op.drop_column("products", "last_sold_at")
+    op.drop_column("products", "sale_count")
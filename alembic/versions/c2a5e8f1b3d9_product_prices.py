@@ -0,0 +1,37 @@
+"""append-only product price history
+
+Revision ID: c2a5e8f1b3d9
+Revises: b8f1c4d2e6a7
+Create Date: 2026-10-19 20:00:00.000000
+
+product_prices — история цен: строка только когда цена меняется (и при
+создании товара). Без суррогатного id: первичный ключ (product_id, changed_at)
+и есть индекс для выборок по диапазону. products.last_price остаётся кэшем
+последней цены. Начальная история — текущая цена каждого товара.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'c2a5e8f1b3d9'
+down_revision = 'b8f1c4d2e6a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "product_prices",
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("changed_at", sa.DateTime(), nullable=False),
+        sa.Column("price", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("product_id", "changed_at", name="pk_product_prices"),
+    )
+    op.execute("""
+        INSERT INTO product_prices (product_id, changed_at, price)
+        SELECT id, COALESCE(updated_at, created_at, now() AT TIME ZONE 'utc'), last_price
+        FROM products
+    """)
+
+
+def downgrade():
+    op.drop_table("product_prices")
@@ -0,0 +1,29 @@
+"""never-sold products sort after any sale in suggest
+
+Revision ID: c6e2a9d4f7b1
+Revises: a3e9c7d1f5b8
+Create Date: 2026-10-21 10:00:00.000000
+
+products.popularity — ln суммы весов продаж, и 0 в ней — это «одна продажа
+в момент эпохи 2025-01-01», а не «продаж нет»: непроданные товары обгоняли
+товары, все продажи которых были до эпохи. Пустая сумма — ln 0 = -Infinity:
+такие товары в подсказках последние, а сложение в лог-шкале (greatest +
+ln(1 + exp(-|a - b|))) с -Infinity даёт вес первой продажи без особых
+случаев. Индекс (user_id, popularity DESC) остаётся как есть.
+"""
+from alembic import op
+
+revision = 'c6e2a9d4f7b1'
+down_revision = 'a3e9c7d1f5b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE products ALTER COLUMN popularity SET DEFAULT '-Infinity'")
+    op.execute("UPDATE products SET popularity = '-Infinity' WHERE sale_count = 0")
+
+
+def downgrade():
+    op.execute("UPDATE products SET popularity = 0 WHERE popularity = '-Infinity'")
+    op.execute("ALTER TABLE products ALTER COLUMN popularity SET DEFAULT 0")
@@ -20,6 +20,8 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     """Upgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("invoices"):
+        return  # пустая БД: таблицы создаст a1a7ebb9b11e
     # ### commands auto generated by Alembic - please adjust! ###
     op.alter_column('invoices', 'user_id',
                existing_type=sa.INTEGER(),
@@ -0,0 +1,36 @@
+"""items.product_id
+
+Revision ID: d7b3f9a2c4e1
+Revises: c2a5e8f1b3d9
+Create Date: 2026-10-19 22:00:00.000000
+
+Ссылка позиции накладной на товар номенклатуры. Новые позиции получают её
+при создании накладной; старые заполняет задача tasks.backfill_item_products
+(очередь maintenance, пачками по id) — миграция таблицу items не переписывает:
+    celery -A celery_app call tasks.backfill_item_products
+Колонка без значения по умолчанию, внешний ключ на пустой колонке проверяется
+мгновенно; индекс — CONCURRENTLY.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'd7b3f9a2c4e1'
+down_revision = 'c2a5e8f1b3d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("items", sa.Column("product_id", sa.Integer(), nullable=True))
+    op.create_foreign_key("items_product_id_fkey", "items", "products", ["product_id"], ["id"],
+                          ondelete="SET NULL")
+    with op.get_context().autocommit_block():
+        op.create_index("ix_items_product_id", "items", ["product_id"],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_items_product_id", table_name="items", postgresql_concurrently=True, if_exists=True)
+    op.drop_constraint("items_product_id_fkey", "items", type_="foreignkey")
+    op.drop_column("items", "product_id")
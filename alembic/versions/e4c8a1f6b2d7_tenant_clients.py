@@ -0,0 +1,128 @@
+"""per-tenant clients keyed by normalized phone
+
+Revision ID: e4c8a1f6b2d7
+Revises: d7b3f9a2c4e1
+Create Date: 2026-10-20 10:00:00.000000
+
+Клиенты становятся справочником арендатора: clients.user_id и phone_key —
+последние 10 цифр телефона (см. routes.auth.phone_key), уникальность
+(user_id, phone_key) вместо глобальной уникальности phone.
+Глобальный клиент, у которого накладные нескольких арендаторов, делится:
+исходная строка остаётся первому арендатору, остальным — копии, их накладные
+переводятся на копию. Затем дубли по ключу внутри арендатора («+7 701…» и
+«8701…») сливаются в строку с наименьшим id. Клиенты без накладных остаются
+без арендатора — в поиск они не попадают.
+Всё — в одной транзакции под SHARE ROW EXCLUSIVE на clients и invoices:
+чтение не блокируется, новые накладные ждут конца миграции.
+Поиск по имени — триграммный индекс, если pg_trgm можно подключить; без
+расширения поиск работает, но перебирает клиентов арендатора.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'e4c8a1f6b2d7'
+down_revision = 'd7b3f9a2c4e1'
+branch_labels = None
+depends_on = None
+
+
+PHONE_KEY_SQL = r"right(regexp_replace(phone, '\D', '', 'g'), 10)"
+
+
+def upgrade():
+    op.add_column("clients", sa.Column("user_id", sa.Integer(), nullable=True))
+    op.add_column("clients", sa.Column("phone_key", sa.String(), nullable=True))
+    op.create_foreign_key("clients_user_id_fkey", "clients", "users", ["user_id"], ["id"])
+    op.execute("LOCK TABLE clients, invoices IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("ALTER TABLE clients DROP CONSTRAINT IF EXISTS clients_phone_key")
+
+    # деление: пары (клиент, арендатор); первый арендатор (по первой накладной)
+    # сохраняет строку, остальным — новые id
+    op.execute("""
+        CREATE TEMP TABLE client_split ON COMMIT DROP AS
+        SELECT client_id, user_id,
+               row_number() OVER (PARTITION BY client_id ORDER BY min(id)) AS rn,
+               NULL::integer AS new_id
+        FROM invoices
+        GROUP BY client_id, user_id
+    """)
+    op.execute("UPDATE client_split SET new_id = nextval(pg_get_serial_sequence('clients', 'id')) WHERE rn > 1")
+    op.execute("""
+        UPDATE clients c SET user_id = s.user_id
+        FROM client_split s
+        WHERE s.client_id = c.id AND s.rn = 1
+    """)
+    op.execute("""
+        INSERT INTO clients (id, name, phone, user_id)
+        SELECT s.new_id, c.name, c.phone, s.user_id
+        FROM client_split s
+        JOIN clients c ON c.id = s.client_id
+        WHERE s.rn > 1
+    """)
+    op.execute("""
+        UPDATE invoices i SET client_id = s.new_id
+        FROM client_split s
+        WHERE i.client_id = s.client_id AND i.user_id = s.user_id AND s.rn > 1
+    """)
+
+    op.execute(f"UPDATE clients SET phone_key = {PHONE_KEY_SQL}")
+    op.alter_column("clients", "phone_key", nullable=False)
+
+    # слияние дублей по ключу внутри арендатора
+    op.execute("""
+        CREATE TEMP TABLE client_dups ON COMMIT DROP AS
+        SELECT id, keep_id
+        FROM (
+            SELECT id, min(id) OVER (PARTITION BY user_id, phone_key) AS keep_id
+            FROM clients
+            WHERE user_id IS NOT NULL
+        ) c
+        WHERE id <> keep_id
+    """)
+    op.execute("""
+        UPDATE invoices i SET client_id = d.keep_id
+        FROM client_dups d
+        WHERE i.client_id = d.id
+    """)
+    op.execute("DELETE FROM clients WHERE id IN (SELECT id FROM client_dups)")
+
+    # text_pattern_ops: тот же индекс отвечает на поиск по началу номера
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_clients_user_id_phone_key
+        ON clients (user_id, phone_key text_pattern_ops)
+    """)
+    # расширение ставит не каждый пользователь БД — без него обходимся
+    op.execute("""
+        DO $$
+        BEGIN
+            CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        EXCEPTION WHEN OTHERS THEN
+            RAISE NOTICE 'pg_trgm недоступно (%), поиск клиентов без триграммного индекса', SQLERRM;
+        END
+        $$
+    """)
+    has_trgm = op.get_bind().execute(
+        sa.text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+    ).scalar()
+
+    with op.get_context().autocommit_block():
+        op.create_index("ix_invoices_client_id", "invoices", ["client_id"],
+                        postgresql_concurrently=True, if_not_exists=True)
+        if has_trgm:
+            op.execute("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_clients_name_trgm
+                ON clients USING gin (lower(name) gin_trgm_ops)
+            """)
+
+
+def downgrade():
+    # деление и слияние клиентов не откатываются: возвращаются только схема
+    # и глобальная уникальность телефона (если дублей между арендаторами нет)
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_clients_name_trgm")
+        op.drop_index("ix_invoices_client_id", table_name="invoices", postgresql_concurrently=True, if_exists=True)
+    op.execute("DROP INDEX IF EXISTS ux_clients_user_id_phone_key")
+    op.drop_constraint("clients_user_id_fkey", "clients", type_="foreignkey")
+    op.drop_column("clients", "phone_key")
+    op.drop_column("clients", "user_id")
+    op.create_unique_constraint("clients_phone_key", "clients", ["phone"])
@@ -0,0 +1,58 @@
+"""client balances and invoice amounts
+
+Revision ID: f1d6b3a8c5e2
+Revises: e4c8a1f6b2d7
+Create Date: 2026-10-20 12:00:00.000000
+
+client_balances — строка на клиента арендатора: выставлено, оплачено, долг
+(outstanding = invoiced - paid, вычисляемая колонка) и время последней
+операции. Меняется в транзакции создания накладной и оплаты (balances.py),
+при чтении ничего не агрегируется. Частичный индекс (user_id, outstanding DESC)
+WHERE outstanding > 0 — список должников.
+invoices.amount раньше не заполнялся: сумма позиций считается здесь же,
+балансы строятся по ней. Под SHARE ROW EXCLUSIVE на invoices: новые
+накладные ждут, пока балансы не построены, иначе в них их бы не было.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'f1d6b3a8c5e2'
+down_revision = 'e4c8a1f6b2d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "client_balances",
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("invoiced", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("paid", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("outstanding", sa.BigInteger(), sa.Computed("invoiced - paid", persisted=True)),
+        sa.Column("last_activity_at", sa.DateTime(), nullable=True),
+    )
+    op.execute("LOCK TABLE invoices IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("""
+        UPDATE invoices i SET amount = s.total
+        FROM (
+            SELECT invoice_id, sum(quantity::bigint * price) AS total
+            FROM items
+            GROUP BY invoice_id
+        ) s
+        WHERE i.id = s.invoice_id AND i.amount IS DISTINCT FROM s.total
+    """)
+    op.execute("""
+        INSERT INTO client_balances (client_id, user_id, invoiced, paid, last_activity_at)
+        SELECT client_id, user_id, sum(amount), sum(COALESCE(paid_amount, 0)), max(created_at)
+        FROM invoices
+        GROUP BY client_id, user_id
+    """)
+    op.create_index("ix_client_balances_debtors", "client_balances",
+                    ["user_id", sa.text("outstanding DESC")],
+                    postgresql_where=sa.text("outstanding > 0"))
+
+
+def downgrade():
+    op.drop_index("ix_client_balances_debtors", table_name="client_balances")
+    op.drop_table("client_balances")
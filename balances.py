@@ -0,0 +1,31 @@
+# balances.py
+#
+# Балансы клиентов (client_balances): выставлено, оплачено, долг.
+# Строка меняется одним INSERT ... ON CONFLICT DO UPDATE в той же транзакции,
+# что и накладная/оплата, — баланс всегда согласован с накладными, а список
+# должников (reads.debtors) читается по индексу без агрегации.
+# Параллельные операции одного клиента сериализуются на блокировке его строки.
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from models import ClientBalance
+
+
+def apply(db: Session, owner_id: int, client_id: int, at: datetime,
+          invoiced: int = 0, paid: int = 0):
+    """Прибавляет суммы к балансу клиента (создаёт строку при первой операции)."""
+    stmt = pg_insert(ClientBalance).values(
+        client_id=client_id, user_id=owner_id, invoiced=invoiced, paid=paid, last_activity_at=at,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[ClientBalance.client_id],
+        set_={
+            "invoiced": ClientBalance.invoiced + stmt.excluded.invoiced,
+            "paid": ClientBalance.paid + stmt.excluded.paid,
+            "last_activity_at": func.greatest(ClientBalance.last_activity_at, stmt.excluded.last_activity_at),
+        },
+    ))
+
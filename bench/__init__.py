@@ -0,0 +1,2 @@
+# bench — бенчмарки и нагрузочные сценарии (в прод не импортируется).
+# Запуск модулей: python -m bench.<имя> --help
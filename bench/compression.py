@@ -0,0 +1,48 @@
+"""Сжатие ответа GET /invoices: степень сжатия и CPU по кодировкам и уровням.
+
+    python -m bench.compression [--invoices 5000] [--repeat 5]
+
+Помогает выбрать GZIP_LEVEL / BROTLI_LEVEL / ZSTD_LEVEL для compression.py.
+"""
+import argparse
+import statistics
+import time
+
+from bench.serialization import make_invoices
+from compression import COMPRESSORS, LEVELS
+from responses import FastJSONResponse
+
+LEVEL_GRID = {
+    "gzip": (1, 3, 5, 6, 9),
+    "br": (1, 3, 4, 5, 7, 11),
+    "zstd": (1, 3, 6, 9, 15),
+}
+
+
+def _cpu_ms(factory, level: int, body: bytes, repeat: int):
+    times, out = [], b""
+    for _ in range(repeat):
+        start = time.thread_time()
+        out = factory(level).compress(body, final=True)
+        times.append((time.thread_time() - start) * 1000)
+    return statistics.median(times), len(out)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--invoices", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    body = FastJSONResponse(make_invoices(args.invoices)).body
+    print(f"тело: {len(body)} байт; текущие уровни: {LEVELS}")
+    print(f"{'encoding':<6} {'level':>5} {'bytes':>10} {'ratio':>7} {'saved':>10} {'cpu ms':>8} {'MB/s':>8}")
+    for name, factory in COMPRESSORS.items():
+        for level in LEVEL_GRID[name]:
+            cpu, size = _cpu_ms(factory, level, body, args.repeat)
+            mbps = len(body) / 1e6 / (cpu / 1000) if cpu else float("inf")
+            print(f"{name:<6} {level:>5} {size:>10} {len(body) / size:>7.1f} {len(body) - size:>10} {cpu:>8.1f} {mbps:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Генератор синтетических данных: арендаторы с сотрудниками, клиентами, товарами и накладными.
+
+    python -m bench.datagen --url postgresql://localhost/enote_bench \\
+        --tenants 200 --invoices-per-tenant 2000 --items-per-invoice 5 --reset
+
+Все таблицы заполняются через COPY порциями, память не растёт с масштабом
+(десятки миллионов позиций). Размеры арендаторов распределены по Парето —
+несколько крупных и много мелких, как в проде. Результат детерминирован по --seed.
+Манифест (телефоны, пароль, примеры товаров/клиентов) пишется в --manifest
+и используется bench.loadtest. Схема должна быть создана заранее (alembic upgrade head).
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import psycopg2
+
+from pgcopy import copy_rows
+
+PASSWORD = "bench-password"
+RESULTS_DIR = Path(__file__).parent / "results"
+
+WORDS = [
+    "Молоко", "Кефир", "Сметана", "Творог", "Хлеб", "Батон", "Сахар", "Соль", "Мука", "Рис",
+    "Гречка", "Масло", "Чай", "Кофе", "Сок", "Вода", "Печенье", "Конфеты", "Макароны", "Сыр",
+]
+ADJECTIVES = ["домашний", "отборный", "классический", "фермерский", "премиум", "эконом", "детский", "мягкий"]
+UNITS = ["0,5 л", "1 л", "1 кг", "500 г", "250 г", "2 кг", "10 шт", "упак."]
+FIRST_NAMES = ["Айгерим", "Ерлан", "Дана", "Нурлан", "Ольга", "Сергей", "Асель", "Тимур", "Жанна", "Арман"]
+LAST_NAMES = ["Ахметов", "Иванова", "Садыков", "Ким", "Петров", "Жумабаева", "Ли", "Смагулов"]
+STATUSES = ["оплачен", "не оплачен", "частично оплачен"]
+TABLES = ["items", "invoices", "products", "clients", "employees", "subscriptions", "feedbacks", "users"]
+
+
+def tenant_weights(n: int, rnd: random.Random, alpha: float = 1.3):
+    raw = [rnd.paretovariate(alpha) for _ in range(n)]
+    total = sum(raw)
+    return [w * n / total for w in raw]
+
+
+def password_hash() -> str:
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto").hash(PASSWORD)
+
+
+def next_id(cur, table: str) -> int:
+    cur.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+    return cur.fetchone()[0]
+
+
+def fix_sequences(cur):
+    for table in TABLES:
+        cur.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"GREATEST((SELECT COALESCE(MAX(id), 0) FROM {table}), 1))"
+        )
+
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rnd = random.Random(args.seed)
+        self.hash = password_hash()
+        self.now = datetime.utcnow().replace(microsecond=0)
+        self.manifest = {"password": PASSWORD, "tenants": []}
+        self.counts = {t: 0 for t in TABLES}
+
+    def product_name(self, i: int) -> str:
+        r = self.rnd
+        return f"{r.choice(WORDS)} {r.choice(ADJECTIVES)} {r.choice(UNITS)} #{i}"
+
+    def person(self) -> str:
+        return f"{self.rnd.choice(FIRST_NAMES)} {self.rnd.choice(LAST_NAMES)}"
+
+    def run(self, conn):
+        a = self.args
+        cur = conn.cursor()
+        if a.reset:
+            cur.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+        ids = {t: next_id(cur, t) for t in ("users", "employees", "clients", "products", "invoices", "items")}
+        weights = tenant_weights(a.tenants, self.rnd)
+
+        users, subs, employees = [], [], []
+        tenants = []
+        for t in range(a.tenants):
+            uid = ids["users"] + t
+            phone = f"+7700{uid:07d}"
+            users.append((uid, f"Владелец {uid}", f"ТОО Бенч {uid}", f"owner{uid}@bench.local", phone,
+                          self.hash, self.now, "free", "нет данных", self.now))
+            subs.append((uid, "free", self.now, self.now + timedelta(days=14)))
+            emp_phones = []
+            for _ in range(a.employees_per_tenant):
+                eid = ids["employees"] + len(employees)
+                emp_phone = f"+7701{eid:07d}"
+                employees.append((eid, uid, self.person(), emp_phone, self.hash, False, self.now))
+                emp_phones.append((eid, emp_phone))
+            tenants.append({"user_id": uid, "phone": phone, "employees": emp_phones, "weight": weights[t]})
+
+        copy_rows(cur, "users", ["id", "name", "company", "email", "phone", "password_hash",
+                                 "created_at", "plan", "payment_status", "terms_accepted_at"], users)
+        copy_rows(cur, "subscriptions", ["user_id", "type", "start_date", "end_date"], subs)
+        copy_rows(cur, "employees", ["id", "owner_id", "name", "phone", "password_hash",
+                                     "is_blocked", "created_at"], employees)
+        self.counts["users"] += len(users)
+        self.counts["employees"] += len(employees)
+        conn.commit()
+
+        client_id, product_id = ids["clients"], ids["products"]
+        invoice_id, item_id = ids["invoices"], ids["items"]
+        for tenant in tenants:
+            scale = tenant["weight"]
+            n_clients = max(1, int(a.clients_per_tenant * scale))
+            n_products = max(1, int(a.products_per_tenant * scale))
+            n_invoices = max(1, int(a.invoices_per_tenant * scale))
+
+            clients = []
+            for i in range(n_clients):
+                phone = f"+77{client_id + i:09d}"
+                # phone_key — последние 10 цифр, как routes.auth.phone_key
+                clients.append((client_id + i, self.person(), phone, tenant["user_id"], phone[-10:]))
+            products = []
+            for i in range(n_products):
+                pid = product_id + i
+                products.append((pid, tenant["user_id"], self.product_name(pid),
+                                 self.rnd.randint(100, 20000), self.now, self.now))
+            copy_rows(cur, "clients", ["id", "name", "phone", "user_id", "phone_key"], clients)
+            copy_rows(cur, "products", ["id", "user_id", "name", "last_price", "created_at", "updated_at"], products)
+            self.counts["clients"] += len(clients)
+            self.counts["products"] += len(products)
+
+            invoice_id, item_id = self._invoices(cur, tenant, clients, products, n_invoices, invoice_id, item_id)
+            # журнал оплат и балансы клиентов приложение ведёт при записи, COPY их не трогает
+            cur.execute("""
+                INSERT INTO payments (invoice_id, user_id, employee_id, amount, paid_at)
+                SELECT id, user_id, seller_employee_id, paid_amount, created_at
+                FROM invoices WHERE user_id = %s AND paid_amount > 0
+            """, (tenant["user_id"],))
+            cur.execute("""
+                INSERT INTO client_balances (client_id, user_id, invoiced, paid, last_activity_at)
+                SELECT client_id, user_id, sum(amount), sum(paid_amount), max(created_at)
+                FROM invoices WHERE user_id = %s
+                GROUP BY client_id, user_id
+            """, (tenant["user_id"],))
+            conn.commit()
+
+            tenant.update({
+                "clients": [c[2] for c in clients[:20]],
+                "products": [p[2] for p in products[:50]],
+            })
+            del tenant["weight"]
+            self.manifest["tenants"].append(tenant)
+            client_id += n_clients
+            product_id += n_products
+
+        fix_sequences(cur)
+        conn.commit()
+        conn.autocommit = True
+        cur.execute("ANALYZE")
+
+    def _invoices(self, cur, tenant, clients, products, n_invoices, invoice_id, item_id):
+        a = self.args
+        r = self.rnd
+        sellers = [(None, f"Владелец {tenant['user_id']}")] + [(eid, f"Сотрудник {eid}") for eid, _ in tenant["employees"]]
+        done = 0
+        while done < n_invoices:
+            batch = min(a.batch, n_invoices - done)
+            invoices, items = [], []
+            for _ in range(batch):
+                cid, cname = r.choice(clients)[:2]
+                seller_id, seller_name = r.choice(sellers)
+                created = self.now - timedelta(seconds=r.randint(0, a.days * 86400))
+                total = 0
+                for _ in range(max(1, int(r.expovariate(1 / a.items_per_invoice)) + 1)):
+                    _pid, _uid, pname, price, *_ = r.choice(products)
+                    qty = r.randint(1, 20)
+                    items.append((item_id, invoice_id, pname, qty, price))
+                    total += qty * price
+                    item_id += 1
+                status = r.choice(STATUSES)
+                paid = total if status == "оплачен" else (0 if status == "не оплачен" else total // 2)
+                invoices.append((invoice_id, cname, total, paid, status, created, cid,
+                                 f"№{cid:04d}/{created.year}/{invoice_id}", tenant["user_id"],
+                                 seller_id, seller_name))
+                invoice_id += 1
+            copy_rows(cur, "invoices", ["id", "client", "amount", "paid_amount", "status", "created_at",
+                                        "client_id", "invoice_number", "user_id", "seller_employee_id",
+                                        "seller_name"], invoices)
+            copy_rows(cur, "items", ["id", "invoice_id", "name", "quantity", "price"], items)
+            self.counts["invoices"] += len(invoices)
+            self.counts["items"] += len(items)
+            done += batch
+        return invoice_id, item_id
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--url", default=os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL"))
+    ap.add_argument("--tenants", type=int, default=50)
+    ap.add_argument("--employees-per-tenant", type=int, default=3)
+    ap.add_argument("--clients-per-tenant", type=int, default=200)
+    ap.add_argument("--products-per-tenant", type=int, default=500)
+    ap.add_argument("--invoices-per-tenant", type=int, default=1000)
+    ap.add_argument("--items-per-invoice", type=float, default=5)
+    ap.add_argument("--days", type=int, default=365, help="глубина истории накладных")
+    ap.add_argument("--batch", type=int, default=20000, help="накладных на одну порцию COPY")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--reset", action="store_true", help="TRUNCATE всех таблиц перед загрузкой")
+    ap.add_argument("--manifest", default=str(RESULTS_DIR / "manifest.json"))
+    args = ap.parse_args()
+    if not args.url:
+        ap.error("укажите --url или BENCH_DATABASE_URL")
+
+    started = time.perf_counter()
+    gen = Generator(args)
+    with psycopg2.connect(args.url) as conn:
+        gen.run(conn)
+    elapsed = time.perf_counter() - started
+
+    Path(args.manifest).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.manifest).write_text(json.dumps(gen.manifest, ensure_ascii=False, indent=1))
+    total = sum(gen.counts.values())
+    print(json.dumps(gen.counts, ensure_ascii=False))
+    print(f"{total} строк за {elapsed:.1f} с ({total / elapsed:,.0f} строк/с); манифест: {args.manifest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Список накладных: JSON в Python (reads.invoices + orjson) против JSON из Postgres.
+
+    python -m bench.json_agg                     # 50k накладных по 3 позиции
+    python -m bench.json_agg --rows 5000 --runs 10
+
+Данные — как в bench.read_path (транзакция откатывается). Меряем путь до готовых
+байт тела ответа: медиана времени, пик памяти Python (tracemalloc), размер тела.
+Заодно проверяем, что оба пути дают один и тот же документ.
+"""
+import argparse
+import gc
+import os
+import statistics
+import time
+import tracemalloc
+
+import orjson
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from bench.read_path import seed
+
+
+def python_path(conn, user_id):
+    import reads
+    db = Session(bind=conn)
+    try:
+        return orjson.dumps(reads.invoices(db, user_id))
+    finally:
+        db.close()
+
+
+def postgres_path(conn, user_id):
+    import reads
+    return b"".join(reads.invoices_json_chunks(conn, user_id))
+
+
+PATHS = [("python", python_path), ("postgres", postgres_path)]
+
+
+def run_once(conn, fn, user_id, trace: bool):
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        body = fn(conn, user_id)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+        return elapsed, peak, body
+    finally:
+        if trace:
+            tracemalloc.stop()
+
+
+def same_document(a: bytes, b: bytes) -> bool:
+    """created_at в Postgres всегда с микросекундами, в Python — без нулевых."""
+    da, db = orjson.loads(a), orjson.loads(b)
+    for x, y in zip(da, db):
+        x["created_at"] = x["created_at"][:19]
+        y["created_at"] = y["created_at"][:19]
+    return da == db
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--url", default=os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL"))
+    ap.add_argument("--rows", type=int, default=50000)
+    ap.add_argument("--items", type=int, default=3, help="позиций на накладную")
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+    if not args.url:
+        ap.error("укажите --url или BENCH_DATABASE_URL")
+    os.environ.setdefault("DATABASE_URL", args.url)
+
+    engine = create_engine(args.url)
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            user_id = seed(conn, args.rows, args.items)
+            print(f"{'path':<9} {'median ms':>10} {'rows/s':>10} {'peak MiB':>9} {'body KiB':>9}")
+            results = {}
+            for name, fn in PATHS:
+                run_once(conn, fn, user_id, trace=False)
+                times = [run_once(conn, fn, user_id, trace=False)[0] for _ in range(args.runs)]
+                _, peak, body = run_once(conn, fn, user_id, trace=True)
+                median = statistics.median(times)
+                results[name] = (median, peak, body)
+                print(f"{name:<9} {median * 1000:>10.1f} {args.rows / median:>10,.0f} "
+                      f"{peak / 2**20:>9.1f} {len(body) / 1024:>9.0f}")
+            py, pg = results["python"], results["postgres"]
+            print(f"postgres быстрее в {py[0] / pg[0]:.1f} раза; документы совпадают: {same_document(py[2], pg[2])}")
+        finally:
+            trans.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Нагрузочный прогон: смешанный трафик мобильного приложения против main:app.
+
+    python -m bench.loadtest --users 20 --duration 60 --save bench/results/run.json
+    python -m bench.loadtest --users 20 --duration 60 --compare bench/results/baseline.json
+
+По умолчанию приложение поднимается в процессе (httpx.ASGITransport), с --base-url
+бьём в запущенный сервер. Учётки и справочники берутся из манифеста bench.datagen.
+Отчёт: p50/p95/p99 и пропускная способность по каждому эндпоинту; --save пишет
+JSON-базу, --compare сравнивает с ней и завершается с кодом 1 при регрессии p95.
+Нужен httpx (pip install httpx).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# доли операций в трафике; stats — только у владельцев
+MIX = {
+    "me": 15,
+    "list_invoices": 25,
+    "create_invoice": 10,
+    "search_products": 35,
+    "stats": 13,
+    "login": 2,
+}
+
+
+def percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, name: str, seconds: float, ok: bool):
+        self.latencies[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+
+    def summary(self, wall: float) -> dict:
+        out = {}
+        for name, values in sorted(self.latencies.items()):
+            values.sort()
+            out[name] = {
+                "count": len(values),
+                "errors": self.errors[name],
+                "rps": len(values) / wall if wall else 0.0,
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+            }
+        return out
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, tenant: dict, password: str, owner: bool,
+                 rec: Recorder, rnd: random.Random):
+        self.client = client
+        self.tenant = tenant
+        self.password = password
+        self.owner = owner
+        self.rec = rec
+        self.rnd = rnd
+        self.headers = {}
+
+    async def call(self, name: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = await self.client.request(method, url, headers=self.headers, **kwargs)
+            ok = resp.status_code < 400
+        except httpx.HTTPError:
+            resp, ok = None, False
+        self.rec.add(name, time.perf_counter() - start, ok)
+        return resp
+
+    def phone(self) -> str:
+        if self.owner or not self.tenant["employees"]:
+            return self.tenant["phone"]
+        return self.rnd.choice(self.tenant["employees"])[1]
+
+    async def login(self):
+        self.headers = {}
+        resp = await self.call("login", "POST", "/login", json={"phone": self.phone(), "password": self.password})
+        if resp is not None and resp.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    async def step(self):
+        ops = [op for op in MIX if self.owner or op != "stats"]
+        op = self.rnd.choices(ops, weights=[MIX[o] for o in ops])[0]
+        if op == "login":
+            await self.login()
+        elif op == "me":
+            await self.call("me", "GET", "/me")
+        elif op == "list_invoices":
+            await self.call("list_invoices", "GET", "/invoices")
+        elif op == "stats":
+            await self.call("stats", "GET", "/employees/stats")
+        elif op == "search_products":
+            name = self.rnd.choice(self.tenant["products"])
+            await self.call("search_products", "GET", "/products/", params={"q": name[: self.rnd.randint(2, 5)]})
+        elif op == "create_invoice":
+            products = self.rnd.sample(self.tenant["products"], k=min(len(self.tenant["products"]), self.rnd.randint(1, 8)))
+            phone = self.rnd.choice(self.tenant["clients"])
+            await self.call("create_invoice", "POST", "/invoices/", json={
+                "client": "Нагрузочный клиент",
+                "phone": phone,
+                "status": "не оплачен",
+                "paid_amount": 0,
+                "items": [{"name": p, "quantity": self.rnd.randint(1, 10), "price": self.rnd.randint(100, 5000)}
+                          for p in products],
+            })
+
+
+async def run(args, manifest: dict) -> dict:
+    rec = Recorder()
+    stack = contextlib.AsyncExitStack()
+    if args.base_url:
+        transport, base_url = None, args.base_url
+    else:
+        from main import app
+        transport, base_url = httpx.ASGITransport(app=app), "http://bench"
+        # ASGITransport не шлёт lifespan-события — поднимаем их сами
+        await stack.enter_async_context(app.router.lifespan_context(app))
+
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    client = httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout, limits=limits)
+    async with stack, client:
+        rnd = random.Random(args.seed)
+        tenants = manifest["tenants"]
+        vus = [
+            VirtualUser(client, rnd.choice(tenants), manifest["password"], rnd.random() < args.owner_share,
+                        rec, random.Random(args.seed + i))
+            for i in range(args.users)
+        ]
+        await asyncio.gather(*(vu.login() for vu in vus))
+
+        deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+
+        async def loop(vu: VirtualUser):
+            while time.perf_counter() < deadline:
+                await vu.step()
+
+        await asyncio.gather(*(loop(vu) for vu in vus))
+        wall = time.perf_counter() - started
+
+    return {
+        "meta": {"users": args.users, "duration": args.duration, "seed": args.seed,
+                 "target": args.base_url or "asgi:main:app", "wall_s": wall},
+        "endpoints": rec.summary(wall),
+    }
+
+
+def print_report(result: dict, baseline: dict = None):
+    print(f"{'endpoint':<16} {'count':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, s in result["endpoints"].items():
+        line = (f"{name:<16} {s['count']:>7} {s['errors']:>5} {s['rps']:>8.1f} "
+                f"{s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f}")
+        base = (baseline or {}).get("endpoints", {}).get(name)
+        if base and base["p95_ms"]:
+            line += f"   p95 {100 * (s['p95_ms'] / base['p95_ms'] - 1):+.0f}%"
+        print(line)
+
+
+def regressions(result: dict, baseline: dict, tolerance: float):
+    bad = []
+    for name, s in result["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if base and s["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            bad.append(name)
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--manifest", default=str(RESULTS_DIR / "manifest.json"))
+    ap.add_argument("--base-url", default=None, help="например http://localhost:8000; по умолчанию ASGI в процессе")
+    ap.add_argument("--users", type=int, default=10, help="виртуальных пользователей (параллельность)")
+    ap.add_argument("--duration", type=float, default=30.0, help="секунд")
+    ap.add_argument("--owner-share", type=float, default=0.3, help="доля владельцев среди пользователей")
+    ap.add_argument("--timeout", type=float, default=30.0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--save", help="сохранить результат как JSON")
+    ap.add_argument("--compare", help="сравнить с сохранённым JSON")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="допустимый рост p95")
+    args = ap.parse_args()
+
+    manifest = json.loads(Path(args.manifest).read_text())
+    result = asyncio.run(run(args, manifest))
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(result, baseline)
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(json.dumps(result, ensure_ascii=False, indent=1))
+    if baseline:
+        bad = regressions(result, baseline, args.tolerance)
+        if bad:
+            print(f"регрессия p95 > {args.tolerance:.0%}: {', '.join(bad)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
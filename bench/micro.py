@@ -0,0 +1,227 @@
+"""Микробенчмарки горячих путей: телефоны, JWT, bcrypt, нумерация, сборка и рендер списка.
+
+    python -m bench.micro                      # прогон + сравнение с bench/baselines/micro.json
+    python -m bench.micro -k jwt --rounds 30   # только бенчмарки с "jwt" в имени
+    python -m bench.micro --update-baseline    # перезаписать базу (на эталонной машине)
+
+Каждый бенчмарк: калибровка числа повторов под --min-time на раунд, прогрев,
+--rounds раундов с выключенным GC, отброс выбросов по Тьюки (1.5 IQR).
+Регрессия — медиана хуже базы больше чем на --tolerance и больше 3 MAD;
+при регрессии код выхода 1. Результаты пишутся в bench/results/.
+generate_invoice_number ходит в БД и пропускается, если DATABASE_URL недоступна.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# движок создаётся лениво и без соединения — достаточно любого URL
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/enote_bench")
+
+BASELINE = Path(__file__).parent / "baselines" / "micro.json"
+RESULTS_DIR = Path(__file__).parent / "results"
+
+BENCHMARKS = {}
+
+
+def bench(name):
+    def decorator(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return decorator
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Бенчмарки: фабрика готовит данные и возвращает вызываемое без аргументов
+# ───────────────────────────────────────────────────────────────────────────────
+@bench("phone.norm_phone")
+def _norm_phone():
+    from routes.auth import norm_phone
+    return lambda: norm_phone("+7 (701) 123-45-67")
+
+
+@bench("phone.eq_phone")
+def _eq_phone():
+    from routes.auth import eq_phone
+    return lambda: eq_phone("+7 (701) 123-45-67", "87011234567")
+
+
+@bench("jwt.encode")
+def _jwt_encode():
+    from jose import jwt
+    from routes.auth import SECRET_KEY, ALGORITHM
+    data = {"sub": "12345", "exp": datetime.utcnow() + timedelta(days=1)}
+    return lambda: jwt.encode(data, SECRET_KEY, algorithm=ALGORITHM)
+
+
+@bench("jwt.decode")
+def _jwt_decode():
+    from jose import jwt
+    from routes.auth import SECRET_KEY, ALGORITHM
+    token = jwt.encode({"sub": "12345", "exp": datetime.utcnow() + timedelta(days=1)}, SECRET_KEY, algorithm=ALGORITHM)
+    return lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+@bench("bcrypt.verify")
+def _bcrypt_verify():
+    from routes.auth import get_pwd_context
+    pwd_context = get_pwd_context()
+    hashed = pwd_context.hash("correct horse")
+    return lambda: pwd_context.verify("correct horse", hashed)
+
+
+@bench("invoice.generate_number")
+def _generate_number():
+    from sqlalchemy import text
+    from database import SessionLocal
+    from routes.invoice import generate_invoice_number
+    db = SessionLocal()
+    db.execute(text("SELECT 1"))  # недоступная БД -> исключение -> пропуск
+    return lambda: generate_invoice_number(db, 1)
+
+
+@bench("render.stdlib_json_x500")
+def _render_stdlib():
+    from bench.serialization import _stdlib, make_invoices
+    payload = make_invoices(500)
+    return lambda: _stdlib(payload)
+
+
+@bench("render.fast_json_x500")
+def _render_fast():
+    from bench.serialization import _orjson, make_invoices
+    payload = make_invoices(500)
+    return lambda: _orjson(payload)
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Раннер
+# ───────────────────────────────────────────────────────────────────────────────
+def _round(fn, loops: int) -> float:
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            fn()
+        return (time.perf_counter_ns() - start) / loops
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def calibrate(fn, min_time: float) -> int:
+    loops = 1
+    while True:
+        per_op = _round(fn, loops)
+        if per_op * loops >= min_time * 1e9 or loops >= 1 << 24:
+            return loops
+        loops = max(loops * 2, int(min_time * 1e9 / max(per_op, 1)))
+
+
+def reject_outliers(samples):
+    if len(samples) < 4:
+        return list(samples)
+    q1, _, q3 = statistics.quantiles(samples, n=4)
+    fence = 1.5 * (q3 - q1)
+    return [s for s in samples if q1 - fence <= s <= q3 + fence]
+
+
+def measure(fn, rounds: int, warmup: int, min_time: float) -> dict:
+    loops = calibrate(fn, min_time)
+    for _ in range(warmup):
+        _round(fn, loops)
+    samples = [_round(fn, loops) for _ in range(rounds)]
+    kept = reject_outliers(samples)
+    median = statistics.median(kept)
+    return {
+        "median_ns": median,
+        "mean_ns": statistics.fmean(kept),
+        "stdev_ns": statistics.stdev(kept) if len(kept) > 1 else 0.0,
+        "mad_ns": statistics.median(abs(s - median) for s in kept),
+        "min_ns": min(kept),
+        "loops": loops,
+        "rounds": rounds,
+        "kept": len(kept),
+    }
+
+
+def compare(result: dict, base: dict, tolerance: float):
+    """(отношение медиан, регрессия?) относительно базы."""
+    ratio = result["median_ns"] / base["median_ns"]
+    noise = 3 * max(result["mad_ns"], base["mad_ns"])
+    regressed = ratio > 1 + tolerance and result["median_ns"] - base["median_ns"] > noise
+    return ratio, regressed
+
+
+def _fmt(ns: float) -> str:
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("µs", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.0f} ns"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-k", dest="filter", default="", help="подстрока имени бенчмарка")
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--warmup", type=int, default=3)
+    ap.add_argument("--min-time", type=float, default=0.05, help="секунд на раунд")
+    ap.add_argument("--tolerance", type=float, default=0.10)
+    ap.add_argument("--baseline", default=str(BASELINE))
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--save", default=None, help="куда сохранить результат (по умолчанию bench/results/)")
+    args = ap.parse_args()
+
+    baseline = {}
+    if Path(args.baseline).exists():
+        baseline = json.loads(Path(args.baseline).read_text()).get("results", {})
+
+    results, regressions = {}, []
+    print(f"{'benchmark':<28} {'median':>10} {'± MAD':>10} {'kept':>6} {'vs base':>9}")
+    for name, factory in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        try:
+            fn = factory()
+        except Exception as e:
+            print(f"{name:<28} пропущен: {type(e).__name__}: {str(e).splitlines()[0][:60]}")
+            continue
+        res = results[name] = measure(fn, args.rounds, args.warmup, args.min_time)
+        line = f"{name:<28} {_fmt(res['median_ns']):>10} {_fmt(res['mad_ns']):>10} {res['kept']:>3}/{res['rounds']:<2}"
+        if name in baseline:
+            ratio, regressed = compare(res, baseline[name], args.tolerance)
+            line += f" {100 * (ratio - 1):+8.1f}%" + ("  РЕГРЕССИЯ" if regressed else "")
+            if regressed:
+                regressions.append(name)
+        print(line)
+
+    doc = {
+        "meta": {
+            "created": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    save = Path(args.save) if args.save else RESULTS_DIR / f"micro-{datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    save.parent.mkdir(parents=True, exist_ok=True)
+    save.write_text(json.dumps(doc, indent=1))
+    if args.update_baseline:
+        Path(args.baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.baseline).write_text(json.dumps(doc, indent=1) + "\n")
+        print(f"база обновлена: {args.baseline}")
+    elif regressions:
+        print(f"регрессии: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Чтение списков: ORM-сущности против Core-выборки колонок (reads.py).
+
+    python -m bench.read_path                       # 50k накладных и 50k товаров
+    python -m bench.read_path --rows 20000 --items 3 --runs 5
+
+Данные — отдельный арендатор, загруженный через COPY внутри транзакции,
+которая в конце откатывается: база после прогона не меняется.
+Для каждого пути: медиана времени (без tracemalloc) и пик памяти (tracemalloc)
+от запроса до готового списка словарей для ответа.
+"""
+import argparse
+import gc
+import os
+import statistics
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from pgcopy import copy_rows
+
+
+def seed(conn, rows: int, items_per_invoice: int) -> int:
+    """Арендатор с rows накладными (по items_per_invoice позиций) и rows товарами."""
+    cur = conn.connection.dbapi_connection.cursor()
+    tag = uuid.uuid4().hex[:10]
+    now = datetime.utcnow()
+    cur.execute(
+        "INSERT INTO users (name, email, phone, password_hash, created_at) "
+        "VALUES (%s, %s, %s, 'x', %s) RETURNING id",
+        (f"bench {tag}", f"{tag}@bench.local", f"+7999{tag}", now),
+    )
+    user_id = cur.fetchone()[0]
+    cur.execute("INSERT INTO clients (name, phone) VALUES (%s, %s) RETURNING id", ("Клиент", f"+7998{tag}"))
+    client_id = cur.fetchone()[0]
+    cur.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM invoices")
+    first_invoice = cur.fetchone()[0]
+
+    copy_rows(cur, "invoices", ["id", "client", "amount", "paid_amount", "status", "created_at", "client_id",
+                                "invoice_number", "user_id", "seller_name"],
+              ((first_invoice + i, "Клиент", 1000, 0, "не оплачен", now - timedelta(minutes=i), client_id,
+                f"bench/{tag}/{i}", user_id, "Владелец") for i in range(rows)))
+    copy_rows(cur, "items", ["invoice_id", "name", "quantity", "price"],
+              ((first_invoice + i, f"Товар {j}", j + 1, 100 * (j + 1))
+               for i in range(rows) for j in range(items_per_invoice)))
+    copy_rows(cur, "products", ["user_id", "name", "last_price", "created_at", "updated_at"],
+              ((user_id, f"Товар номер {i}", 100 + i % 1000, now, now) for i in range(rows)))
+    cur.execute("ANALYZE invoices; ANALYZE items; ANALYZE products")
+    return user_id
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Пути чтения
+# ───────────────────────────────────────────────────────────────────────────────
+def orm_invoices(db, user_id):
+    import reads
+    from models import Invoice
+    invoices = (
+        db.query(Invoice)
+        .options(joinedload(Invoice.client_rel), selectinload(Invoice.items))
+        .filter(Invoice.user_id == user_id)
+        .all()
+    )
+    # так собирал ответ список накладных до reads.invoices
+    return [
+        {
+            "id": inv.id,
+            "client": inv.client,
+            "phone": inv.client_rel.phone if inv.client_rel else None,
+            "status": inv.status,
+            "paid_amount": inv.paid_amount,
+            "created_at": reads._utc_iso(inv.created_at),
+            "invoice_number": inv.invoice_number,
+            "seller_employee_id": inv.seller_employee_id,
+            "seller_name": inv.seller_name,
+            "items": [{"name": it.name, "quantity": it.quantity, "price": it.price} for it in inv.items],
+        }
+        for inv in invoices
+    ]
+
+
+def core_invoices(db, user_id):
+    import reads
+    return reads.invoices(db, user_id)
+
+
+def orm_products(db, user_id):
+    from models import Product
+    from routes.products import ProductOut
+    products = db.query(Product).filter(Product.user_id == user_id).order_by(func.lower(Product.name)).all()
+    # так отвечал list_products: response_model валидирует каждую сущность
+    return [ProductOut.model_validate(p, from_attributes=True).model_dump() for p in products]
+
+
+def core_products(db, user_id):
+    import reads
+    return reads.products(db, user_id)
+
+
+PATHS = [
+    ("invoices", "orm", orm_invoices),
+    ("invoices", "core", core_invoices),
+    ("products", "orm", orm_products),
+    ("products", "core", core_products),
+]
+
+
+def run_once(conn, fn, user_id, trace: bool):
+    db = Session(bind=conn)
+    gc.collect()
+    try:
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = fn(db, user_id)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+        return elapsed, peak, len(result)
+    finally:
+        if trace:
+            tracemalloc.stop()
+        db.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--url", default=os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL"))
+    ap.add_argument("--rows", type=int, default=50000)
+    ap.add_argument("--items", type=int, default=3, help="позиций на накладную")
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+    if not args.url:
+        ap.error("укажите --url или BENCH_DATABASE_URL")
+    os.environ.setdefault("DATABASE_URL", args.url)
+
+    engine = create_engine(args.url)
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            user_id = seed(conn, args.rows, args.items)
+            print(f"{'list':<10} {'path':<6} {'rows':>7} {'median ms':>10} {'rows/s':>10} {'peak MiB':>9}")
+            results = {}
+            for name, path, fn in PATHS:
+                run_once(conn, fn, user_id, trace=False)  # прогрев кэша SQL и страниц
+                times = [run_once(conn, fn, user_id, trace=False)[0] for _ in range(args.runs)]
+                _, peak, n = run_once(conn, fn, user_id, trace=True)
+                median = statistics.median(times)
+                results[(name, path)] = (median, peak)
+                print(f"{name:<10} {path:<6} {n:>7} {median * 1000:>10.1f} {n / median:>10,.0f} {peak / 2**20:>9.1f}")
+            for name in ("invoices", "products"):
+                (t_orm, m_orm), (t_core, m_core) = results[(name, "orm")], results[(name, "core")]
+                print(f"{name}: core быстрее в {t_orm / t_core:.1f} раза, памяти меньше в {m_orm / m_core:.1f} раза")
+        finally:
+            trans.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Сериализация списка накладных: stdlib json vs orjson vs MessagePack.
+
+    python -m bench.serialization [--invoices 5000] [--repeat 7]
+
+Payload повторяет форму ответа GET /invoices (накладная + 1..10 позиций).
+"""
+import argparse
+import json
+import random
+import statistics
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from starlette.responses import JSONResponse
+
+from responses import FastJSONResponse, MSGPACK_MEDIA_TYPE, msgpack
+
+NAMES = ["Молоко 3,2%", "Хлеб бородинский", "Сахар 1 кг", "Масло сливочное", "Яйца С1 10 шт"]
+
+
+def make_invoices(n: int, seed: int = 42) -> list:
+    rnd = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    out = []
+    for i in range(1, n + 1):
+        out.append({
+            "id": i,
+            "client": f"ИП Покупатель {rnd.randint(1, 500)}",
+            "phone": f"+7701{rnd.randint(0, 9999999):07d}",
+            "status": rnd.choice(["оплачен", "не оплачен", "частично оплачен"]),
+            "paid_amount": rnd.randint(0, 50000),
+            "created_at": (start + timedelta(minutes=17 * i)).isoformat(),
+            "invoice_number": f"№{rnd.randint(1, 500):04d}/2025/{i}",
+            "seller_employee_id": rnd.choice([None, 1, 2, 3]),
+            "seller_name": rnd.choice(["Айгерим", "Ерлан", "Владелец"]),
+            "items": [
+                {"name": rnd.choice(NAMES), "quantity": rnd.randint(1, 20), "price": rnd.randint(100, 5000)}
+                for _ in range(rnd.randint(1, 10))
+            ],
+        })
+    return out
+
+
+def _stdlib(content) -> bytes:
+    # то же, что делал прежний UTF8JSONResponse (Starlette JSONResponse.render)
+    return JSONResponse.render(JSONResponse.__new__(JSONResponse), content)
+
+
+def _orjson(content) -> bytes:
+    return FastJSONResponse.render(FastJSONResponse.__new__(FastJSONResponse), content)
+
+
+def _msgpack(content) -> bytes:
+    resp = FastJSONResponse.__new__(FastJSONResponse)
+    resp.media_type = MSGPACK_MEDIA_TYPE
+    return FastJSONResponse.render(resp, content)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--invoices", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--number", type=int, default=5)
+    args = ap.parse_args()
+
+    payload = make_invoices(args.invoices)
+    encoders = {"stdlib json": _stdlib, "orjson": _orjson}
+    if msgpack is not None:
+        encoders["msgpack"] = _msgpack
+    else:
+        print("msgpack не установлен — пропускаем")
+
+    # sanity: JSON-кодировщики дают эквивалентный документ
+    assert json.loads(_stdlib(payload)) == json.loads(_orjson(payload))
+
+    print(f"{args.invoices} накладных, repeat={args.repeat}, number={args.number}")
+    print(f"{'encoder':<12} {'min ms':>9} {'median ms':>10} {'bytes':>10}")
+    base = None
+    for name, fn in encoders.items():
+        runs = timeit.Timer(lambda: fn(payload)).repeat(repeat=args.repeat, number=args.number)
+        per_call = [r / args.number * 1000 for r in runs]
+        med = statistics.median(per_call)
+        base = base or med
+        print(f"{name:<12} {min(per_call):>9.2f} {med:>10.2f} {len(fn(payload)):>10}  x{base / med:.1f}")
+
+
+if __name__ == "__main__":
+    main()
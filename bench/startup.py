@@ -0,0 +1,85 @@
+"""Холодный старт: время от запуска процесса до первого успешного ответа.
+
+    python -m bench.startup                    # 5 запусков uvicorn main:app, GET /
+    python -m bench.startup --runs 10 --path /docs
+    python -m bench.startup --import-only      # только время import main
+
+Каждый запуск — новый процесс (как при пробуждении инстанса Render): считаем
+время до import main, до готовности порта и до первого ответа 200 на --path.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import() -> float:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def measure_first_request(path: str, timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    url = f"http://127.0.0.1:{port}{path}"
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn завершился: {proc.stderr.read().decode()[-500:]}")
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError(f"нет ответа от {url} за {timeout} с")
+            try:
+                with urllib.request.urlopen(url, timeout=timeout) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _report(name: str, values):
+    print(f"{name:<22} median {statistics.median(values) * 1000:8.1f} ms   "
+          f"min {min(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--path", default="/")
+    ap.add_argument("--timeout", type=float, default=30.0)
+    ap.add_argument("--import-only", action="store_true")
+    args = ap.parse_args()
+    if not os.getenv("DATABASE_URL"):
+        ap.error("нужен DATABASE_URL (как у приложения)")
+
+    imports = [measure_import() for _ in range(args.runs)]
+    _report("import main", imports)
+    if not args.import_only:
+        firsts = [measure_first_request(args.path, args.timeout) for _ in range(args.runs)]
+        _report(f"first {args.path}", firsts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# catalog.py
+#
+# Версионированная номенклатура арендатора.
+#   • users.catalog_version — +1 при любой записи в products арендатора
+#     (create/update товара, upsert из накладной): bump_version() в той же
+#     транзакции, что и запись. UPDATE берёт блокировку строки владельца, так что
+#     записи номенклатуры одного арендатора идут по очереди, версии — в порядке commit.
+#   • products.catalog_version — версия, в которой товар менялся последним.
+#   • Готовые байты списка кэшируются в процессе по (арендатор, версия, формат):
+#     новая версия — новый ключ, инвалидировать нечего; старые вытесняет LRU.
+#   • ETag = версия: If-None-Match совпал — 304 без чтения товаров.
+#   • /products/changes?since_version=N — только товары с версией > N.
+#
+#   CATALOG_CACHE_SIZE=256    сколько списков держать в памяти процесса
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import orjson
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from starlette.responses import Response
+
+import reads
+from models import Product, User
+from responses import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, msgpack, wants_msgpack
+from warmup import register_primer
+
+CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "256"))
+
+
+class CatalogCache:
+    """LRU готовых ответов: (owner_id, version, media_type) -> bytes."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            body = self._data.get(key)
+            if body is not None:
+                self._data.move_to_end(key)
+            return body
+
+    def put(self, key, body: bytes):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._data[key] = body
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+cache = CatalogCache(CACHE_SIZE)
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Версия
+# ───────────────────────────────────────────────────────────────────────────────
+def bump_version(db: Session, owner_id: int) -> int:
+    """Новая версия номенклатуры (в транзакции записи, до commit её никто не видит)."""
+    return db.execute(
+        update(User).where(User.id == owner_id)
+        .values(catalog_version=User.catalog_version + 1)
+        .returning(User.catalog_version),
+        execution_options={"synchronize_session": False},
+    ).scalar_one()
+
+
+def bump_version_if(db: Session, owner_id: int, condition) -> Optional[int]:
+    """bump_version, только если condition (SQL) истинно — проверка, блокировка
+    и новая версия одним запросом. None — менять нечего, версия прежняя."""
+    return db.execute(
+        update(User).where(User.id == owner_id, condition)
+        .values(catalog_version=User.catalog_version + 1)
+        .returning(User.catalog_version),
+        execution_options={"synchronize_session": False},
+    ).scalar_one_or_none()
+
+
+def current_version(db: Session, actor) -> int:
+    """Владелец уже загружен get_actor — версия без запроса; для сотрудника — 1 запрос."""
+    if actor["role"] == "user":
+        return actor["user"].catalog_version
+    owner_id = actor["employee"].owner_id
+    return db.execute(select(User.catalog_version).where(User.id == owner_id)).scalar_one_or_none() or 0
+
+
+def etag(owner_id: int, version: int, media_type: str) -> str:
+    suffix = "-mp" if media_type == MSGPACK_MEDIA_TYPE else ""
+    return f'"c{owner_id}-{version}{suffix}"'
+
+
+def _render(rows, media_type: str) -> bytes:
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(rows, use_bin_type=True)
+    return orjson.dumps(rows)
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Ответы
+# ───────────────────────────────────────────────────────────────────────────────
+def catalog_body(db: Session, owner_id: int, version: int, media_type: str = JSON_MEDIA_TYPE) -> bytes:
+    # версия прочитана раньше товаров: под версией v могут оказаться изменения
+    # v+1 (не наоборот) — дельта since_version=v их просто повторит
+    key = (owner_id, version, media_type)
+    body = cache.get(key)
+    if body is None:
+        body = _render(reads.products(db, owner_id), media_type)
+        cache.put(key, body)
+    return body
+
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    """If-None-Match: слабое сравнение по списку тегов; "*" — любая версия."""
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or tag in tags
+
+
+def catalog_response(db: Session, owner_id: int, version: int, if_none_match: Optional[str]) -> Response:
+    media_type = MSGPACK_MEDIA_TYPE if wants_msgpack() else JSON_MEDIA_TYPE
+    tag = etag(owner_id, version, media_type)
+    headers = {"ETag": tag, "Cache-Control": "private, no-cache", "Vary": "Accept"}
+    if etag_matches(if_none_match, tag):
+        return Response(status_code=304, headers=headers)
+    return Response(catalog_body(db, owner_id, version, media_type), media_type=media_type, headers=headers)
+
+
+def changes(db: Session, owner_id: int, version: int, since_version: int) -> dict:
+    """Товары, изменённые после since_version. Версия клиента из будущего
+    (другая база, откат) — отдаём всё с full=True, клиент заменяет список."""
+    full = since_version > version or since_version < 0
+    stmt = select(Product.id, Product.name, Product.last_price).where(Product.user_id == owner_id)
+    if not full:
+        stmt = stmt.where(Product.catalog_version > since_version)
+    stmt = stmt.order_by(Product.id)
+    return {
+        "version": version,
+        "full": full,
+        "products": [{"id": id_, "name": name, "price": price} for id_, name, price in db.execute(stmt)],
+    }
+
+
+@register_primer
+def _prime_catalog(db: Session, user_id: int):
+    """Кэш номенклатуры недавно активных арендаторов — первый /products без чтения."""
+    version = db.execute(select(User.catalog_version).where(User.id == user_id)).scalar_one_or_none()
+    if version is not None:
+        catalog_body(db, user_id, version)
@@ -1,12 +1,93 @@
 # celery_app.py
+#
+# Очереди и воркеры:
+#   notify      — короткие, чувствительные к задержке задачи (напоминания, уведомления)
+#   reports     — тяжёлые отчёты и выгрузки (минуты)
+#   maintenance — фоновые служебные задачи (проверка подписок, бэкфиллы)
+#
+# Воркер слушает только выбранные очереди (-Q), например:
+#   celery -A celery_app worker -Q notify -c 4
+#   celery -A celery_app worker -Q reports,maintenance -c 2
+# Prefetch выставляется по самой «строгой» из прослушиваемых очередей, поэтому
+# тяжёлые и срочные очереди лучше держать на разных воркерах.
 import os
-from celery import Celery
+import time
+from celery import Celery, Task
+from celery.signals import before_task_publish, celeryd_init
+from celery.utils.log import get_task_logger
+from kombu import Queue
 from datetime import timedelta
 
 REDIS_URL = os.environ.get("REDIS_URL")
 if not REDIS_URL:
     raise RuntimeError("REDIS_URL is not set")
 
+logger = get_task_logger(__name__)
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Политики очередей: приоритет по умолчанию, prefetch, acks_late, лимиты времени
+# (в Redis меньший номер приоритета = выше приоритет)
+# ───────────────────────────────────────────────────────────────────────────────
+QUEUE_POLICIES = {
+    "notify": {
+        "priority": 0,
+        "prefetch": 4,
+        "acks_late": False,      # повтор напоминания хуже, чем его потеря
+        "soft_time_limit": 30,
+        "time_limit": 60,
+    },
+    "reports": {
+        "priority": 6,
+        "prefetch": 1,           # не забираем в запас длинные задачи
+        "acks_late": True,       # при падении воркера выгрузка перезапустится
+        "soft_time_limit": 10 * 60,
+        "time_limit": 12 * 60,
+    },
+    "maintenance": {
+        "priority": 9,
+        "prefetch": 1,
+        "acks_late": True,
+        "soft_time_limit": 30 * 60,
+        "time_limit": 35 * 60,
+    },
+}
+DEFAULT_QUEUE = "maintenance"
+
+
+class TimedTask(Task):
+    """Базовая задача: логирует время ожидания в очереди и время выполнения."""
+
+    def __call__(self, *args, **kwargs):
+        started = time.time()
+        sent_at = (self.request.headers or {}).get("sent_at") or getattr(self.request, "sent_at", None)
+        queue_wait = started - float(sent_at) if sent_at else None
+        try:
+            return super().__call__(*args, **kwargs)
+        finally:
+            run_time = time.time() - started
+            queue = (self.request.delivery_info or {}).get("routing_key")
+            logger.info(
+                "task=%s queue=%s wait=%s run=%.3fs",
+                self.name, queue,
+                f"{queue_wait:.3f}s" if queue_wait is not None else "n/a",
+                run_time,
+            )
+
+
+def task_options(queue: str) -> dict:
+    """Параметры @celery.task для задачи из очереди `queue`."""
+    policy = QUEUE_POLICIES[queue]
+    return {
+        "base": TimedTask,
+        "queue": queue,
+        "priority": policy["priority"],
+        "acks_late": policy["acks_late"],
+        "reject_on_worker_lost": policy["acks_late"],
+        "soft_time_limit": policy["soft_time_limit"],
+        "time_limit": policy["time_limit"],
+    }
+
+
 celery = Celery(
     "enote_tasks",
     broker=REDIS_URL,
@@ -18,6 +99,23 @@ celery = Celery(
 celery.conf.broker_connection_retry_on_startup = True
 celery.conf.timezone = "UTC"
 
+celery.conf.task_queues = [Queue(name) for name in QUEUE_POLICIES]
+celery.conf.task_default_queue = DEFAULT_QUEUE
+celery.conf.task_default_priority = QUEUE_POLICIES[DEFAULT_QUEUE]["priority"]
+celery.conf.task_routes = {
+    "tasks.check_subscriptions": {"queue": "maintenance"},
+}
+celery.conf.broker_transport_options = {
+    "queue_order_strategy": "priority",
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    # должен превышать самый длинный time_limit, иначе acks_late-задачу выдадут повторно
+    "visibility_timeout": 60 * 60,
+}
+celery.conf.worker_prefetch_multiplier = 1
+celery.conf.task_time_limit = QUEUE_POLICIES[DEFAULT_QUEUE]["time_limit"]
+celery.conf.task_soft_time_limit = QUEUE_POLICIES[DEFAULT_QUEUE]["soft_time_limit"]
+
 celery.conf.beat_schedule = {
     "check_subscriptions_daily": {
         "task": "tasks.check_subscriptions",
@@ -25,8 +123,26 @@ celery.conf.beat_schedule = {
     },
 }
 
+
+@before_task_publish.connect
+def _stamp_sent_at(headers=None, **kwargs):
+    # момент постановки в очередь — чтобы TimedTask посчитал ожидание
+    if headers is not None:
+        headers.setdefault("sent_at", time.time())
+
+
+@celeryd_init.connect
+def _configure_worker(conf=None, options=None, **kwargs):
+    # без -Q воркер слушает все очереди
+    queues = (options or {}).get("queues") or []
+    if isinstance(queues, str):
+        queues = [q.strip() for q in queues.split(",") if q.strip()]
+    queues = [q for q in queues if q in QUEUE_POLICIES] or list(QUEUE_POLICIES)
+    conf.worker_prefetch_multiplier = min(QUEUE_POLICIES[q]["prefetch"] for q in queues)
+
+
 # На случай капризов пути — принудительно дернем импорт
 try:
     import tasks  # noqa: F401
 except Exception as e:
-    print("!!! Failed to import tasks:", e)
\ No newline at end of file
+    print("!!! Failed to import tasks:", e)
@@ -0,0 +1,93 @@
+# client_io.py
+#
+# Синхронизация адресной книги продавца со справочником клиентов.
+# Контакты нормализуются и схлопываются по ключу телефона здесь, в памяти;
+# в БД — COPY во временную таблицу и один INSERT ... ON CONFLICT DO NOTHING:
+# существующих клиентов не трогаем (имя в справочнике важнее имени в телефоне).
+# Затем одна выборка id по ключам — отдельным запросом, чтобы в нём были
+# видны и клиенты, параллельно вставленные другими транзакциями.
+import os
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import deadlines
+from pgcopy import copy_rows
+
+MAX_CONTACTS = int(os.getenv("CLIENT_SYNC_MAX_CONTACTS", "10000"))
+MAX_ERRORS = 100  # сколько отклонённых контактов перечислять в ответе
+PHONE_KEY_LEN = 10
+
+# порядок вставки — по ключу: параллельные синхронизации берут блокировки
+# уникального индекса в одном порядке
+MERGE_SQL = text("""
+    INSERT INTO clients (user_id, name, phone, phone_key)
+    SELECT :owner_id, name, phone, phone_key
+    FROM client_import
+    ORDER BY phone_key
+    ON CONFLICT (user_id, phone_key) DO NOTHING
+""")
+
+MAPPING_SQL = text("""
+    SELECT c.phone_key, c.id
+    FROM client_import i
+    JOIN clients c ON c.user_id = :owner_id AND c.phone_key = i.phone_key
+""")
+
+
+def sync_clients(db: Session, owner_id: int, contacts: Iterable[tuple]) -> dict:
+    """contacts — пары (имя, телефон). Возвращает отчёт и id клиента для
+    каждого принятого контакта, в порядке запроса."""
+    from routes.auth import phone_key
+
+    received = rejected = 0
+    errors = []
+    accepted = []   # (индекс, телефон как прислан, ключ)
+    unique = {}     # ключ → (имя, телефон)
+    for index, (name, phone) in enumerate(contacts):
+        received += 1
+        key = phone_key(phone)
+        if len(key) < PHONE_KEY_LEN:
+            rejected += 1
+            if len(errors) < MAX_ERRORS:
+                errors.append({"index": index, "error": "Неполный номер телефона"})
+            continue
+        name = " ".join((name or "").split())
+        accepted.append((index, phone, key))
+        # у дублей номера берём первое непустое имя
+        if key not in unique or (name and not unique[key][0]):
+            unique[key] = (name, phone.strip())
+
+    ids = {}
+    inserted = 0
+    if unique:
+        db.execute(text(
+            "CREATE TEMP TABLE client_import (name text, phone text, phone_key text) ON COMMIT DROP"
+        ))
+        dbapi_conn = db.connection().connection.dbapi_connection
+        # COPY идёт мимо событий движка — регистрируем соединение для отмены вручную
+        guard = deadlines.current_guard()
+        if guard is not None:
+            guard.enter(dbapi_conn)
+        try:
+            with dbapi_conn.cursor() as cur:
+                copy_rows(cur, "client_import", ["name", "phone", "phone_key"],
+                          ((name or phone, phone, key) for key, (name, phone) in unique.items()))
+        finally:
+            if guard is not None:
+                guard.leave(dbapi_conn)
+        inserted = db.execute(MERGE_SQL, {"owner_id": owner_id}).rowcount
+        ids = dict(db.execute(MAPPING_SQL, {"owner_id": owner_id}).all())
+    db.commit()
+
+    return {
+        "received": received,
+        "inserted": inserted,
+        "existing": len(unique) - inserted,
+        "duplicates": len(accepted) - len(unique),
+        "rejected": rejected,
+        "errors": errors,
+        "clients": [{"index": index, "phone": phone, "id": ids[key]} for index, phone, key in accepted],
+    }
+
@@ -0,0 +1,211 @@
+# compression.py
+#
+# Сжатие ответов: gzip всегда, brotli / zstd — если установлены пакеты.
+# Маленькие тела (< COMPRESSION_MIN_SIZE) отдаём как есть, стриминговые ответы
+# сжимаем по кускам с flush после каждого, чтобы клиент получал данные сразу.
+import os
+import time
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+LEVELS = {
+    "gzip": int(os.getenv("GZIP_LEVEL", "6")),
+    "br": int(os.getenv("BROTLI_LEVEL", "4")),
+    "zstd": int(os.getenv("ZSTD_LEVEL", "3")),
+}
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "text/")
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._c = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = gzip-обёртка
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._c.compress(data)
+        return out + self._c.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Brotli:
+    def __init__(self, level: int):
+        self._c = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._c.process(data)
+        return out + (self._c.finish() if final else self._c.flush())
+
+
+class _Zstd:
+    def __init__(self, level: int):
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._c.compress(data)
+        return out + self._c.flush(
+            zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+
+COMPRESSORS = {"gzip": _Gzip}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = _Zstd
+if brotli is not None:
+    COMPRESSORS["br"] = _Brotli
+# порядок предпочтения при равных q
+PREFERENCE = ("br", "zstd", "gzip")
+
+# encoding -> [ответов, байт до, байт после, CPU-секунд]; + "identity" для пропущенных
+STATS = {name: [0, 0, 0, 0.0] for name in (*COMPRESSORS, "identity")}
+
+
+def compression_stats() -> dict:
+    """Снимок счётчиков сжатия по кодировкам."""
+    out = {}
+    for name, (responses, raw, sent, cpu) in STATS.items():
+        out[name] = {
+            "responses": responses,
+            "bytes_in": raw,
+            "bytes_out": sent,
+            "bytes_saved": raw - sent,
+            "cpu_seconds": cpu,
+        }
+    return out
+
+
+def choose_encoding(accept_encoding: str):
+    """Лучшая поддерживаемая кодировка из Accept-Encoding или None."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token:
+            weights[token] = q
+    star = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in PREFERENCE:
+        if name not in COMPRESSORS:
+            continue
+        q = weights.get(name, star)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        # encoding=None — клиент сжатие не принимает: ответ как есть, но с Vary
+        encoding = choose_encoding(accept)
+        await _Responder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+def _with_vary(headers: list) -> list:
+    """Заголовки с Accept-Encoding в Vary (к уже имеющимся значениям, без повтора)."""
+    vary = [v for k, v in headers if k.lower() == b"vary"]
+    tokens = {t.strip().lower() for v in vary for t in v.split(b",")}
+    if b"accept-encoding" in tokens or b"*" in tokens:
+        return headers
+    vary.append(b"Accept-Encoding")
+    return [(k, v) for k, v in headers if k.lower() != b"vary"] + [(b"vary", b", ".join(vary))]
+
+
+class _Responder:
+    def __init__(self, app, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+        self.varies = False
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message):
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start_message = message
+            headers = {k.lower(): v for k, v in message.get("headers", [])}
+            ctype = headers.get(b"content-type", b"").decode("latin-1")
+            encoded = b"content-encoding" in headers
+            # ответ зависит от Accept-Encoding у всего, что могли бы сжать
+            # (сжатого, маленького, уже закодированного, при encoding=None),
+            # иначе общий кэш отдаст сжатый вариант не тому клиенту
+            self.varies = encoded or ctype.startswith(COMPRESSIBLE_TYPES)
+            self.passthrough = self.encoding is None or not self.varies or encoded
+            return
+        if kind != "http.response.body" or self.passthrough:
+            await self._send_start()
+            return await self.send(message)
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        stats = STATS[self.encoding]
+
+        if self.compressor is None:
+            if not more_body and len(body) < self.minimum_size:
+                identity = STATS["identity"]
+                identity[0] += 1
+                identity[1] += len(body)
+                identity[2] += len(body)
+                await self._send_start()
+                return await self.send(message)
+            self.compressor = COMPRESSORS[self.encoding](LEVELS[self.encoding])
+            stats[0] += 1
+
+        cpu = time.thread_time()
+        chunk = self.compressor.compress(body, final=not more_body)
+        stats[3] += time.thread_time() - cpu
+        stats[1] += len(body)
+        stats[2] += len(chunk)
+
+        if self.start_message is not None:
+            start = self.start_message
+            self.start_message = None
+            headers = _with_vary([
+                (k, v) for k, v in start.get("headers", []) if k.lower() != b"content-length"
+            ])
+            headers.append((b"content-encoding", self.encoding.encode()))
+            if not more_body:
+                headers.append((b"content-length", str(len(chunk)).encode()))
+            await self.send({**start, "headers": headers})
+
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _send_start(self):
+        if self.start_message is None:
+            return
+        start, self.start_message = self.start_message, None
+        if self.varies:
+            start = {**start, "headers": _with_vary(list(start.get("headers", [])))}
+        await self.send(start)
@@ -1,7 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert, update
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 import os
 from dotenv import load_dotenv
+from metrics import TimedQueuePool
+from deadlines import DEFAULT_DEADLINE
 
 # 📥 Загрузка переменных окружения
 load_dotenv()
@@ -11,15 +13,47 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("❌ DATABASE_URL не загружен из .env")
 
+# ⏱ Потолки для соединений, которые отмена по дедлайну (deadlines.py) не
+# достаёт: ожидание выдачи из пула — не дольше дедлайна запроса по умолчанию;
+# запрос к БД — не дольше самого длинного дедлайна роута (импорт/выгрузка,
+# 120 с); транзакция без запросов — не дольше DB_IDLE_TX_TIMEOUT_MS
+# (Postgres закрывает такое соединение; в пул оно не вернётся — запрос,
+# который его держал, получит ошибку разрыва, и SQLAlchemy его выбросит)
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "120000"))
+IDLE_TX_TIMEOUT_MS = int(os.getenv("DB_IDLE_TX_TIMEOUT_MS", "60000"))
+
 # ⚙️ Создание движка
-engine = create_engine(DATABASE_URL, connect_args={"options": "-c client_encoding=utf8"})
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=TimedQueuePool,  # меряет ожидание соединения для /metrics
+    pool_timeout=DEFAULT_DEADLINE,
+    connect_args={"options": (
+        "-c client_encoding=utf8"
+        f" -c statement_timeout={STATEMENT_TIMEOUT_MS}"
+        f" -c idle_in_transaction_session_timeout={IDLE_TX_TIMEOUT_MS}"
+    )},
+)
 
-# 📦 Локальная сессия для каждого запроса
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 📦 Локальная сессия для каждого запроса.
+# expire_on_commit=False: после commit объекты не перечитываются из БД —
+# всё, что нужно для ответа, уже пришло из INSERT/UPDATE ... RETURNING
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, expire_on_commit=False)
 
 # 📐 Базовый класс для моделей
 Base = declarative_base()
 
+# ✍️ Запись одним запросом вместо INSERT/UPDATE + refresh()
+def insert_returning(db: Session, model, **values):
+    """INSERT ... RETURNING: новый объект модели со всеми колонками."""
+    return db.scalars(insert(model).values(**values).returning(model)).one()
+
+
+def update_returning(db: Session, model, *where, **values):
+    """UPDATE ... WHERE ... RETURNING: обновлённый объект или None, если строк нет."""
+    stmt = update(model).where(*where).values(**values).returning(model)
+    return db.scalars(stmt, execution_options={"synchronize_session": False}).one_or_none()
+
+
 # ✅ Dependency — обязательно для FastAPI
 def get_db() -> Session:
     db = SessionLocal()
@@ -0,0 +1,197 @@
+# deadlines.py
+#
+# Отмена работы с БД, когда она больше никому не нужна:
+#   • клиент отключился (мобильное приложение не дождалось ответа);
+#   • истёк дедлайн роута (по умолчанию REQUEST_DEADLINE секунд, для эндпоинта —
+#     декоратор @deadline(сек) под @router.get/...).
+# Выполняющийся запрос к Postgres отменяется через cancel-запрос протокола
+# (то же, что pg_cancel_backend), следующие запросы этого HTTP-запроса падают
+# с RequestAborted. По дедлайну клиент получает 504.
+# Отменяется только SQL, который выполняется сейчас. Соединение, простаивающее
+# в транзакции или ещё ожидающее выдачи из пула, ограничивают настройки
+# движка (database.py): pool_timeout = REQUEST_DEADLINE, а на стороне
+# Postgres — statement_timeout и idle_in_transaction_session_timeout.
+import asyncio
+import contextvars
+import os
+import threading
+import time
+
+from sqlalchemy import event
+
+DEFAULT_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "30"))
+_POLL = 0.25  # как часто перечитываем дедлайн: роут известен только после маршрутизации
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_guard", default=None)
+
+
+class RequestAborted(Exception):
+    """Запрос отменён (клиент ушёл или истёк дедлайн) — дальше в БД не ходим."""
+
+
+def deadline(seconds: float):
+    """Серверный дедлайн эндпоинта (включая ожидание БД)."""
+    def decorator(func):
+        func.__deadline__ = seconds
+        return func
+    return decorator
+
+
+class RequestGuard:
+    """Соединения, на которых сейчас выполняется SQL этого запроса, и флаг отмены."""
+    __slots__ = ("scope", "started", "reason", "_active", "_lock")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.started = time.monotonic()
+        self.reason = None  # "disconnect" | "deadline"
+        self._active = set()
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self) -> float:
+        route = self.scope.get("route")
+        return getattr(getattr(route, "endpoint", None), "__deadline__", DEFAULT_DEADLINE)
+
+    def enter(self, dbapi_conn):
+        with self._lock:
+            if self.reason is not None:
+                raise RequestAborted(self.reason)
+            self._active.add(dbapi_conn)
+
+    def leave(self, dbapi_conn):
+        with self._lock:
+            self._active.discard(dbapi_conn)
+
+    def abort(self, reason: str):
+        # cancel() — под той же блокировкой, что и leave(): пока CancelRequest
+        # не отправлен, соединение не выйдет из запроса и не вернётся в пул,
+        # иначе отмена могла бы попасть в чужой запрос на том же backend-е
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            for conn in self._active:
+                try:
+                    conn.cancel()  # psycopg2: CancelRequest на отдельном сокете
+                except Exception:
+                    pass
+
+    async def abort_async(self, reason: str):
+        """abort() из цикла событий: cancel() — сетевой обмен (новое соединение
+        и CancelRequest), при медленной БД он не должен стоять в цикле и
+        задерживать остальные запросы. Свой поток, не пул обработчиков роутов:
+        отмена не ждёт, пока в нём освободится место."""
+        await asyncio.get_running_loop().run_in_executor(None, self.abort, reason)
+
+
+def current_guard():
+    return _current.get()
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Хуки движка
+# ───────────────────────────────────────────────────────────────────────────────
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    guard = _current.get()
+    if guard is not None:
+        guard.enter(conn.connection.dbapi_connection)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    guard = _current.get()
+    if guard is not None:
+        guard.leave(conn.connection.dbapi_connection)
+
+
+def _handle_error(exception_context):
+    # соединение берём у курсора: у инвалидированного Connection его уже нет,
+    # а из набора активных оно должно уйти в любом случае
+    guard = _current.get()
+    cursor = exception_context.cursor
+    if guard is not None and cursor is not None:
+        guard.leave(cursor.connection)
+
+
+def instrument_cancellation(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# ASGI middleware
+# ───────────────────────────────────────────────────────────────────────────────
+TIMEOUT_BODY = '{"detail":"Превышено время обработки запроса"}'.encode("utf-8")
+
+
+class DeadlineMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        guard = RequestGuard(scope)
+        # receive читает только сторож; приложению сообщения идут через очередь
+        # (maxsize=1 — тело не копится в памяти, пока приложение его не читает)
+        inbox = asyncio.Queue(maxsize=1)
+        done = asyncio.Event()
+        started = complete = False
+
+        async def pump():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    if not complete:  # после ответа disconnect — норма, не отмена
+                        await guard.abort_async("disconnect")
+                    await inbox.put(message)
+                    return
+                await inbox.put(message)
+
+        async def watch():
+            while not done.is_set() and not complete:
+                remaining = guard.started + guard.budget - time.monotonic()
+                if remaining <= 0:
+                    await guard.abort_async("deadline")
+                    return
+                try:
+                    await asyncio.wait_for(done.wait(), timeout=min(remaining, _POLL))
+                except asyncio.TimeoutError:
+                    pass
+
+        async def send_wrapper(message):
+            nonlocal started, complete
+            if guard.reason == "disconnect":
+                return  # отвечать некому
+            if guard.reason == "deadline":
+                if not started:
+                    started = complete = True
+                    await send({"type": "http.response.start", "status": 504, "headers": [
+                        (b"content-type", b"application/json; charset=utf-8"),
+                        (b"content-length", str(len(TIMEOUT_BODY)).encode()),
+                    ]})
+                    await send({"type": "http.response.body", "body": TIMEOUT_BODY})
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                complete = True
+            await send(message)
+
+        token = _current.set(guard)
+        tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(watch())]
+        try:
+            await self.app(scope, inbox.get, send_wrapper)
+        except Exception:
+            if guard.reason is None:
+                raise
+            # ошибка — следствие отмены (QueryCanceled, RequestAborted): 504 или тишина
+            await send_wrapper({"type": "http.response.start", "status": 504, "headers": []})
+        finally:
+            done.set()
+            _current.reset(token)
+            for task in tasks:
+                task.cancel()
@@ -1,44 +1,92 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from starlette.responses import JSONResponse as StarletteJSONResponse
 from routes import feedback
 from database import engine
-from models import Base
 from routes import invoice, auth
 from routes import employees
 from routes import products  # один корректный импорт
+from routes import internal
+from routes import clients
+from responses import FastJSONResponse, NegotiationMiddleware
+from compression import CompressionMiddleware
+from metrics import MetricsMiddleware, instrument_engine
+from profiling import ProfilingMiddleware, instrument_threadpool
+from slowlog import instrument_slow_queries
+from deadlines import DeadlineMiddleware, instrument_cancellation
+import warmup
+
+# Схема БД — только через Alembic (alembic upgrade head при деплое).
+# При старте к БД не ходим: соединения пул откроет на первом запросе.
 
-# 👇 Кастомный JSON-ответ с поддержкой кириллицы
-class UTF8JSONResponse(StarletteJSONResponse):
-    media_type = "application/json; charset=utf-8"
 
-app = FastAPI(default_response_class=UTF8JSONResponse)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 👇 прогрев в фоне: порт открыт сразу, /ready = 503 до окончания
+    task = asyncio.create_task(asyncio.to_thread(warmup.run_warmup, engine)) if warmup.ENABLED else None
+    yield
+    if task is not None and not task.done():
+        await asyncio.wait([task], timeout=5)
+    # 👇 при остановке закрываем соединения пула, а не ждём, пока их оборвёт БД
+    engine.dispose()
+
 
-@app.exception_handler(HTTPException)
 async def custom_http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exc.status_code,
         content={"detail": str(exc.detail)},
-        media_type="application/json; charset=utf-8",
     )
 
-Base.metadata.create_all(bind=engine)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def health():
+    return {"status": "ok"}
 
-app.include_router(invoice.router)
-app.include_router(auth.router)
-app.include_router(feedback.router)
-app.include_router(employees.router)
-app.include_router(products.router)
 
-@app.get("/")
-def health():
-    return {"status": "ok"}
\ No newline at end of file
+def ready():
+    state = {"ready": warmup.is_ready(), "warmup": warmup.STATE["steps"]}
+    return FastJSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+def create_app() -> FastAPI:
+    # 👇 JSON-ответ на orjson (кириллица без экранирования), MessagePack по Accept
+    app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
+    app.add_exception_handler(HTTPException, custom_http_exception_handler)
+
+    # 👇 клиент отключился или истёк дедлайн роута — отменяем SQL в Postgres
+    app.add_middleware(DeadlineMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(NegotiationMiddleware)
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    # 👇 X-Profile (подпись от ADMIN_TOKEN) — cProfile конкретного запроса
+    app.add_middleware(ProfilingMiddleware, secret=internal.ADMIN_TOKEN)
+    instrument_engine(engine)
+    instrument_cancellation(engine)
+    # 👇 запросы дольше SLOW_QUERY_MS — в /internal/slow-queries с планом
+    instrument_slow_queries(engine)
+
+    app.include_router(invoice.router)
+    app.include_router(auth.router)
+    app.include_router(feedback.router)
+    app.include_router(employees.router)
+    app.include_router(products.router)
+    app.include_router(clients.router)
+    app.include_router(internal.router)
+    app.add_api_route("/", health, methods=["GET"])
+    app.add_api_route("/ready", ready, methods=["GET"])
+
+    # 👇 синхронные обработчики в пуле потоков — под профилировщик X-Profile
+    if internal.ADMIN_TOKEN:
+        instrument_threadpool()
+    return app
+
+
+app = create_app()
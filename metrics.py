@@ -0,0 +1,260 @@
+# metrics.py
+#
+# Лёгкий сборщик метрик: счётчики и гистограммы с фиксированными корзинами на
+# предвыделенных списках, одна маленькая структура со __slots__ на запрос.
+# `x += 1` под GIL не атомарен (чтение и запись — разные байткоды), а запросы
+# идут из пула потоков, поэтому у каждой метрики свой короткий замок; экспорт
+# берёт под ним согласованный снимок. Формат — текстовый Prometheus.
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя — +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """(counts, sum, count) одним согласованным срезом."""
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "statements", "db_time", "rows", "pool_wait", "statuses", "_lock")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_time = Histogram(DB_TIME_BUCKETS)
+        self.rows = 0
+        self.pool_wait = 0.0
+        self.statuses = {}
+        self._lock = threading.Lock()  # rows, pool_wait, statuses
+
+    def record(self, status: int, rows: int, pool_wait: float):
+        with self._lock:
+            self.rows += rows
+            self.pool_wait += pool_wait
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def counters(self):
+        """(statuses, rows, pool_wait) одним согласованным срезом."""
+        with self._lock:
+            return dict(self.statuses), self.rows, self.pool_wait
+
+
+class RequestStats:
+    """Счётчики текущего запроса; живут в contextvar, пополняются хуками движка.
+    scope — ASGI scope запроса (роут появляется в нём после маршрутизации)."""
+    __slots__ = ("statements", "db_time", "rows", "pool_wait", "scope")
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.statements = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.pool_wait = 0.0
+
+
+# (method, route template) -> RouteMetrics; кардинальность ограничена числом роутов
+ROUTES = {}
+DB_TOTALS = [0, 0.0, 0]  # statements, seconds, rows — по всему процессу
+_db_totals_lock = threading.Lock()
+POOL_WAIT = Histogram(POOL_WAIT_BUCKETS)
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_request():
+    """RequestStats текущего HTTP-запроса или None (Celery, скрипты)."""
+    return _current.get()
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Хуки SQLAlchemy
+# ───────────────────────────────────────────────────────────────────────────────
+class TimedQueuePool(QueuePool):
+    """QueuePool, который меряет ожидание свободного соединения."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            POOL_WAIT.observe(waited)
+            stats = _current.get()
+            if stats is not None:
+                stats.pool_wait += waited
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_start
+    rows = cursor.rowcount if cursor.description is not None and cursor.rowcount > 0 else 0
+    with _db_totals_lock:
+        DB_TOTALS[0] += 1
+        DB_TOTALS[1] += elapsed
+        DB_TOTALS[2] += rows
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+        stats.rows += rows
+
+
+def instrument_engine(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# ASGI middleware
+# ───────────────────────────────────────────────────────────────────────────────
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            route = scope.get("route")
+            key = (scope["method"], route.path if route is not None else "<unmatched>")
+            m = ROUTES.get(key)
+            if m is None:
+                m = ROUTES.setdefault(key, RouteMetrics())
+            m.latency.observe(elapsed)
+            m.statements.observe(stats.statements)
+            m.db_time.observe(stats.db_time)
+            m.record(status, stats.rows, stats.pool_wait)
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Экспорт в формате Prometheus
+# ───────────────────────────────────────────────────────────────────────────────
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _histogram_lines(out, name, hist: Histogram, **labels):
+    counts, total, count = hist.snapshot()
+    cumulative = 0
+    for bound, n in zip(hist.buckets, counts):
+        cumulative += n
+        out.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    cumulative += counts[-1]
+    out.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {cumulative}")
+    out.append(f"{name}_sum{_labels(**labels)} {total}")
+    out.append(f"{name}_count{_labels(**labels)} {count}")
+
+
+def render_prometheus(engine=None, extra=None) -> str:
+    out = []
+    routes = list(ROUTES.items())
+    counters = {key: m.counters() for key, m in routes}
+
+    out.append("# HELP http_requests_total Requests by route and status.")
+    out.append("# TYPE http_requests_total counter")
+    for (method, path), m in routes:
+        for status, n in counters[method, path][0].items():
+            out.append(f"http_requests_total{_labels(method=method, route=path, status=status)} {n}")
+
+    for name, attr, help_text in (
+        ("http_request_duration_seconds", "latency", "Request latency."),
+        ("http_request_db_statements", "statements", "SQL statements per request."),
+        ("http_request_db_seconds", "db_time", "Total DB time per request."),
+    ):
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} histogram")
+        for (method, path), m in routes:
+            _histogram_lines(out, name, getattr(m, attr), method=method, route=path)
+
+    out.append("# HELP http_request_db_rows_total Rows fetched by route.")
+    out.append("# TYPE http_request_db_rows_total counter")
+    for (method, path), m in routes:
+        out.append(f"http_request_db_rows_total{_labels(method=method, route=path)} {counters[method, path][1]}")
+
+    out.append("# HELP http_request_pool_wait_seconds_total Pool wait by route.")
+    out.append("# TYPE http_request_pool_wait_seconds_total counter")
+    for (method, path), m in routes:
+        pool_wait = counters[method, path][2]
+        out.append(f"http_request_pool_wait_seconds_total{_labels(method=method, route=path)} {pool_wait}")
+
+    out.append("# HELP db_pool_wait_seconds Time to get a pooled connection.")
+    out.append("# TYPE db_pool_wait_seconds histogram")
+    _histogram_lines(out, "db_pool_wait_seconds", POOL_WAIT)
+
+    with _db_totals_lock:
+        statements, seconds, rows = DB_TOTALS
+    out.append("# TYPE db_statements_total counter")
+    out.append(f"db_statements_total {statements}")
+    out.append("# TYPE db_seconds_total counter")
+    out.append(f"db_seconds_total {seconds}")
+    out.append("# TYPE db_rows_total counter")
+    out.append(f"db_rows_total {rows}")
+
+    pool = getattr(engine, "pool", None)
+    if isinstance(pool, QueuePool):
+        out.append("# TYPE db_pool_checked_out gauge")
+        out.append(f"db_pool_checked_out {pool.checkedout()}")
+        out.append("# TYPE db_pool_size gauge")
+        out.append(f"db_pool_size {pool.size()}")
+        out.append("# TYPE db_pool_overflow gauge")
+        out.append(f"db_pool_overflow {pool.overflow()}")
+
+    for name, (kind, samples) in (extra or {}).items():
+        out.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            out.append(f"{name}{_labels(**labels)} {value}")
+
+    return "\n".join(out) + "\n"
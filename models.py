@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
+from sqlalchemy import BigInteger, Column, Computed, Integer, String, Boolean, ForeignKey, DateTime, Float, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -14,7 +14,7 @@ class Invoice(Base):
     paid_amount = Column(Integer, nullable=True, default=0)
     status = Column(String, default="не оплачен")
     created_at = Column(DateTime, default=datetime.utcnow)
-    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False, index=True)
     invoice_number = Column(String, unique=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
@@ -26,11 +26,16 @@ class Invoice(Base):
     user = relationship("User", back_populates="invoices")
     seller_employee = relationship("Employee", foreign_keys=[seller_employee_id])
 
+    # списки накладных арендатора: WHERE user_id = ? ORDER BY id
+    __table_args__ = (Index("ix_invoices_user_id_id", "user_id", "id"),)
+
 class Item(Base):
     __tablename__ = "items"
 
     id = Column(Integer, primary_key=True, index=True)
-    invoice_id = Column(Integer, ForeignKey("invoices.id"))
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), index=True)
+    # товар номенклатуры; name остаётся как было в накладной
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="SET NULL"), nullable=True, index=True)
     name = Column(String, nullable=False)
     quantity = Column(Integer, nullable=False)
     price = Column(Integer, nullable=False)
@@ -42,10 +47,21 @@ class Client(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    phone = Column(String, nullable=False, unique=True)
+    phone = Column(String, nullable=False)
+    # справочник арендатора; phone_key — последние 10 цифр (routes.auth.phone_key)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    phone_key = Column(String, nullable=False)
 
     invoices = relationship("Invoice", back_populates="client_rel")
 
+    # один клиент на номер в пределах арендатора; text_pattern_ops — для поиска
+    # по началу номера. Триграммный ix_clients_name_trgm (если есть pg_trgm) —
+    # только в миграции
+    __table_args__ = (
+        Index("ux_clients_user_id_phone_key", "user_id", "phone_key", unique=True,
+              postgresql_ops={"phone_key": "text_pattern_ops"}),
+    )
+
 class User(Base):
     __tablename__ = "users"
 
@@ -60,6 +76,8 @@ class User(Base):
     plan_expires = Column(DateTime, nullable=True)
     payment_status = Column(String, default="нет данных")
     terms_accepted_at = Column(DateTime, nullable=True)
+    # версия номенклатуры: +1 при любой записи в products арендатора (catalog.py)
+    catalog_version = Column(BigInteger, nullable=False, default=0, server_default="0")
 
     invoices = relationship("Invoice", back_populates="user")
     subscription = relationship("Subscription", back_populates="user", uselist=False)
@@ -103,14 +121,30 @@ class Employee(Base):
 # ЕДИНАЯ НОМЕНКЛАТУРА ОРГАНИЗАЦИИ
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ix_products_user_id_catalog_version", "user_id", "catalog_version"),
+        # одно название на арендатора: product_name_key — SQL-функция из миграции 9e4b2f7a0c13
+        Index("ux_products_user_id_name_key", "user_id", text("product_name_key(name)"), unique=True),
+        Index("ix_products_user_id_name_key_prefix", "user_id", text("product_name_key(name) text_pattern_ops")),
+        Index("ix_products_user_id_popularity", "user_id", text("popularity DESC")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     name = Column(String, nullable=False)
-    # В БД колонка называется last_price — мэппим её и даём совместимый алиас .price
+    # В БД колонка называется last_price — мэппим её и даём совместимый алиас .price.
+    # Это кэш последней цены; вся история — в product_prices
     last_price = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
+    # версия номенклатуры, в которой товар менялся последним — для /products/changes
+    catalog_version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # продажи (из накладных) и затухающая популярность — порядок подсказок /products/suggest.
+    # Продажа — накладная с товаром, не штуки: sale_count — число накладных,
+    # popularity — ln суммы их весов (-inf — продаж не было, см. миграцию c6e2a9d4f7b1)
+    sale_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_sold_at = Column(DateTime, nullable=True)
+    popularity = Column(Float, nullable=False, default=float("-inf"), server_default="-Infinity")
 
     user = relationship("User", back_populates="products")
 
@@ -120,4 +154,43 @@ class Product(Base):
 
     @price.setter
     def price(self, value: int):
-        self.last_price = value
\ No newline at end of file
+        self.last_price = value
+
+# ИСТОРИЯ ЦЕН: только вставки, строка — когда цена изменилась
+class ProductPrice(Base):
+    __tablename__ = "product_prices"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    changed_at = Column(DateTime, primary_key=True)
+    price = Column(Integer, nullable=False)
+
+# ОПЛАТЫ: только вставки; invoices.paid_amount/status — их итог, ведётся при вставке
+class Payment(Base):
+    __tablename__ = "payments"
+
+    id = Column(Integer, primary_key=True)
+    invoice_id = Column(Integer, ForeignKey("invoices.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    employee_id = Column(Integer, ForeignKey("employees.id", ondelete="SET NULL"), nullable=True)
+    amount = Column(Integer, nullable=False)
+    paid_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # оплаты накладной по порядку: WHERE invoice_id = ? ORDER BY id
+    __table_args__ = (Index("ix_payments_invoice_id_id", "invoice_id", "id"),)
+
+# БАЛАНС КЛИЕНТА: ведётся в тех же транзакциях, что накладные и оплаты (balances.py)
+class ClientBalance(Base):
+    __tablename__ = "client_balances"
+
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    invoiced = Column(BigInteger, nullable=False, default=0, server_default="0")
+    paid = Column(BigInteger, nullable=False, default=0, server_default="0")
+    outstanding = Column(BigInteger, Computed("invoiced - paid", persisted=True))
+    last_activity_at = Column(DateTime, nullable=True)
+
+    # /clients/debtors: WHERE user_id = ? AND outstanding > 0 ORDER BY outstanding DESC
+    __table_args__ = (
+        Index("ix_client_balances_debtors", "user_id", outstanding.desc(),
+              postgresql_where=text("outstanding > 0")),
+    )
@@ -0,0 +1,59 @@
+# pgcopy.py
+#
+# Потоковая загрузка строк в Postgres через COPY ... FROM STDIN (текстовый формат).
+# Строки берутся из итератора по мере чтения — весь набор в памяти не держим.
+from datetime import date, datetime
+from typing import Iterable, Sequence
+
+
+def _field(value) -> str:
+    if value is None:
+        return r"\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    s = str(value)
+    if "\\" in s or "\t" in s or "\n" in s or "\r" in s:
+        s = s.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return s
+
+
+class CopyStream:
+    """Файлоподобный объект для cursor.copy_expert: кодирует строки лениво."""
+
+    def __init__(self, rows: Iterable[Sequence]):
+        self._rows = iter(rows)
+        self._buf = bytearray()
+        self.rows_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        parts = []
+        pending = len(self._buf)
+        while size < 0 or pending < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = ("\t".join(_field(v) for v in row) + "\n").encode("utf-8")
+            parts.append(line)
+            pending += len(line)
+            self.rows_read += 1
+        if parts:
+            self._buf += b"".join(parts)
+        if size < 0 or size >= len(self._buf):
+            out = bytes(self._buf)
+            self._buf.clear()
+        else:
+            out = bytes(self._buf[:size])
+            del self._buf[:size]
+        return out
+
+
+def copy_rows(cursor, table: str, columns: Sequence[str], rows: Iterable[Sequence],
+              size: int = 64 * 1024) -> int:
+    """COPY строк в таблицу через DB-API курсор psycopg2. Возвращает число строк."""
+    stream = CopyStream(rows)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream, size=size)
+    return stream.rows_read
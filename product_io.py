@@ -0,0 +1,336 @@
+# product_io.py
+#
+# Массовая загрузка и выгрузка номенклатуры.
+#   Импорт: тело запроса (CSV или XLSX) сначала целиком принимается во
+#   временный файл (в памяти — до 1 МБ, дальше на диск; размер ограничен),
+#   и только потом берётся соединение: медленный клиент не держит слот пула и
+#   открытую транзакцию. Строки идут через COPY во временную таблицу, затем
+#   один INSERT ... ON CONFLICT сливает их в products.
+#   Экспорт: CSV из серверного курсора порциями.
+#
+# CSV: UTF-8 (BOM допускается), разделитель ; , или табуляция — по первой строке.
+# Колонки по заголовку (name/название/наименование, price/цена), без заголовка —
+# первые две: название, цена. XLSX — первый лист, те же правила (openpyxl).
+import codecs
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import select, text
+
+import catalog
+import deadlines
+from models import Product
+from pgcopy import copy_rows
+
+try:  # XLSX — опционально: без пакета принимаем только CSV
+    import openpyxl
+except ImportError:  # pragma: no cover
+    openpyxl = None
+
+MAX_ROWS = int(os.getenv("PRODUCT_IMPORT_MAX_ROWS", "100000"))
+MAX_BYTES = int(os.getenv("PRODUCT_IMPORT_MAX_MB", "20")) * 2**20
+SPOOL_MEMORY_BYTES = 2**20
+READ_SIZE = 64 * 1024
+MAX_ERRORS = 100  # сколько отклонённых строк перечислять в ответе
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+NAME_HEADERS = {"name", "название", "наименование", "товар"}
+PRICE_HEADERS = {"price", "last_price", "цена"}
+MAX_PRICE = 2**31 - 1
+
+
+class ImportRejected(Exception):
+    """Файл нельзя принять целиком (формат, размер) — роут отвечает status_code."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Разбор
+# ───────────────────────────────────────────────────────────────────────────────
+def _chunks(next_chunk: Callable[[], Optional[bytes]]) -> Iterator[bytes]:
+    while True:
+        chunk = next_chunk()
+        if chunk is None:
+            return
+        if chunk:
+            yield chunk
+
+
+def _text_lines(chunks: Iterator[bytes]) -> Iterator[str]:
+    """Байты → строки текста с "\\n" на конце; многобайтные символы и строки
+    на стыке порций собираются корректно."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    tail = ""
+    for chunk in chunks:
+        buf = tail + decoder.decode(chunk)
+        start = 0
+        while True:
+            end = buf.find("\n", start)
+            if end < 0:
+                break
+            yield buf[start:end + 1]
+            start = end + 1
+        tail = buf[start:]
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _csv_rows(lines: Iterator[str]) -> Iterator[tuple]:
+    """(номер строки файла, ячейки); разделитель — по первой строке."""
+    first = next(lines, None)
+    if first is None:
+        return
+    delimiter = max(";,\t", key=first.count)
+
+    def all_lines():
+        yield first
+        yield from lines
+
+    reader = csv.reader(all_lines(), delimiter=delimiter)
+    for cells in reader:
+        yield reader.line_num, cells
+
+
+def _spool(chunks: Iterator[bytes]):
+    """Тело целиком во временный файл (не больше MAX_BYTES), позиция — в начале."""
+    f = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    try:
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+            if size > MAX_BYTES:
+                raise ImportRejected(413, "Файл слишком большой")
+            f.write(chunk)
+        f.seek(0)
+        return f
+    except BaseException:
+        f.close()
+        raise
+
+
+def _xlsx_rows(f) -> Iterator[tuple]:
+    # XLSX — zip с оглавлением в конце: читается только из файла целиком
+    try:
+        wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+    except Exception:
+        raise ImportRejected(400, "Не удалось прочитать XLSX")
+    try:
+        for line, cells in enumerate(wb.active.iter_rows(values_only=True), start=1):
+            yield line, ["" if c is None else c for c in cells]
+    finally:
+        wb.close()
+
+
+def _price(raw) -> Optional[int]:
+    if isinstance(raw, bool):
+        return None
+    if isinstance(raw, (int, float)):
+        value = Decimal(str(raw))
+    else:
+        s = str(raw).strip().replace("\u00a0", "").replace(" ", "").replace(",", ".")
+        try:
+            value = Decimal(s)
+        except InvalidOperation:
+            return None
+    if not value.is_finite():
+        return None
+    price = int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    return price if 0 <= price <= MAX_PRICE else None
+
+
+class ImportReport:
+    def __init__(self):
+        self.received = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line: int, error: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+
+def _valid_rows(rows: Iterator[tuple], report: ImportReport) -> Iterator[tuple]:
+    """(line, name, price) для COPY; остальное — в отчёт."""
+    from routes.products import clean_name
+
+    name_col, price_col = 0, 1
+    header_checked = False
+    for line, cells in rows:
+        if not any(str(c).strip() for c in cells):
+            continue  # пустые строки не считаем
+        if not header_checked:
+            header_checked = True
+            labels = [str(c).strip().lower() for c in cells]
+            if NAME_HEADERS.intersection(labels) or PRICE_HEADERS.intersection(labels):
+                name_col = next((i for i, h in enumerate(labels) if h in NAME_HEADERS), 0)
+                price_col = next((i for i, h in enumerate(labels) if h in PRICE_HEADERS), 1)
+                continue
+        report.received += 1
+        if report.received > MAX_ROWS:
+            raise ImportRejected(413, f"Слишком много строк: не больше {MAX_ROWS}")
+        name = clean_name(str(cells[name_col])) if name_col < len(cells) else ""
+        if not name:
+            report.reject(line, "Пустое название")
+            continue
+        price = _price(cells[price_col]) if price_col < len(cells) else None
+        if price is None:
+            report.reject(line, "Неверная цена")
+            continue
+        yield line, name, price
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Загрузка
+# ───────────────────────────────────────────────────────────────────────────────
+# при повторе названия в файле побеждает последняя строка; порядок вставки — по
+# ключу, как в upsert_products (один порядок блокировок). В merged — только
+# новые товары и сменившие цену: их цены и идут в историю
+MERGE_SQL = text("""
+WITH incoming AS (
+    SELECT DISTINCT ON (product_name_key(name)) name, price
+    FROM product_import
+    ORDER BY product_name_key(name), line DESC
+), merged AS (
+    INSERT INTO products (user_id, name, last_price, created_at, updated_at, catalog_version)
+    SELECT :owner_id, name, price, :now, :now, :version
+    FROM incoming
+    ORDER BY product_name_key(name)
+    ON CONFLICT (user_id, product_name_key(name)) DO UPDATE
+        SET last_price = EXCLUDED.last_price,
+            updated_at = EXCLUDED.updated_at,
+            catalog_version = EXCLUDED.catalog_version
+        WHERE products.last_price IS DISTINCT FROM EXCLUDED.last_price
+    RETURNING id, updated_at, last_price, (xmax = 0) AS inserted
+), history AS (
+    INSERT INTO product_prices (product_id, changed_at, price)
+    SELECT id, updated_at, last_price FROM merged
+)
+SELECT
+    (SELECT count(*) FROM incoming),
+    count(*) FILTER (WHERE inserted),
+    count(*) FILTER (WHERE NOT inserted)
+FROM merged
+""")
+
+CATALOG_CHANGED = text("""
+    EXISTS (
+        SELECT 1
+        FROM product_import n
+        LEFT JOIN products p
+               ON p.user_id = :owner_id AND product_name_key(p.name) = product_name_key(n.name)
+        WHERE p.id IS NULL OR p.last_price IS DISTINCT FROM n.price
+    )
+""")
+
+
+def import_products(engine, owner_id: int, next_chunk: Callable[[], Optional[bytes]],
+                    fmt: Optional[str] = None) -> dict:
+    """Импорт номенклатуры из потока байт (next_chunk() → порция или None в конце).
+    fmt: "csv" | "xlsx" | None — определить по сигнатуре zip."""
+    with _spool(_chunks(next_chunk)) as f:
+        if fmt is None:
+            fmt = "xlsx" if f.read(4) == b"PK\x03\x04" else "csv"
+            f.seek(0)
+        if fmt == "xlsx" and openpyxl is None:
+            raise ImportRejected(415, "XLSX не поддерживается на сервере, загрузите CSV")
+        if fmt == "xlsx":
+            rows = _xlsx_rows(f)
+        else:
+            rows = _csv_rows(_text_lines(iter(lambda: f.read(READ_SIZE), b"")))
+        return _load(engine, owner_id, rows)
+
+
+def _load(engine, owner_id: int, rows: Iterator[tuple]) -> dict:
+    report = ImportReport()
+
+    # ошибка внутри COPY (разбор, обрыв тела) приходит от psycopg2 как
+    # QueryCanceled — запоминаем исходную, чтобы поднять её
+    failure = []
+
+    def source():
+        try:
+            yield from _valid_rows(rows, report)
+        except Exception as e:
+            failure.append(e)
+            raise
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TEMP TABLE product_import (line integer, name text, price integer) ON COMMIT DROP"
+        )
+        dbapi_conn = conn.connection.dbapi_connection
+        # COPY идёт мимо событий движка — регистрируем соединение для отмены вручную
+        guard = deadlines.current_guard()
+        if guard is not None:
+            guard.enter(dbapi_conn)
+        try:
+            with dbapi_conn.cursor() as cur:
+                loaded = copy_rows(cur, "product_import", ["line", "name", "price"], source())
+        except Exception:
+            if failure:
+                raise failure[0] from None
+            raise
+        finally:
+            if guard is not None:
+                guard.leave(dbapi_conn)
+
+        distinct = inserted = updated = 0
+        if loaded:
+            version = catalog.bump_version_if(conn, owner_id, CATALOG_CHANGED.bindparams(owner_id=owner_id))
+            if version is not None:
+                distinct, inserted, updated = conn.execute(MERGE_SQL, {
+                    "owner_id": owner_id, "now": datetime.utcnow(), "version": version,
+                }).one()
+            else:
+                distinct = conn.execute(text(
+                    "SELECT count(DISTINCT product_name_key(name)) FROM product_import"
+                )).scalar_one()
+
+    return {
+        "received": report.received,
+        "loaded": loaded,
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": distinct - inserted - updated,
+        "duplicates": loaded - distinct,
+        "rejected": report.rejected,
+        "errors": report.errors,
+    }
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Выгрузка
+# ───────────────────────────────────────────────────────────────────────────────
+# ; и BOM — чтобы Excel с русской локалью сразу разложил колонки и кириллицу
+EXPORT_DELIMITER = ";"
+
+
+def export_csv(engine, owner_id: int, batch: int = 1000) -> Iterator[bytes]:
+    """CSV номенклатуры (id;name;price) из серверного курсора, по batch строк."""
+    stmt = (
+        select(Product.id, Product.name, Product.last_price)
+        .where(Product.user_id == owner_id)
+        .order_by(Product.id)
+    )
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=EXPORT_DELIMITER, lineterminator="\r\n")
+    writer.writerow(["id", "name", "price"])
+    yield b"\xef\xbb\xbf" + buf.getvalue().encode("utf-8")
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch).execute(stmt)
+        for part in result.partitions(batch):
+            buf.seek(0)
+            buf.truncate()
+            writer.writerows(part)
+            yield buf.getvalue().encode("utf-8")
@@ -0,0 +1,315 @@
+# profiling.py
+#
+# Профилирование в проде, два режима:
+#   1) детерминированный профиль одного запроса — при подписанном заголовке
+#      X-Profile (см. sign_profile_header). Ответ получает X-Profile-Id, сам
+#      профиль (pstats) лежит в кольцевом буфере и забирается через /internal.
+#   2) статистический сэмплер на N секунд для всего процесса: раз в interval
+#      снимает стеки всех потоков и копит их в collapsed-формате (flamegraph.pl,
+#      speedscope), плюс сводку по группам: роуты, SQLAlchemy, bcrypt.
+import cProfile
+import contextvars
+import hashlib
+import hmac
+import io
+import itertools
+import marshal
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+PROFILE_HEADER = b"x-profile"
+MAX_PROFILES = 20
+# до 3.12 cProfile (setprofile) видит только свой поток: цикл событий и каждый
+# поток пула профилируются отдельно. С 3.12 он на sys.monitoring — активен
+# один на процесс и видит все потоки: один профилировщик на запрос, и
+# профилируемые запросы идут по одному (остальные — без профиля)
+PER_THREAD = sys.version_info < (3, 12)
+_exclusive = threading.Lock()
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Подпись заголовка X-Profile: "<expires>.<hmac(secret, expires:METHOD:path)>"
+# ───────────────────────────────────────────────────────────────────────────────
+def _signature(secret: str, expires: int, method: str, path: str) -> str:
+    msg = f"{expires}:{method.upper()}:{path}".encode()
+    return hmac.new(secret.encode(), msg, hashlib.sha256).hexdigest()
+
+
+def sign_profile_header(secret: str, method: str, path: str, ttl: int = 300) -> str:
+    expires = int(time.time()) + ttl
+    return f"{expires}.{_signature(secret, expires, method, path)}"
+
+
+def verify_profile_header(secret: str, value: str, method: str, path: str) -> bool:
+    if not secret:
+        return False
+    expires, _, sig = value.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(sig, _signature(secret, int(expires), method, path))
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Профиль одного запроса
+# ───────────────────────────────────────────────────────────────────────────────
+class RequestProfile:
+    """Профили одного запроса: цикл событий + вызовы в пуле потоков (до 3.12)."""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.created = time.time()
+        self.duration = 0.0
+        self.profilers = []
+
+    def new_profiler(self) -> cProfile.Profile:
+        prof = cProfile.Profile()
+        self.profilers.append(prof)
+        return prof
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.profilers[0])
+        for prof in self.profilers[1:]:
+            stats.add(prof)
+        return stats
+
+
+PROFILES = {}  # id -> RequestProfile, не больше MAX_PROFILES
+_order = deque()
+_ids = itertools.count(1)
+_current: contextvars.ContextVar = contextvars.ContextVar("request_profile", default=None)
+
+
+def _store(profile: RequestProfile) -> str:
+    pid = str(next(_ids))
+    PROFILES[pid] = profile
+    _order.append(pid)
+    while len(_order) > MAX_PROFILES:
+        PROFILES.pop(_order.popleft(), None)
+    return pid
+
+
+def profile_artifact(pid: str, fmt: str = "text", limit: int = 40):
+    """(содержимое, media type) профиля или None."""
+    profile = PROFILES.get(pid)
+    if profile is None:
+        return None
+    stats = profile.stats()
+    if fmt == "pstats":
+        # формат pstats.Stats.dump_stats — открывается snakeviz/pstats
+        return marshal.dumps(stats.stats), "application/octet-stream"
+    buf = io.StringIO()
+    stats.stream = buf
+    stats.sort_stats("cumulative").print_stats(limit)
+    header = f"{profile.method} {profile.path} — {profile.duration * 1000:.1f} ms\n"
+    return header + buf.getvalue(), "text/plain; charset=utf-8"
+
+
+def list_profiles():
+    return [
+        {"id": pid, "method": p.method, "path": p.path, "created": p.created,
+         "duration_ms": round(p.duration * 1000, 2)}
+        for pid, p in ((pid, PROFILES.get(pid)) for pid in list(_order)) if p is not None
+    ]
+
+
+def _profiled(call):
+    """Синхронный вызов под профилировщиком своего потока, если запрос профилируется."""
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return call(*args, **kwargs)
+        prof = profile.new_profiler()
+        prof.enable()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            prof.disable()
+    return wrapper
+
+
+def _threadpool_runner(run):
+    async def run_in_threadpool(func, *args, **kwargs):
+        if PER_THREAD and _current.get() is not None:
+            func = _profiled(func)
+        return await run(func, *args, **kwargs)
+    run_in_threadpool.__wrapped__ = run
+    return run_in_threadpool
+
+
+def instrument_threadpool():
+    """Синхронные эндпоинты и зависимости FastAPI выполняет в пуле потоков
+    (run_in_threadpool), профилировщик цикла событий их до 3.12 не видит —
+    подменяем сам запуск. Dependant-ы роутов не трогаем: app.dependency_overrides
+    работают как обычно."""
+    import fastapi.dependencies.utils
+    import fastapi.routing
+
+    for module in (fastapi.routing, fastapi.dependencies.utils):
+        if not hasattr(module.run_in_threadpool, "__wrapped__"):
+            module.run_in_threadpool = _threadpool_runner(module.run_in_threadpool)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, secret: str = ""):
+        self.app = app
+        self.secret = secret
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.secret:
+            return await self.app(scope, receive, send)
+        header = next((v for k, v in scope["headers"] if k == PROFILE_HEADER), None)
+        if header is None or not verify_profile_header(
+            self.secret, header.decode("latin-1"), scope["method"], scope["path"]
+        ):
+            return await self.app(scope, receive, send)
+
+        if not PER_THREAD and not _exclusive.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            if not PER_THREAD:
+                _exclusive.release()
+
+    async def _profile(self, scope, receive, send):
+        profile = RequestProfile(scope["method"], scope["path"])
+        pid = _store(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"x-profile-id", pid.encode())]}
+            await send(message)
+
+        token = _current.set(profile)
+        loop_prof = profile.new_profiler()
+        start = time.perf_counter()
+        loop_prof.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            loop_prof.disable()
+            profile.duration = time.perf_counter() - start
+            _current.reset(token)
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Статистический сэмплер
+# ───────────────────────────────────────────────────────────────────────────────
+# группы для сводки: первая совпавшая по модулям стека (от листа к корню)
+CATEGORIES = (
+    ("bcrypt", ("bcrypt", "passlib")),
+    ("sqlalchemy", ("sqlalchemy", "psycopg2")),
+    ("serialization", ("orjson", "msgpack", "json", "pydantic", "fastapi.encoders")),
+    ("routes", ("routes",)),
+)
+# стеки простаивающих потоков (ожидание задач, select) в отчёт не берём
+IDLE_LEAVES = {
+    ("threading", "wait"), ("queue", "get"), ("selectors", "select"),
+    ("concurrent.futures.thread", "_worker"), ("anyio._backends._asyncio", "run"),
+    ("asyncio.base_events", "_run_once"), ("asyncio.selector_events", "_write_to_self"),
+}
+
+
+class Sampler:
+    def __init__(self):
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.until = None
+        self.interval = 0.005
+        self._thread = None
+        self._lock = threading.Lock()  # stacks/samples: поток сэмплера пишет, отчёт читает
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: float = 0.005) -> bool:
+        if self.running:
+            return False
+        with self._lock:
+            self.stacks = Counter()
+            self.samples = 0
+        self.interval = interval
+        self.started = time.time()
+        self.until = self.started + seconds
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self.until = 0
+
+    def _run(self):
+        me = threading.get_ident()
+        while time.time() < self.until:
+            round_stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((frame.f_globals.get("__name__", "?"), code.co_name))
+                    frame = frame.f_back
+                if not stack or stack[0] in IDLE_LEAVES:
+                    continue
+                round_stacks.append(tuple(reversed(stack)))
+            with self._lock:
+                self.stacks.update(round_stacks)
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def _snapshot(self):
+        """Копия счётчиков: отчёт можно строить, пока сэмплер работает."""
+        with self._lock:
+            return Counter(dict(self.stacks)), self.samples
+
+    def collapsed(self) -> str:
+        """Формат flamegraph.pl / speedscope: "mod:func;mod:func N"."""
+        return "\n".join(
+            ";".join(f"{mod}:{func}" for mod, func in stack) + f" {n}"
+            for stack, n in self._snapshot()[0].most_common()
+        ) + "\n"
+
+    def summary(self, top: int = 20) -> dict:
+        stacks, samples = self._snapshot()
+        total = sum(stacks.values())
+        groups = Counter()
+        leaves = Counter()
+        handlers = Counter()
+        for stack, n in stacks.items():
+            groups[_category(stack)] += n
+            handler = next((f"{m}:{f}" for m, f in stack if m.startswith("routes.")), None)
+            if handler:
+                handlers[handler] += n
+            leaves[f"{stack[-1][0]}:{stack[-1][1]}"] += n
+        return {
+            "running": self.running,
+            "started": self.started,
+            "sample_rounds": samples,
+            "interval_ms": self.interval * 1000,
+            "busy_samples": total,
+            "groups": {k: {"samples": v, "share": round(v / total, 4)} for k, v in groups.most_common()} if total else {},
+            "handlers": [{"frame": k, "samples": v} for k, v in handlers.most_common(top)],
+            "top_leaves": [{"frame": k, "samples": v} for k, v in leaves.most_common(top)],
+            "top_stacks": [
+                {"stack": ";".join(f"{m}:{f}" for m, f in stack[-12:]), "samples": n}
+                for stack, n in stacks.most_common(top)
+            ],
+        }
+
+
+def _category(stack) -> str:
+    for mod, _ in reversed(stack):
+        for name, prefixes in CATEGORIES:
+            if mod.startswith(prefixes):
+                return name
+    return "other"
+
+
+sampler = Sampler()
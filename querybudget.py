@@ -0,0 +1,158 @@
+# querybudget.py
+#
+# Бюджеты SQL-запросов на эндпоинт и детектор N+1 для тестов.
+#
+# Эндпоинт объявляет бюджет декоратором (под @router.get/...):
+#
+#     @router.get("/invoices")
+#     @query_budget(3)
+#     def get_invoices(...): ...
+#
+# В тестах включаем проверку — превышение бюджета роняет запрос исключением
+# QueryBudgetExceeded, и TestClient пробрасывает его в тест:
+#
+#     from main import app
+#     from database import engine
+#     enable_query_budgets(app, engine)
+#
+# Для точечных проверок есть контекстный менеджер:
+#
+#     with record_queries(engine) as rec:
+#         client.get("/invoices", headers=auth)
+#     rec.assert_at_most(3)
+import contextvars
+import re
+from collections import Counter
+
+from sqlalchemy import event
+
+# сколько одинаковых (после нормализации) запросов за запрос считаем N+1
+REPEAT_THRESHOLD = 2
+
+_WS = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\([^)]+\)s|%s|\$\d+|:\w+|\?")
+_POSTCOMPILE = re.compile(r"\(?__\[POSTCOMPILE_\w+\]\)?")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"(VALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+
+
+def normalize_sql(statement: str) -> str:
+    """SQL без литералов и параметров: одинаковые по форме запросы совпадают."""
+    s = _WS.sub(" ", statement).strip()
+    s = _STRING.sub("?", s)
+    s = _POSTCOMPILE.sub("(?)", s)
+    s = _PARAM.sub("?", s)
+    s = _NUMBER.sub("?", s)
+    s = _IN_LIST.sub("IN (?)", s)
+    s = _VALUES_LIST.sub(r"\1", s)
+    return s
+
+
+def query_budget(max_queries: int):
+    """Объявляет максимум SQL-запросов для эндпоинта (включая авторизацию)."""
+    def decorator(func):
+        func.__query_budget__ = max_queries
+        return func
+    return decorator
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryLog:
+    def __init__(self, label: str = "", parent=None):
+        self.label = label
+        self.statements = []
+        self.parent = parent  # внешний record_queries вокруг запроса
+
+    def add(self, statement: str):
+        self.statements.append(normalize_sql(statement))
+        if self.parent is not None:
+            self.parent.add(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int = REPEAT_THRESHOLD):
+        """Запросы, повторившиеся >= threshold раз — кандидаты в N+1."""
+        return [(sql, n) for sql, n in Counter(self.statements).most_common() if n >= threshold]
+
+    def report(self) -> str:
+        lines = [f"{self.label}: {self.count} SQL"]
+        for sql, n in Counter(self.statements).most_common():
+            mark = "  N+1? " if n >= REPEAT_THRESHOLD else "  "
+            lines.append(f"{mark}{n} × {sql[:200]}")
+        return "\n".join(lines)
+
+    def assert_at_most(self, max_queries: int):
+        if self.count > max_queries:
+            raise QueryBudgetExceeded(f"бюджет {max_queries} превышен\n{self.report()}")
+
+    def assert_no_repeats(self, threshold: int = REPEAT_THRESHOLD):
+        if self.repeated(threshold):
+            raise QueryBudgetExceeded(f"повторяющиеся запросы (N+1)\n{self.report()}")
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("query_log", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    log = _current.get()
+    if log is not None:
+        log.add(statement)
+
+
+class record_queries:
+    """Собирает SQL, выполненные внутри блока with (в т.ч. в потоках с тем же контекстом)."""
+
+    def __init__(self, engine, label: str = ""):
+        self.engine = engine
+        self.log = QueryLog(label)
+        self._token = None
+
+    def __enter__(self) -> QueryLog:
+        _listen(self.engine)
+        self._token = _current.set(self.log)
+        return self.log
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        return False
+
+
+def _listen(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+class QueryBudgetMiddleware:
+    """Проверяет бюджет эндпоинта после каждого запроса (только для тестов)."""
+
+    def __init__(self, app, fail_on_repeats: bool = False):
+        self.app = app
+        self.fail_on_repeats = fail_on_repeats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        log = QueryLog(f'{scope["method"]} {scope["path"]}', parent=_current.get())
+        token = _current.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+        route = scope.get("route")
+        budget = getattr(getattr(route, "endpoint", None), "__query_budget__", None)
+        if budget is not None:
+            log.assert_at_most(budget)
+        if self.fail_on_repeats:
+            log.assert_no_repeats()
+
+
+def enable_query_budgets(app, engine, fail_on_repeats: bool = False):
+    _listen(engine)
+    app.add_middleware(QueryBudgetMiddleware, fail_on_repeats=fail_on_repeats)
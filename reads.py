@@ -0,0 +1,302 @@
+# reads.py
+#
+# Слой чтения для списков: Core select() только нужных колонок, строки — кортежи,
+# сразу в словари ответа. Без ORM-сущностей, identity map и отслеживания
+# состояния: списки мы только отдаём, не меняем. Ответ отдавать через
+# FastJSONResponse напрямую, иначе response_model повторно прогонит всё через pydantic.
+#
+# Режим чтения выбирается для каждого эндпоинта переменной READ_MODE_<ИМЯ>:
+#   python   — выборка колонок и сборка словарей здесь (по умолчанию)
+#   postgres — JSON собирает сам Postgres (row_to_json, позиции — string_agg),
+#              мы только склеиваем готовые байты в поток
+import os
+from datetime import timezone
+from typing import Iterator, Optional
+
+from sqlalchemy import case, func, literal, or_, select, text
+from sqlalchemy.orm import Session
+
+from models import Client, ClientBalance, Employee, Invoice, Item, Payment, Product, ProductPrice
+
+
+READ_MODES = ("python", "postgres")
+
+
+def read_mode(endpoint: str) -> str:
+    mode = os.getenv(f"READ_MODE_{endpoint.upper()}", "python")
+    return mode if mode in READ_MODES else "python"
+
+
+def _like_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _utc_iso(dt) -> Optional[str]:
+    # помечаем как UTC, чтобы фронт корректно toLocal()
+    return dt.replace(tzinfo=timezone.utc).isoformat() if dt else None
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Накладные
+# ───────────────────────────────────────────────────────────────────────────────
+def _invoice_filter(owner_id: int, seller_employee_id: Optional[int]):
+    cond = [Invoice.user_id == owner_id]
+    if seller_employee_id is not None:
+        cond.append(Invoice.seller_employee_id == seller_employee_id)
+    return cond
+
+
+def invoices(db: Session, owner_id: int, seller_employee_id: Optional[int] = None) -> list:
+    """Накладные владельца (или одного продавца) с позициями: 2 запроса.
+    Позиции берутся тем же фильтром через JOIN, а не IN (…id…) — список id
+    может быть на десятки тысяч."""
+    cond = _invoice_filter(owner_id, seller_employee_id)
+    items_by_invoice = {}
+    item_rows = db.execute(
+        select(Item.invoice_id, Item.name, Item.quantity, Item.price)
+        .join(Invoice, Invoice.id == Item.invoice_id)
+        .where(*cond)
+        .order_by(Item.invoice_id, Item.id)
+    )
+    for invoice_id, name, quantity, price in item_rows:
+        lst = items_by_invoice.get(invoice_id)
+        if lst is None:
+            lst = items_by_invoice[invoice_id] = []
+        lst.append({"name": name, "quantity": quantity, "price": price})
+
+    rows = db.execute(
+        select(
+            Invoice.id, Invoice.client, Client.phone, Invoice.status, Invoice.paid_amount,
+            Invoice.created_at, Invoice.invoice_number, Invoice.seller_employee_id, Invoice.seller_name,
+        )
+        .outerjoin(Client, Client.id == Invoice.client_id)
+        .where(*cond)
+        .order_by(Invoice.id)
+    )
+    return [
+        {
+            "id": id_,
+            "client": client,
+            "phone": phone,
+            "status": status,
+            "paid_amount": paid_amount,
+            "created_at": _utc_iso(created_at),
+            "invoice_number": number,
+            "seller_employee_id": seller_id,
+            "seller_name": seller_name,
+            "items": items_by_invoice.get(id_, []),
+        }
+        for id_, client, phone, status, paid_amount, created_at, number, seller_id, seller_name in rows
+    ]
+
+
+# Одна строка — готовый JSON накладной; позиции — LATERAL-подзапрос.
+# row_to_json/string_agg вместо json_build_object/json_agg: те пишут JSON с
+# пробелами (" : ", ", \n"), а нам нужен компактный. created_at — как в
+# _utc_iso, но всегда с микросекундами.
+INVOICES_JSON_SQL = text("""
+SELECT row_to_json(r)::text
+FROM (
+    SELECT
+        i.id,
+        i.client,
+        c.phone,
+        i.status,
+        i.paid_amount,
+        to_char(i.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US"+00:00"') AS created_at,
+        i.invoice_number,
+        i.seller_employee_id,
+        i.seller_name,
+        COALESCE(it.items, '[]')::json AS items
+    FROM invoices i
+    LEFT JOIN clients c ON c.id = i.client_id
+    LEFT JOIN LATERAL (
+        SELECT '[' || string_agg(row_to_json(t)::text, ',' ORDER BY x.id) || ']' AS items
+        FROM items x, LATERAL (SELECT x.name, x.quantity, x.price) t
+        WHERE x.invoice_id = i.id
+    ) it ON true
+    WHERE i.user_id = :owner_id
+      AND (CAST(:seller_id AS integer) IS NULL OR i.seller_employee_id = :seller_id)
+    ORDER BY i.id
+) r
+""")
+
+
+def invoices_json_chunks(conn, owner_id: int, seller_employee_id: Optional[int] = None,
+                         batch: int = 500) -> Iterator[bytes]:
+    """JSON-массив накладных порциями байт через серверный курсор на conn."""
+    result = conn.execution_options(stream_results=True, yield_per=batch).execute(
+        INVOICES_JSON_SQL, {"owner_id": owner_id, "seller_id": seller_employee_id}
+    )
+    sep = b"["
+    for part in result.scalars().partitions(batch):
+        yield sep + ",".join(part).encode("utf-8")
+        sep = b","
+    yield b"[]" if sep == b"[" else b"]"
+
+
+def stream_invoices_json(engine, owner_id: int, seller_employee_id: Optional[int] = None) -> Iterator[bytes]:
+    """То же на своём соединении: сессия запроса закрывается до отправки тела."""
+    with engine.connect() as conn:
+        yield from invoices_json_chunks(conn, owner_id, seller_employee_id)
+
+
+def payments(db: Session, invoice_where: list) -> Optional[list]:
+    """Журнал оплат накладной по порядку; None — накладной нет (или она чужая).
+    invoice_where — условия на Invoice (владелец, продавец)."""
+    rows = [
+        {"id": id_, "amount": amount, "paid_at": _utc_iso(paid_at), "employee_id": employee_id}
+        for id_, amount, paid_at, employee_id in db.execute(
+            select(Payment.id, Payment.amount, Payment.paid_at, Payment.employee_id)
+            .join(Invoice, Invoice.id == Payment.invoice_id)
+            .where(*invoice_where)
+            .order_by(Payment.id)
+        )
+    ]
+    if not rows and db.execute(select(Invoice.id).where(*invoice_where)).first() is None:
+        return None
+    return rows
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Номенклатура и сотрудники
+# ───────────────────────────────────────────────────────────────────────────────
+def products(db: Session, owner_id: int, q: Optional[str] = None) -> list:
+    stmt = select(Product.id, Product.name, Product.last_price).where(Product.user_id == owner_id)
+    if q:
+        stmt = stmt.where(func.lower(Product.name).contains(q.lower()))
+    stmt = stmt.order_by(func.lower(Product.name))
+    return [{"id": id_, "name": name, "price": price} for id_, name, price in db.execute(stmt)]
+
+
+def suggest_products(db: Session, owner_id: int, prefix_key: str, limit: int) -> list:
+    """Товары, чей ключ названия начинается с prefix_key (см. product_name_key),
+    самые популярные первыми."""
+    stmt = select(Product.id, Product.name, Product.last_price).where(Product.user_id == owner_id)
+    if prefix_key:
+        pattern = _like_escape(prefix_key) + "%"
+        stmt = stmt.where(func.product_name_key(Product.name).like(pattern))
+    stmt = stmt.order_by(Product.popularity.desc(), Product.id).limit(limit)
+    return [{"id": id_, "name": name, "price": price} for id_, name, price in db.execute(stmt)]
+
+
+def product_prices(db: Session, owner_id: int, product_id: int, date_from=None, date_to=None,
+                   limit: int = 100) -> Optional[list]:
+    """История цен товара, новые первыми; None — товара у арендатора нет.
+    Диапазон — по индексу (product_id, changed_at), владелец проверяется JOIN-ом."""
+    stmt = (
+        select(ProductPrice.changed_at, ProductPrice.price)
+        .join(Product, Product.id == ProductPrice.product_id)
+        .where(ProductPrice.product_id == product_id, Product.user_id == owner_id)
+    )
+    if date_from is not None:
+        stmt = stmt.where(ProductPrice.changed_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(ProductPrice.changed_at <= date_to)
+    stmt = stmt.order_by(ProductPrice.changed_at.desc()).limit(limit)
+    rows = [{"changed_at": _utc_iso(changed_at), "price": price} for changed_at, price in db.execute(stmt)]
+    if not rows:
+        exists = db.execute(
+            select(Product.id).where(Product.id == product_id, Product.user_id == owner_id)
+        ).first()
+        if exists is None:
+            return None
+    return rows
+
+
+def employees(db: Session, owner_id: int) -> list:
+    stmt = (
+        select(Employee.id, Employee.name, Employee.phone, Employee.is_blocked)
+        .where(Employee.owner_id == owner_id)
+        .order_by(Employee.id)
+    )
+    return [
+        {"id": id_, "name": name, "phone": phone, "is_blocked": bool(is_blocked)}
+        for id_, name, phone, is_blocked in db.execute(stmt)
+    ]
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Клиенты
+# ───────────────────────────────────────────────────────────────────────────────
+# триграммный индекс есть, только если при миграции было доступно pg_trgm;
+# проверяем один раз на процесс
+_clients_trgm: Optional[bool] = None
+
+
+def _has_clients_trgm(db: Session) -> bool:
+    global _clients_trgm
+    if _clients_trgm is None:
+        _clients_trgm = bool(db.execute(text("SELECT to_regclass('ix_clients_name_trgm') IS NOT NULL")).scalar())
+    return _clients_trgm
+
+
+def search_clients(db: Session, owner_id: int, q: str, limit: int) -> list:
+    """Клиенты арендатора по телефону или имени, лучшие совпадения первыми.
+    Только цифры (от трёх) — поиск по phone_key: сначала начало номера (с кодом
+    страны 7/8 и без), потом вхождение. Иначе — по имени: начало имени, начало
+    слова, вхождение; с pg_trgm — ещё и похожие (опечатки) по word_similarity."""
+    q = " ".join(q.split())
+    digits = "".join(ch for ch in q if ch.isdigit())
+    stmt = select(Client.id, Client.name, Client.phone).where(Client.user_id == owner_id)
+    if len(digits) >= 3 and not any(ch.isalpha() for ch in q):
+        if len(digits) >= 10:
+            prefixes = [digits[-10:]]
+        elif digits[0] in "78":
+            prefixes = [digits, digits[1:]]
+        else:
+            prefixes = [digits]
+        starts = or_(*(Client.phone_key.like(p + "%") for p in prefixes))
+        stmt = stmt.where(or_(starts, Client.phone_key.contains(digits[-10:]))).order_by(
+            case((starts, 0), else_=1), Client.phone_key, Client.id,
+        )
+    elif q:
+        needle = q.lower()
+        pattern = _like_escape(needle)
+        lowered = func.lower(Client.name)
+        match = lowered.like("%" + pattern + "%")
+        rank = case(
+            (lowered.like(pattern + "%"), 0),
+            (lowered.like("% " + pattern + "%"), 1),
+            (match, 2),
+            else_=3,
+        )
+        if _has_clients_trgm(db):
+            # <% — порог pg_trgm.word_similarity_threshold (0.6 по умолчанию)
+            stmt = stmt.where(or_(match, literal(needle).op("<%")(lowered))).order_by(
+                rank, func.word_similarity(needle, lowered).desc(), Client.name, Client.id,
+            )
+        else:
+            stmt = stmt.where(match).order_by(rank, Client.name, Client.id)
+    else:
+        return []
+    stmt = stmt.limit(limit)
+    return [{"id": id_, "name": name, "phone": phone} for id_, name, phone in db.execute(stmt)]
+
+
+def debtors(db: Session, owner_id: int, limit: int, offset: int = 0) -> list:
+    """Клиенты с долгом, крупнейшие первыми: частичный индекс
+    ix_client_balances_debtors, строки клиентов — по первичному ключу."""
+    stmt = (
+        select(
+            ClientBalance.client_id, Client.name, Client.phone, ClientBalance.invoiced,
+            ClientBalance.paid, ClientBalance.outstanding, ClientBalance.last_activity_at,
+        )
+        .join(Client, Client.id == ClientBalance.client_id)
+        .where(ClientBalance.user_id == owner_id, ClientBalance.outstanding > 0)
+        .order_by(ClientBalance.outstanding.desc(), ClientBalance.client_id)
+        .limit(limit)
+        .offset(offset)
+    )
+    return [
+        {
+            "client_id": client_id,
+            "name": name,
+            "phone": phone,
+            "invoiced": invoiced,
+            "paid": paid,
+            "outstanding": outstanding,
+            "last_activity_at": _utc_iso(last_activity_at),
+        }
+        for client_id, name, phone, invoiced, paid, outstanding, last_activity_at in db.execute(stmt)
+    ]
@@ -0,0 +1,77 @@
+# responses.py
+#
+# Быстрый JSON-ответ на orjson + MessagePack по запросу клиента.
+# orjson сам пишет UTF-8 (кириллица без \u-экранирования) и сериализует datetime,
+# поэтому отдельный ensure_ascii/isoformat не нужен.
+import contextvars
+from datetime import date, datetime
+from typing import Any
+
+import orjson
+from starlette.responses import JSONResponse
+
+try:  # MessagePack — опционально: без пакета всегда отвечаем JSON
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json; charset=utf-8"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_ACCEPT = ("application/msgpack", "application/x-msgpack")
+
+# Accept текущего запроса; выставляется NegotiationMiddleware
+_accept: contextvars.ContextVar[str] = contextvars.ContextVar("accept", default="")
+
+
+def wants_msgpack() -> bool:
+    """Клиент текущего запроса просит MessagePack (и пакет установлен)."""
+    if msgpack is None:
+        return False
+    accept = _accept.get()
+    return any(m in accept for m in _MSGPACK_ACCEPT)
+
+
+def _msgpack_default(obj: Any):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON через orjson; при Accept: application/msgpack — MessagePack."""
+
+    media_type = JSON_MEDIA_TYPE
+
+    def __init__(self, content: Any = None, status_code: int = 200, headers=None,
+                 media_type=None, background=None):
+        if media_type is None and wants_msgpack():
+            media_type = MSGPACK_MEDIA_TYPE
+        super().__init__(content, status_code, headers, media_type, background)
+        if msgpack is not None:
+            self.headers.add_vary_header("Accept")
+
+    def render(self, content: Any) -> bytes:
+        if self.media_type == MSGPACK_MEDIA_TYPE:
+            return msgpack.packb(content, default=_msgpack_default, use_bin_type=True)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class NegotiationMiddleware:
+    """Запоминает заголовок Accept, чтобы класс ответа выбрал формат."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept":
+                accept = value.decode("latin-1")
+                break
+        token = _accept.set(accept)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _accept.reset(token)
@@ -4,18 +4,16 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
-from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
-from jose import jwt
 import re
 
 from database import get_db
 from models import User, Subscription, Employee
+from querybudget import query_budget
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # 🔐 JWT
 SECRET_KEY = "super-secret-key"
@@ -24,6 +22,19 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 день
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
+# passlib и jose импортируются при первом использовании, а не при старте:
+# на холодном старте это ~60 мс до первого ответа
+_pwd_context = None
+
+
+def get_pwd_context():
+    """bcrypt-контекст passlib (один на процесс)."""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
 
 # ───────────────────────────────────────────────────────────────────────────────
 # ВСПОМОГАТЕЛЬНОЕ: нормализация телефонов
@@ -32,10 +43,14 @@ def norm_phone(s: Optional[str]) -> str:
     """Оставляем только цифры."""
     return re.sub(r"\D+", "", s or "")
 
+def phone_key(s: Optional[str]) -> str:
+    """Ключ телефона: последние 10 цифр (без кода страны, +7 и 8 — одно и то же)."""
+    return norm_phone(s)[-10:]
+
 def eq_phone(a: str, b: str) -> bool:
     """Сравниваем по последним 10 цифрам (без кода страны)."""
-    na = norm_phone(a)[-10:]
-    nb = norm_phone(b)[-10:]
+    na = phone_key(a)
+    nb = phone_key(b)
     return bool(na) and na == nb
 
 
@@ -68,12 +83,13 @@ class EmployeeLoginRequest(BaseModel):
 # Регистрация владельца
 # ───────────────────────────────────────────────────────────────────────────────
 @router.post("/register/")
+@query_budget(3)
 def register_user(data: RegisterRequest, db: Session = Depends(get_db)):
     existing = db.query(User).filter(User.phone == data.phone).first()
     if existing:
         raise HTTPException(status_code=400, detail="Пользователь с таким номером уже существует")
 
-    hashed = pwd_context.hash(data.password)
+    hashed = get_pwd_context().hash(data.password)
     user = User(
         name=data.name,
         company=data.company,
@@ -83,8 +99,7 @@ def register_user(data: RegisterRequest, db: Session = Depends(get_db)):
         terms_accepted_at=data.terms_accepted_at,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    db.flush()  # INSERT ... RETURNING id
 
     # бесплатная подписка на 14 дней
     sub = Subscription(
@@ -95,7 +110,6 @@ def register_user(data: RegisterRequest, db: Session = Depends(get_db)):
     )
     db.add(sub)
     db.commit()
-    db.refresh(sub)
 
     return {
         "message": "Пользователь успешно зарегистрирован",
@@ -109,6 +123,8 @@ def register_user(data: RegisterRequest, db: Session = Depends(get_db)):
 # ───────────────────────────────────────────────────────────────────────────────
 @router.post("/login")
 def login_any(data: LoginRequest, db: Session = Depends(get_db)):
+    from jose import jwt
+    pwd_context = get_pwd_context()
     raw_phone = data.phone or ""
     # допускаем, что при создании пароля могли случайно оставить пробелы
     pwd_candidates = [data.password, data.password.strip()]
@@ -140,7 +156,7 @@ def login_any(data: LoginRequest, db: Session = Depends(get_db)):
                 return {"access_token": token, "token_type": "bearer"}
 
     # 3) Толерантный поиск по последним 10 цифрам (если форматы различаются)
-    last10 = norm_phone(raw_phone)[-10:]
+    last10 = phone_key(raw_phone)
     if last10:
         # кандидаты-владельцы
         cand_users = db.query(User).filter(
@@ -191,6 +207,7 @@ def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
 ) -> User:
+    from jose import jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         sub = payload.get("sub")
@@ -210,6 +227,7 @@ def get_current_employee(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
 ) -> Employee:
+    from jose import jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         sub = payload.get("sub", "")
@@ -232,6 +250,7 @@ def get_actor(
     db: Session = Depends(get_db),
 ) -> Dict[str, Any]:
     """Универсальный резолвер: владелец или сотрудник по токену."""
+    from jose import jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         sub = payload.get("sub", "")
@@ -259,6 +278,7 @@ def get_actor(
 # Профиль
 # ───────────────────────────────────────────────────────────────────────────────
 @router.get("/me")
+@query_budget(2)
 def get_me(
     actor: Dict[str, Any] = Depends(get_actor),
     db: Session = Depends(get_db),
@@ -297,6 +317,7 @@ def get_me(
 # Обновление профиля владельца
 # ───────────────────────────────────────────────────────────────────────────────
 @router.put("/me")
+@query_budget(2)
 def update_me(
     data: UpdateUserRequest,
     current_user: User = Depends(get_current_user),
@@ -310,5 +331,4 @@ def update_me(
         current_user.email = data.email
 
     db.commit()
-    db.refresh(current_user)
     return {"message": "Профиль обновлён"}
\ No newline at end of file
@@ -0,0 +1,108 @@
+# routes/clients.py
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from typing import List, Optional
+
+from database import get_db
+from routes.auth import get_actor  # {"role": "user"/"employee", ...}
+from routes.products import _owner_user_id
+from querybudget import query_budget
+from deadlines import deadline
+from responses import FastJSONResponse
+import client_io
+import reads
+
+router = APIRouter(prefix="/clients", tags=["clients"])
+
+class ClientOut(BaseModel):
+    id: int
+    name: str
+    phone: str
+
+class DebtorOut(BaseModel):
+    client_id: int
+    name: str
+    phone: str
+    invoiced: int
+    paid: int
+    outstanding: int
+    last_activity_at: Optional[str]
+
+class ContactIn(BaseModel):
+    name: Optional[str] = None
+    phone: str
+
+class ClientSyncIn(BaseModel):
+    contacts: List[ContactIn]
+
+class ClientSyncError(BaseModel):
+    index: int
+    error: str
+
+class ClientSyncId(BaseModel):
+    index: int
+    phone: str
+    id: int
+
+class ClientSyncReport(BaseModel):
+    received: int
+    inserted: int
+    existing: int
+    duplicates: int
+    rejected: int
+    errors: List[ClientSyncError]
+    clients: List[ClientSyncId]
+
+# ───────────────────────────────────────────────────────────────────────────────
+# GET /clients/search?q=…  — автодополнение покупателя (телефон или имя)
+# ───────────────────────────────────────────────────────────────────────────────
+@router.get("/search", response_model=List[ClientOut])
+@query_budget(3)
+@deadline(2)
+def search_clients(
+    q: str = Query("", max_length=100, description="Телефон (цифры) или имя"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    actor = Depends(get_actor),
+):
+    """Покупатели арендатора для автодополнения: по цифрам — по номеру
+    (+7 и 8 не важны), иначе по имени. Запросы: актор, поиск (+ один раз
+    на процесс — проверка триграммного индекса)."""
+    return FastJSONResponse(reads.search_clients(db, _owner_user_id(actor), q, limit))
+
+# ───────────────────────────────────────────────────────────────────────────────
+# GET /clients/debtors?limit=…  — должники арендатора, крупнейший долг первым
+# ───────────────────────────────────────────────────────────────────────────────
+@router.get("/debtors", response_model=List[DebtorOut])
+@query_budget(2)
+@deadline(5)
+def list_debtors(
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    actor = Depends(get_actor),
+):
+    """Из client_balances по частичному индексу долга — без агрегации накладных."""
+    return FastJSONResponse(reads.debtors(db, _owner_user_id(actor), limit, offset))
+
+# ───────────────────────────────────────────────────────────────────────────────
+# POST /clients/bulk — синхронизация адресной книги
+# ───────────────────────────────────────────────────────────────────────────────
+@router.post("/bulk", response_model=ClientSyncReport)
+@query_budget(4)
+@deadline(30)
+def sync_clients(
+    data: ClientSyncIn,
+    db: Session = Depends(get_db),
+    actor = Depends(get_actor),
+):
+    """Контакты телефона → клиенты арендатора одним слиянием. Новые номера
+    добавляются, существующие клиенты не меняются; в ответе — id клиента для
+    каждого принятого контакта (index — позиция в запросе). Запросы: актор,
+    временная таблица, INSERT ... ON CONFLICT, выборка id (COPY — мимо счётчика)."""
+    if len(data.contacts) > client_io.MAX_CONTACTS:
+        raise HTTPException(status_code=413,
+                            detail=f"Слишком много контактов: не больше {client_io.MAX_CONTACTS}")
+    report = client_io.sync_clients(db, _owner_user_id(actor), ((c.name, c.phone) for c in data.contacts))
+    return FastJSONResponse(report)
@@ -2,17 +2,19 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from passlib.context import CryptContext
+from sqlalchemy import delete, func, select, update
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
-from database import get_db
-from models import Employee, User, Invoice, Item
-from routes.auth import get_current_user  # только владелец
+from database import get_db, update_returning
+from models import Employee, User, Invoice
+from routes.auth import get_current_user, get_pwd_context  # только владелец
+from querybudget import query_budget
+from deadlines import deadline
+from responses import FastJSONResponse
+import reads
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 router = APIRouter(prefix="/employees", tags=["employees"])
 
 # Pydantic-схемы
@@ -37,14 +39,17 @@ class EmployeeUpdatePassword(BaseModel):
 
 # GET /employees — список сотрудников владельца
 @router.get("/", response_model=List[EmployeeOut])
+@query_budget(2)
+@deadline(5)
 def list_employees(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    return db.query(Employee).filter(Employee.owner_id == current_user.id).all()
+    return FastJSONResponse(reads.employees(db, current_user.id))
 
 # POST /employees — создать сотрудника
 @router.post("/", response_model=EmployeeOut, status_code=status.HTTP_201_CREATED)
+@query_budget(3)
 def create_employee(
     data: EmployeeCreate,
     db: Session = Depends(get_db),
@@ -56,86 +61,94 @@ def create_employee(
         owner_id=current_user.id,
         name=data.name,
         phone=data.phone,
-        password_hash=pwd_context.hash(data.password),
+        password_hash=get_pwd_context().hash(data.password),
     )
     db.add(emp)
     db.commit()
-    db.refresh(emp)
     return emp
 
 # PUT /employees/{emp_id}/phone — смена телефона
 @router.put("/{emp_id}/phone", response_model=EmployeeOut)
+@query_budget(2)
 def update_phone(
     emp_id: int,
     data: EmployeeUpdatePhone,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    emp = db.query(Employee).filter_by(id=emp_id, owner_id=current_user.id).first()
+    emp = update_returning(db, Employee, Employee.id == emp_id, Employee.owner_id == current_user.id,
+                           phone=data.phone)
     if not emp:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
-    emp.phone = data.phone
     db.commit()
-    db.refresh(emp)
     return emp
 
 # PUT /employees/{emp_id}/password — смена пароля
 @router.put("/{emp_id}/password", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(3)
 def update_password(
     emp_id: int,
     data: EmployeeUpdatePassword,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    emp = db.query(Employee).filter_by(id=emp_id, owner_id=current_user.id).first()
-    if not emp:
+    # сначала проверка владельца, потом bcrypt (~0.3 с CPU): чужой или
+    # несуществующий id не должен стоить хэширования
+    where = (Employee.id == emp_id, Employee.owner_id == current_user.id)
+    if db.execute(select(Employee.id).where(*where)).first() is None:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
-    emp.password_hash = pwd_context.hash(data.password)
+    db.execute(update(Employee).where(*where).values(password_hash=get_pwd_context().hash(data.password)))
     db.commit()
 
 # POST /employees/{emp_id}/block — блокировка
 @router.post("/{emp_id}/block", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(2)
 def block_employee(
     emp_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    emp = db.query(Employee).filter_by(id=emp_id, owner_id=current_user.id).first()
+    emp = update_returning(db, Employee, Employee.id == emp_id, Employee.owner_id == current_user.id,
+                           is_blocked=True)
     if not emp:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
-    emp.is_blocked = True
     db.commit()
 
 # POST /employees/{emp_id}/unblock — разблокировка
 @router.post("/{emp_id}/unblock", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(2)
 def unblock_employee(
     emp_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    emp = db.query(Employee).filter_by(id=emp_id, owner_id=current_user.id).first()
+    emp = update_returning(db, Employee, Employee.id == emp_id, Employee.owner_id == current_user.id,
+                           is_blocked=False)
     if not emp:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
-    emp.is_blocked = False
     db.commit()
 
 # DELETE /employees/{emp_id} — удалить
 @router.delete("/{emp_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(2)
 def delete_employee(
     emp_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    emp = db.query(Employee).filter_by(id=emp_id, owner_id=current_user.id).first()
-    if not emp:
+    deleted = db.execute(
+        delete(Employee).where(Employee.id == emp_id, Employee.owner_id == current_user.id)
+    ).rowcount
+    if not deleted:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
-    db.delete(emp)
     db.commit()
 
 # -------------------------
 # GET /employees/stats — агрегаты по продавцам
 # -------------------------
 @router.get("/stats")
+@query_budget(2)
+@deadline(10)
 def employees_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -144,13 +157,14 @@ def employees_stats(
 ):
     """
     Агрегированные продажи по каждому продавцу (включая владельца, если seller_employee_id = NULL):
-      - total_sum: сумма (quantity*price)
+      - total_sum: сумма накладных (invoices.amount)
       - total_invoices: кол-во чеков
-      - total_paid: оплачено
+      - total_paid: оплачено (invoices.paid_amount — итог журнала оплат)
       - total_debt: долг = max(sum - paid, 0)
+    Одна таблица, без JOIN позиций: раньше JOIN умножал paid_amount на число позиций.
     """
-    gross_sum = func.coalesce(func.sum(Item.quantity * Item.price), 0).label("total_sum")
-    invoice_count = func.count(func.distinct(Invoice.id)).label("total_invoices")
+    gross_sum = func.coalesce(func.sum(Invoice.amount), 0).label("total_sum")
+    invoice_count = func.count(Invoice.id).label("total_invoices")
     paid_sum = func.coalesce(func.sum(Invoice.paid_amount), 0).label("total_paid")
 
     q = (
@@ -161,7 +175,6 @@ def employees_stats(
             invoice_count,
             paid_sum,
         )
-        .outerjoin(Item, Item.invoice_id == Invoice.id)
         .filter(Invoice.user_id == current_user.id)
     )
 
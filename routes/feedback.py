@@ -6,6 +6,7 @@ from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 from routes.auth import get_current_user
+from querybudget import query_budget
 
 router = APIRouter()
 
@@ -21,6 +22,7 @@ class FeedbackCreate(BaseModel):
     name: Optional[str] = None
 
 @router.post("/feedback/")
+@query_budget(2)
 def submit_feedback(
     feedback: FeedbackCreate,
     db: Session = Depends(get_db),
@@ -36,5 +38,4 @@ def submit_feedback(
     )
     db.add(fb)
     db.commit()
-    db.refresh(fb)
     return {"message": "Спасибо за ваш отзыв!"}
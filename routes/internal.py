@@ -0,0 +1,114 @@
+# routes/internal.py
+#
+# Внутренние эндпоинты (метрики, диагностика). Закрыты токеном ADMIN_TOKEN:
+# заголовок "Authorization: Bearer <ADMIN_TOKEN>". Без ADMIN_TOKEN — 404.
+import hmac
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response
+from pydantic import BaseModel
+
+import profiling
+import slowlog
+from compression import compression_stats
+from database import engine
+from metrics import render_prometheus
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+router = APIRouter(include_in_schema=False)
+
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    auth = request.headers.get("authorization", "")
+    scheme, _, token = auth.partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Доступ запрещён")
+
+
+def _compression_samples():
+    stats = compression_stats()
+    return {
+        "http_response_compression_responses_total": (
+            "counter", [({"encoding": k}, v["responses"]) for k, v in stats.items()]),
+        "http_response_compression_bytes_in_total": (
+            "counter", [({"encoding": k}, v["bytes_in"]) for k, v in stats.items()]),
+        "http_response_compression_bytes_saved_total": (
+            "counter", [({"encoding": k}, v["bytes_saved"]) for k, v in stats.items()]),
+        "http_response_compression_cpu_seconds_total": (
+            "counter", [({"encoding": k}, v["cpu_seconds"]) for k, v in stats.items()]),
+    }
+
+
+@router.get("/metrics", dependencies=[Depends(require_admin)])
+def prometheus_metrics():
+    return PlainTextResponse(
+        render_prometheus(engine, extra=_compression_samples()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Профилирование
+# ───────────────────────────────────────────────────────────────────────────────
+class ProfileSignRequest(BaseModel):
+    method: str = "GET"
+    path: str
+    ttl: int = 300
+
+
+@router.post("/internal/profile/sign", dependencies=[Depends(require_admin)])
+def sign_profile(req: ProfileSignRequest):
+    """Значение заголовка X-Profile для одного метода и пути."""
+    ttl = max(1, min(req.ttl, 3600))
+    return {"header": "X-Profile", "value": profiling.sign_profile_header(ADMIN_TOKEN, req.method, req.path, ttl)}
+
+
+@router.get("/internal/profiles", dependencies=[Depends(require_admin)])
+def list_profiles():
+    return profiling.list_profiles()
+
+
+@router.get("/internal/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def get_profile(profile_id: str, format: str = Query("text", pattern="^(text|pstats)$"), limit: int = 40):
+    artifact = profiling.profile_artifact(profile_id, format, limit)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    body, media_type = artifact
+    headers = {}
+    if format == "pstats":
+        headers["Content-Disposition"] = f'attachment; filename="profile-{profile_id}.pstats"'
+    return Response(body, media_type=media_type, headers=headers)
+
+
+@router.post("/internal/profiler/start", dependencies=[Depends(require_admin)])
+def start_sampler(seconds: float = Query(10, gt=0, le=300), interval_ms: float = Query(5, ge=1, le=1000)):
+    if not profiling.sampler.start(seconds, interval_ms / 1000):
+        raise HTTPException(status_code=409, detail="Сэмплер уже запущен")
+    return {"started": True, "seconds": seconds, "interval_ms": interval_ms}
+
+
+@router.post("/internal/profiler/stop", dependencies=[Depends(require_admin)])
+def stop_sampler():
+    profiling.sampler.stop()
+    return {"stopped": True}
+
+
+@router.get("/internal/profiler/report", dependencies=[Depends(require_admin)])
+def sampler_report(format: str = Query("json", pattern="^(json|collapsed)$"), top: int = 20):
+    if format == "collapsed":
+        return PlainTextResponse(profiling.sampler.collapsed())
+    return profiling.sampler.summary(top)
+
+
+@router.get("/internal/slow-queries", dependencies=[Depends(require_admin)])
+def slow_queries(limit: int = Query(50, ge=1, le=1000), plans: bool = True):
+    return {
+        "threshold_ms": slowlog.SLOW_QUERY_MS,
+        "explain": slowlog.EXPLAIN,
+        "analyze": slowlog.ANALYZE,
+        "entries": slowlog.slow_queries(limit, plans),
+    }
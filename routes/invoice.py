@@ -1,14 +1,21 @@
 # routes/invoice.py
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from database import SessionLocal
-from models import Invoice, Item, Client, Employee, Product
-from pydantic import BaseModel
+from sqlalchemy import Integer, case, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database import SessionLocal, engine
+from models import Invoice, Item, Client, Employee, Payment
+from pydantic import BaseModel, Field
 from typing import List, Optional
-from datetime import datetime, timezone
-from fastapi.responses import HTMLResponse
-from routes.auth import get_actor
+from datetime import datetime
+from fastapi.responses import HTMLResponse, StreamingResponse
+from routes.auth import get_actor, phone_key
+from routes.products import product_name_key, upsert_products
+from querybudget import query_budget
+from deadlines import deadline
+from responses import JSON_MEDIA_TYPE, FastJSONResponse, wants_msgpack
+import balances
+import reads
 
 router = APIRouter()
 
@@ -27,59 +34,70 @@ class ItemCreate(BaseModel):
 class InvoiceCreate(BaseModel):
     client: str
     phone: str
-    status: str
+    status: Optional[str] = None  # не используется: статус выводится из оплаты
     paid_amount: Optional[int] = 0
     items: List[ItemCreate]
 
+class PaymentCreate(BaseModel):
+    amount: int = Field(gt=0)
+
+class PaymentOut(BaseModel):
+    id: int
+    amount: int
+    paid_at: Optional[str]
+    employee_id: Optional[int]
+
 class FeedbackCreate(BaseModel):
     message: str
     name: Optional[str] = None
 
 def generate_invoice_number(db, client_id: int):
+    # следующий после наибольшего номера клиента за год, а не «количество + 1»:
+    # после слияния и деления клиентов (и удалений) номера идут с пропусками
     year = datetime.now().year
-    count = db.query(func.count()).select_from(Invoice).filter(
+    prefix = f"№{str(client_id).zfill(4)}/{year}/"
+    last = db.query(
+        func.max(func.split_part(Invoice.invoice_number, "/", 3).cast(Integer))
+    ).filter(
         Invoice.client_id == client_id,
-        func.extract('year', Invoice.created_at) == year
+        Invoice.invoice_number.startswith(prefix, autoescape=True),
     ).scalar() or 0
-    return f"№{str(client_id).zfill(4)}/{year}/{count + 1}"
-
-# upsert в номенклатуру по user_id, учитываем last_price
-def upsert_product(db: Session, owner_user_id: int, name: str, price: int):
-    name = (name or "").strip()
-    if not name:
-        return
-    product = db.query(Product).filter(
-        Product.user_id == owner_user_id,
-        func.lower(Product.name) == name.lower()
-    ).first()
-    if product:
-        product.last_price = price
-        product.updated_at = datetime.utcnow()
-    else:
-        db.add(Product(
-            user_id=owner_user_id,
-            name=name,
-            last_price=price,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
-        ))
+    return f"{prefix}{last + 1}"
+
+def resolve_client(db, owner_id: int, name: str, phone: str) -> int:
+    """id клиента арендатора по ключу телефона; нового — вставкой. Параллельная
+    вставка того же номера не падает: ON CONFLICT вернёт существующий id."""
+    key = phone_key(phone)
+    client_id = db.execute(
+        select(Client.id).where(Client.user_id == owner_id, Client.phone_key == key)
+    ).scalar()
+    if client_id is None:
+        stmt = pg_insert(Client).values(user_id=owner_id, name=name, phone=phone, phone_key=key)
+        client_id = db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[Client.user_id, Client.phone_key],
+                set_={"phone_key": stmt.excluded.phone_key},
+            ).returning(Client.id)
+        ).scalar_one()
+    return client_id
 
 @router.post("/invoices/")
+@query_budget(10)
+@deadline(10)
 def create_invoice(
     invoice: InvoiceCreate,
     db: Session = Depends(get_db),
     actor = Depends(get_actor),
 ):
+    # запросы: актор, клиент (+ вставка), номер, накладная (+ начальная оплата),
+    # баланс клиента, номенклатура (версия, upsert), позиции; один commit, без refresh
+    amount = sum(item.quantity * item.price for item in invoice.items)
+    paid_amount = invoice.paid_amount or 0
+    if paid_amount < 0:
+        raise HTTPException(status_code=400, detail="Оплата не может быть отрицательной")
+    if paid_amount > amount:
+        raise HTTPException(status_code=400, detail=f"Оплата больше суммы накладной: {amount}")
     try:
-        client = db.query(Client).filter_by(phone=invoice.phone).first()
-        if not client:
-            client = Client(name=invoice.client, phone=invoice.phone)
-            db.add(client)
-            db.commit()
-            db.refresh(client)
-
-        invoice_number = generate_invoice_number(db, client.id)
-
         if actor["role"] == "user":
             owner_id = actor["user"].id
             seller_employee_id = None
@@ -90,29 +108,41 @@ def create_invoice(
             seller_employee_id = emp.id
             seller_name = emp.name
 
+        # 👇 клиент — из справочника арендатора, «+7 701…» и «8701…» — один клиент
+        client_id = resolve_client(db, owner_id, invoice.client, invoice.phone)
+        invoice_number = generate_invoice_number(db, client_id)
+
+        created_at = datetime.utcnow()   # <— UTC
         db_invoice = Invoice(
             client=invoice.client,
-            client_id=client.id,
+            client_id=client_id,
+            amount=amount,
             invoice_number=invoice_number,
-            status=invoice.status,
-            paid_amount=invoice.paid_amount or 0,
-            created_at=datetime.utcnow(),   # <— UTC
+            status=invoice_status(paid_amount, amount),
+            paid_amount=paid_amount,
+            created_at=created_at,
             user_id=owner_id,
             seller_employee_id=seller_employee_id,
             seller_name=seller_name,
         )
         db.add(db_invoice)
-        db.commit()
-        db.refresh(db_invoice)
-
-        for item in invoice.items:
-            db.add(Item(
-                invoice_id=db_invoice.id,
-                name=item.name,
-                quantity=item.quantity,
-                price=item.price
+        db.flush()
+        if db_invoice.paid_amount > 0:
+            # оплата при создании — первая запись журнала
+            db.execute(insert(Payment).values(
+                invoice_id=db_invoice.id, user_id=owner_id, employee_id=seller_employee_id,
+                amount=db_invoice.paid_amount, paid_at=created_at,
             ))
-            upsert_product(db, owner_user_id=owner_id, name=item.name, price=item.price)
+        balances.apply(db, owner_id, client_id, created_at, invoiced=amount, paid=db_invoice.paid_amount)
+
+        # сначала номенклатура: позициям нужны id товаров
+        product_ids = upsert_products(db, owner_id, invoice.items)
+        if invoice.items:
+            db.execute(insert(Item), [
+                {"invoice_id": db_invoice.id, "name": item.name, "quantity": item.quantity, "price": item.price,
+                 "product_id": product_ids.get(product_name_key(item.name))}
+                for item in invoice.items
+            ])
 
         db.commit()
 
@@ -131,42 +161,23 @@ def create_invoice(
 
 def _list_invoices(db: Session, actor, seller_employee_id: Optional[int]):
     if actor["role"] == "user":
-        q = db.query(Invoice).filter(Invoice.user_id == actor["user"].id)
-        if seller_employee_id is not None:
-            q = q.filter(Invoice.seller_employee_id == seller_employee_id)
-        invoices = q.all()
+        owner_id = actor["user"].id
     else:
         emp: Employee = actor["employee"]
-        invoices = db.query(Invoice).filter(
-            Invoice.user_id == emp.owner_id,
-            Invoice.seller_employee_id == emp.id
-        ).all()
-
-    result = []
-    for inv in invoices:
-        # помечаем как UTC, чтобы фронт корректно toLocal()
-        created_iso = None
-        if inv.created_at:
-            created_iso = inv.created_at.replace(tzinfo=timezone.utc).isoformat()
-
-        result.append({
-            "id": inv.id,
-            "client": inv.client,
-            "phone": inv.client_rel.phone if inv.client_rel else None,
-            "status": inv.status,
-            "paid_amount": inv.paid_amount,
-            "created_at": created_iso,
-            "invoice_number": inv.invoice_number,
-            "seller_employee_id": getattr(inv, "seller_employee_id", None),
-            "seller_name": getattr(inv, "seller_name", None),
-            "items": [
-                {"name": item.name, "quantity": item.quantity, "price": item.price}
-                for item in inv.items
-            ],
-        })
-    return result
+        owner_id, seller_employee_id = emp.owner_id, emp.id
+
+    # READ_MODE_INVOICES=postgres — JSON собирает Postgres, MessagePack — всегда Python
+    if reads.read_mode("invoices") == "postgres" and not wants_msgpack():
+        return StreamingResponse(
+            reads.stream_invoices_json(engine, owner_id, seller_employee_id),
+            media_type=JSON_MEDIA_TYPE,
+        )
+    # Core-выборка колонок без ORM-сущностей: 2 запроса на любой размер списка
+    return FastJSONResponse(reads.invoices(db, owner_id, seller_employee_id))
 
 @router.get("/invoices/")
+@query_budget(3)
+@deadline(15)
 def get_invoices_slash(
     db: Session = Depends(get_db),
     actor = Depends(get_actor),
@@ -175,6 +186,8 @@ def get_invoices_slash(
     return _list_invoices(db, actor, seller_employee_id)
 
 @router.get("/invoices")
+@query_budget(3)
+@deadline(15)
 def get_invoices_no_slash(
     db: Session = Depends(get_db),
     actor = Depends(get_actor),
@@ -182,6 +195,91 @@ def get_invoices_no_slash(
 ):
     return _list_invoices(db, actor, seller_employee_id)
 
+# ───────────────────────────────────────────────────────────────────────────────
+# Оплаты: журнал payments только пополняется, paid_amount/status накладной —
+# его итог. UPDATE ... RETURNING увеличивает итог и блокирует строку накладной:
+# параллельные оплаты одной накладной проходят по очереди, и каждая видит
+# итог предыдущей (READ COMMITTED перечитывает строку после блокировки).
+# ───────────────────────────────────────────────────────────────────────────────
+STATUS_UNPAID = "не оплачен"
+STATUS_PAID = "оплачен"
+STATUS_PARTIAL = "частично оплачен"
+
+def invoice_status(paid: int, amount: int) -> str:
+    """Статус по оплате — то же правило, что в UPDATE оплаты ниже."""
+    if paid == 0:
+        return STATUS_UNPAID
+    return STATUS_PAID if paid >= amount else STATUS_PARTIAL
+
+def _invoice_scope(actor, invoice_id: int):
+    """(владелец, условия): сотрудник видит только свои накладные, как в списке."""
+    if actor["role"] == "user":
+        owner_id = actor["user"].id
+        return owner_id, [Invoice.id == invoice_id, Invoice.user_id == owner_id]
+    emp: Employee = actor["employee"]
+    return emp.owner_id, [Invoice.id == invoice_id, Invoice.user_id == emp.owner_id,
+                          Invoice.seller_employee_id == emp.id]
+
+@router.post("/invoices/{invoice_id}/payments")
+@query_budget(5)
+@deadline(10)
+def add_payment(
+    invoice_id: int,
+    data: PaymentCreate,
+    db: Session = Depends(get_db),
+    actor = Depends(get_actor),
+):
+    # запросы: актор, накладная (UPDATE), оплата, баланс клиента;
+    # отказ — ещё одна выборка, чтобы отличить 404 от переплаты
+    owner_id, where = _invoice_scope(actor, invoice_id)
+    employee_id = actor["employee"].id if actor["role"] == "employee" else None
+    paid = func.coalesce(Invoice.paid_amount, 0) + data.amount
+    row = db.execute(
+        update(Invoice)
+        .where(*where, paid <= Invoice.amount)
+        .values(paid_amount=paid, status=case((paid >= Invoice.amount, STATUS_PAID), else_=STATUS_PARTIAL))
+        .returning(Invoice.client_id, Invoice.amount, Invoice.paid_amount, Invoice.status),
+        execution_options={"synchronize_session": False},
+    ).first()
+    if row is None:
+        db.rollback()
+        current = db.execute(select(Invoice.amount, Invoice.paid_amount).where(*where)).first()
+        if current is None:
+            raise HTTPException(status_code=404, detail="Накладная не найдена")
+        rest = max(current.amount - (current.paid_amount or 0), 0)
+        raise HTTPException(status_code=400, detail=f"Сумма больше остатка по накладной: {rest}")
+
+    paid_at = datetime.utcnow()
+    payment_id = db.execute(
+        insert(Payment).values(invoice_id=invoice_id, user_id=owner_id, employee_id=employee_id,
+                               amount=data.amount, paid_at=paid_at)
+        .returning(Payment.id)
+    ).scalar_one()
+    balances.apply(db, owner_id, row.client_id, paid_at, paid=data.amount)
+    db.commit()
+    return {
+        "payment_id": payment_id,
+        "invoice_id": invoice_id,
+        "amount": data.amount,
+        "paid_amount": row.paid_amount,
+        "outstanding": row.amount - row.paid_amount,
+        "status": row.status,
+    }
+
+@router.get("/invoices/{invoice_id}/payments", response_model=List[PaymentOut])
+@query_budget(3)
+@deadline(5)
+def list_payments(
+    invoice_id: int,
+    db: Session = Depends(get_db),
+    actor = Depends(get_actor),
+):
+    _, where = _invoice_scope(actor, invoice_id)
+    rows = reads.payments(db, where)
+    if rows is None:
+        raise HTTPException(status_code=404, detail="Накладная не найдена")
+    return FastJSONResponse(rows)
+
 @router.get("/invoice/{invoice_id}", response_class=HTMLResponse)
 def public_invoice_page(invoice_id: int):
     db = SessionLocal()
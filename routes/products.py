@@ -1,13 +1,28 @@
 # routes/products.py
-from fastapi import APIRouter, Depends, HTTPException, Query
+import math
+import os
+
+import anyio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import DateTime, Integer, case, func, insert, literal, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
+from datetime import datetime
 from pydantic import BaseModel
 
-from database import get_db
-from models import Product, Employee
+from database import engine, get_db, update_returning
+from models import Product, ProductPrice, Employee
 from routes.auth import get_actor  # {"role": "user"/"employee", ...}
+from querybudget import query_budget
+from deadlines import deadline
+from responses import FastJSONResponse
+import catalog
+import product_io
+import reads
 
 router = APIRouter(prefix="/products", tags=["products"])
 
@@ -29,52 +44,308 @@ def _owner_user_id(actor) -> int:
         emp: Employee = actor["employee"]
         return emp.owner_id
 
+# ───────────────────────────────────────────────────────────────────────────────
+# Запись номенклатуры
+# Одно название на арендатора гарантирует уникальный индекс
+# (user_id, product_name_key(name)): без проверочных SELECT, конфликт
+# разрешает INSERT ... ON CONFLICT, параллельный дубль не роняет запрос.
+# ───────────────────────────────────────────────────────────────────────────────
+NAME_KEY_INDEX = "ux_products_user_id_name_key"
+NAME_KEY = [Product.user_id, func.product_name_key(Product.name)]
+
+def clean_name(name: Optional[str]) -> str:
+    """Название для записи: без пробелов по краям и повторных пробелов."""
+    return " ".join((name or "").split())
+
+def product_name_key(name: Optional[str]) -> str:
+    """То же, что SQL product_name_key(): пробелы, ё → е, регистр."""
+    return clean_name(name).replace("ё", "е").replace("Ё", "Е").lower()
+
+def _violated_constraint(e: IntegrityError) -> Optional[str]:
+    return getattr(getattr(e.orig, "diag", None), "constraint_name", None)
+
+# есть ли в пачке новый товар или другая цена — проверяется вместе с версией
+_CATALOG_CHANGED = text("""
+    EXISTS (
+        SELECT 1
+        FROM unnest(CAST(:names AS text[]), CAST(:prices AS integer[])) AS n(name, price)
+        LEFT JOIN products p
+               ON p.user_id = :owner_id AND product_name_key(p.name) = product_name_key(n.name)
+        WHERE p.id IS NULL OR p.last_price IS DISTINCT FROM n.price
+    )
+""")
+
+# Популярность: затухающий счёт продаж в лог-шкале (миграция b8f1c4d2e6a7).
+# Продажа в момент t добавляет exp(sale_weight(t)), в колонке — ln суммы;
+# порядок товаров по ней со временем не меняется, индекс не пересчитывается.
+POPULARITY_EPOCH = datetime(2025, 1, 1)
+POPULARITY_HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", "30"))
+
+def sale_weight(at: datetime) -> float:
+    return (at - POPULARITY_EPOCH).total_seconds() * math.log(2) / (POPULARITY_HALF_LIFE_DAYS * 86400)
+
+def _log_add(a, b):
+    """ln(exp(a) + exp(b)) без переполнения; a = -inf (продаж не было) даёт b.
+    Разница весов ограничена: exp() в Postgres при исчезающе малом
+    результате падает с underflow, а не возвращает 0."""
+    return func.greatest(a, b) + func.ln(1 + func.exp(-func.least(func.abs(a - b), 700)))
+
+def _price_history(rows):
+    """INSERT INTO product_prices из select (product_id, changed_at, price)."""
+    return insert(ProductPrice).from_select(["product_id", "changed_at", "price"], rows)
+
+def upsert_products(db: Session, owner_user_id: int, items) -> dict:
+    """Позиции накладной → номенклатура: новые товары вставляются, у
+    существующих — last_price и счётчики продаж, изменившиеся цены — в историю.
+    Два запроса: новая версия номенклатуры (только если меняется цена или есть
+    новый товар) и один INSERT ... ON CONFLICT DO UPDATE на всю пачку; если
+    цену между ними сменила параллельная накладная — ещё два.
+    Возвращает {product_name_key(название): id товара} для items.product_id."""
+    prices = {}  # ключ названия -> (name, price); при повторах побеждает последняя позиция
+    for item in items:
+        name = clean_name(item.name)
+        if name:
+            prices[product_name_key(name)] = (name, item.price)
+    if not prices:
+        return {}
+    rows = [prices[key] for key in sorted(prices)]  # один порядок блокировок строк у всех
+
+    version = catalog.bump_version_if(db, owner_user_id, _CATALOG_CHANGED.bindparams(
+        owner_id=owner_user_id, names=[n for n, _ in rows], prices=[p for _, p in rows],
+    ))
+
+    now = datetime.utcnow()
+    weight = sale_weight(now)
+    stmt = pg_insert(Product).values([
+        {"user_id": owner_user_id, "name": name, "last_price": price,
+         "created_at": now, "updated_at": now,
+         # версии нет — проверка не нашла изменений; если они всё же будут
+         # (гонка, см. ниже), версию строки выставит догоняющий bump
+         "catalog_version": version or 0,
+         "sale_count": 1, "last_sold_at": now, "popularity": weight}
+        for name, price in rows
+    ])
+    new = stmt.excluded
+    price_changed = Product.last_price.is_distinct_from(new.last_price)
+    upsert = stmt.on_conflict_do_update(
+        index_elements=NAME_KEY,
+        set_={
+            "last_price": new.last_price,
+            "updated_at": case((price_changed, new.updated_at), else_=Product.updated_at),
+            # без новой версии catalog_version строки не трогаем (0 откатил бы её назад)
+            "catalog_version": (case((price_changed, new.catalog_version), else_=Product.catalog_version)
+                                if version is not None else Product.catalog_version),
+            "sale_count": Product.sale_count + 1,
+            "last_sold_at": new.last_sold_at,
+            "popularity": _log_add(Product.popularity, new.popularity),
+        },
+    )
+    # ключ ответа — Python product_name_key() от названия товара в базе: тот же,
+    # по которому его ищут вызывающие, даже где SQL-ключ разошёлся бы с ним
+    # (lower() для редких букв, классы пробелов)
+    upsert = upsert.returning(Product.id, Product.name,
+                              Product.updated_at, Product.last_price, Product.catalog_version)
+    if version is None:
+        result = db.execute(upsert).all()
+        # проверка шла без блокировки арендатора: параллельная накладная могла
+        # успеть сменить цену, и наш upsert её поменял (или вставил товар) без
+        # новой версии. Такие строки — с updated_at == now; им догоняющим bump-ом
+        # новая версия и запись в историю (ещё 2 запроса, только в этой гонке)
+        changed = [id_ for id_, _, updated_at, *_ in result if updated_at == now]
+        if changed:
+            version = catalog.bump_version(db, owner_user_id)
+            bumped = (
+                update(Product).where(Product.id.in_(changed)).values(catalog_version=version)
+                .returning(Product.id, Product.updated_at, Product.last_price).cte("bumped")
+            )
+            db.execute(_price_history(select(bumped.c.id, bumped.c.updated_at, bumped.c.last_price)))
+    else:
+        # новые товары и сменившие цену — те, кому досталась новая версия; их
+        # цены — в историю тем же запросом
+        up = upsert.cte("up")
+        history = _price_history(
+            select(up.c.id, up.c.updated_at, up.c.last_price).where(up.c.catalog_version == version)
+        ).cte("history")
+        result = db.execute(select(up.c.id, up.c.name).add_cte(history))
+    return {product_name_key(name): id_ for id_, name, *_ in result}
+
+class ProductChanges(BaseModel):
+    version: int
+    full: bool
+    products: List[ProductOut]
+
 @router.get("/", response_model=List[ProductOut])
+@query_budget(3)
+@deadline(5)
 def list_products(
     q: Optional[str] = Query(None, description="Поиск по названию"),
     db: Session = Depends(get_db),
     actor = Depends(get_actor),
+    if_none_match: Optional[str] = Header(None),
 ):
     owner_id = _owner_user_id(actor)
-    qs = db.query(Product).filter(Product.user_id == owner_id)
     if q:
-        qs = qs.filter(func.lower(Product.name).contains(q.lower()))
-    # thanks to @property price, orm_mode вернёт поле price из last_price
-    return qs.order_by(func.lower(Product.name)).all()
+        # словари сразу в ответ: response_model остаётся для схемы, но не валидирует
+        return FastJSONResponse(reads.products(db, owner_id, q))
+    # 👇 весь список — из кэша по версии номенклатуры, 304 при совпавшем ETag
+    return catalog.catalog_response(db, owner_id, catalog.current_version(db, actor), if_none_match)
 
 @router.get("", response_model=List[ProductOut])
+@query_budget(3)
+@deadline(5)
 def list_products_no_slash(
     q: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     actor = Depends(get_actor),
+    if_none_match: Optional[str] = Header(None),
+):
+    return list_products(q=q, db=db, actor=actor, if_none_match=if_none_match)
+
+@router.get("/changes", response_model=ProductChanges)
+@query_budget(3)
+@deadline(5)
+def product_changes(
+    since_version: int = Query(..., description="Версия номенклатуры, которая уже есть у клиента"),
+    db: Session = Depends(get_db),
+    actor = Depends(get_actor),
+):
+    """Изменения номенклатуры после since_version (товары не удаляются — только upsert)."""
+    owner_id = _owner_user_id(actor)
+    return FastJSONResponse(catalog.changes(db, owner_id, catalog.current_version(db, actor), since_version))
+
+@router.get("/suggest", response_model=List[ProductOut])
+@query_budget(2)
+@deadline(2)
+def suggest_products(
+    q: str = Query("", description="Начало названия"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    actor = Depends(get_actor),
+):
+    """Подсказки при вводе позиции: совпадение по началу названия, первыми —
+    те, что продаются чаще и недавно."""
+    return FastJSONResponse(reads.suggest_products(db, _owner_user_id(actor), product_name_key(q), limit))
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportReport(BaseModel):
+    received: int
+    loaded: int
+    inserted: int
+    updated: int
+    unchanged: int
+    duplicates: int
+    rejected: int
+    errors: List[ImportRowError]
+
+@router.post("/import", response_model=ImportReport)
+@query_budget(4)
+@deadline(120)
+async def import_products(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|xlsx)$", description="По умолчанию — по содержимому"),
+    db: Session = Depends(get_db),
+    actor = Depends(get_actor),
 ):
-    return list_products(q=q, db=db, actor=actor)
+    """Импорт номенклатуры: CSV или XLSX телом запроса (не multipart).
+    Тело принимается во временный файл (до PRODUCT_IMPORT_MAX_MB), соединение
+    с БД берётся только для COPY и слияния."""
+    owner_id = _owner_user_id(actor)
+    # 👇 актор прочитан — соединение сессии (та же, что у get_actor) возвращаем
+    # в пул до приёма тела, а не держим открытую транзакцию всю загрузку
+    db.close()
+    if format is None and request.headers.get("content-type", "").startswith(product_io.XLSX_MEDIA_TYPE):
+        format = "xlsx"
+    body = request.stream().__aiter__()
+
+    def next_chunk():  # вызывается из потока импорта
+        try:
+            return anyio.from_thread.run(body.__anext__)
+        except StopAsyncIteration:
+            return None
+
+    try:
+        report = await run_in_threadpool(product_io.import_products, engine, owner_id, next_chunk, format)
+    except product_io.ImportRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return FastJSONResponse(report)
+
+@router.get("/export")
+@query_budget(2)
+@deadline(120)
+def export_products(actor = Depends(get_actor)):
+    """Номенклатура в CSV (id;name;price) — тот же формат принимает /products/import."""
+    return StreamingResponse(
+        product_io.export_csv(engine, _owner_user_id(actor)),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="products.csv"'},
+    )
+
+class PricePoint(BaseModel):
+    changed_at: datetime
+    price: int
+
+def _parse_day(value: Optional[str], end: bool = False) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Дата в формате YYYY-MM-DD")
+    if end and len(value) == 10:  # день целиком
+        dt = dt.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return dt
+
+@router.get("/{product_id}/prices", response_model=List[PricePoint])
+@query_budget(3)
+@deadline(5)
+def product_prices(
+    product_id: int,
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    actor = Depends(get_actor),
+):
+    """История цен товара (новые первыми)."""
+    rows = reads.product_prices(
+        db, _owner_user_id(actor), product_id,
+        _parse_day(date_from), _parse_day(date_to, end=True), limit,
+    )
+    if rows is None:
+        raise HTTPException(status_code=404, detail="Товар не найден")
+    return FastJSONResponse(rows)
 
 @router.post("/", response_model=ProductOut)
+@query_budget(4)
 def create_product(
     data: ProductIn,
     db: Session = Depends(get_db),
     actor = Depends(get_actor),
 ):
     owner_id = _owner_user_id(actor)
-    existing = db.query(Product).filter(
-        Product.user_id == owner_id,
-        func.lower(Product.name) == data.name.lower()
-    ).first()
-    if existing:
+    version = catalog.bump_version(db, owner_id)
+    prod = db.scalars(
+        pg_insert(Product)
+        .values(
+            user_id=owner_id,
+            name=clean_name(data.name),
+            last_price=data.price,  # <— важно
+            catalog_version=version,
+        )
+        .on_conflict_do_nothing(index_elements=NAME_KEY)
+        .returning(Product)
+    ).one_or_none()
+    if prod is None:
         raise HTTPException(status_code=400, detail="Такой товар уже существует")
-
-    prod = Product(
-        user_id=owner_id,
-        name=data.name.strip(),
-        last_price=data.price,  # <— важно
-    )
-    db.add(prod)
+    db.execute(insert(ProductPrice).values(product_id=prod.id, changed_at=prod.updated_at, price=prod.last_price))
     db.commit()
-    db.refresh(prod)
     return prod
 
 @router.put("/{product_id}", response_model=ProductOut)
+@query_budget(4)
 def update_product(
     product_id: int,
     data: ProductIn,
@@ -82,24 +353,28 @@ def update_product(
     actor = Depends(get_actor),
 ):
     owner_id = _owner_user_id(actor)
-    prod = db.query(Product).filter(
-        Product.id == product_id,
-        Product.user_id == owner_id
-    ).first()
+    version = catalog.bump_version(db, owner_id)  # и блокировка: цену товара никто не меняет параллельно
+    now = datetime.utcnow()
+    # старую цену UPDATE ... RETURNING не отдаёт — историю пишем до него, если цена другая
+    db.execute(_price_history(
+        select(Product.id, literal(now, DateTime), literal(data.price, Integer)).where(
+            Product.id == product_id, Product.user_id == owner_id,
+            Product.last_price.is_distinct_from(data.price),
+        )
+    ))
+    try:
+        prod = update_returning(
+            db, Product, Product.id == product_id, Product.user_id == owner_id,
+            name=clean_name(data.name),
+            last_price=data.price,  # <— важно
+            updated_at=now,
+            catalog_version=version,
+        )
+    except IntegrityError as e:
+        if _violated_constraint(e) != NAME_KEY_INDEX:
+            raise
+        raise HTTPException(status_code=400, detail="Товар с таким названием уже есть")
     if not prod:
         raise HTTPException(status_code=404, detail="Товар не найден")
-
-    dup = db.query(Product).filter(
-        Product.user_id == owner_id,
-        func.lower(Product.name) == data.name.lower(),
-        Product.id != product_id
-    ).first()
-    if dup:
-        raise HTTPException(status_code=400, detail="Товар с таким названием уже есть")
-
-    prod.name = data.name.strip()
-    prod.last_price = data.price  # <— важно
-    prod.updated_at = func.now()
     db.commit()
-    db.refresh(prod)
-    return prod
\ No newline at end of file
+    return prod
@@ -0,0 +1,186 @@
+# slowlog.py
+#
+# Журнал медленных запросов. Всё, что дольше SLOW_QUERY_MS, попадает в кольцевой
+# буфер (и в лог "slowlog"): нормализованный SQL, форма параметров (типы, без
+# значений), роут, откуда пришёл запрос. План — EXPLAIN (FORMAT JSON) — снимается
+# в фоне одним потоком на отдельном соединении, запрос пользователя не ждёт.
+#
+#   SLOW_QUERY_MS=200           порог, мс (0 — выключено)
+#   SLOW_QUERY_EXPLAIN=1        снимать план
+#   SLOW_QUERY_ANALYZE=0        EXPLAIN ANALYZE (выполняет запрос повторно, только SELECT)
+#   SLOW_QUERY_BUFFER=200       сколько записей держать
+#   SLOW_QUERY_PLANS=500        сколько планов держать в кэше (LRU)
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, event
+
+from metrics import current_request
+from querybudget import normalize_sql
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1") == "1"
+ANALYZE = os.getenv("SLOW_QUERY_ANALYZE", "0") == "1"
+BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER", "200"))
+PLAN_CACHE_SIZE = int(os.getenv("SLOW_QUERY_PLANS", "500"))
+
+# один и тот же запрос не объясняем чаще раза в EXPLAIN_TTL секунд
+EXPLAIN_TTL = 300
+MAX_PENDING = 20
+EXPLAIN_TIMEOUT_MS = 5000
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+logger = logging.getLogger("slowlog")
+
+ENTRIES = deque(maxlen=BUFFER_SIZE)
+# normalized sql -> (время, plan | None, ошибка | None); не больше PLAN_CACHE_SIZE,
+# вытесняется давно не встречавшийся — литералы в SQL делают ключи почти бесконечными
+_plans = OrderedDict()
+_pending = 0
+_lock = threading.Lock()
+_executor = None
+_explain_engine = None
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Форма параметров: типы и длины вместо значений (в параметрах телефоны и т.п.)
+# ───────────────────────────────────────────────────────────────────────────────
+def _shape(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def bind_shape(parameters, executemany: bool):
+    if executemany:
+        rows = list(parameters or ())
+        return {"rows": len(rows), "row": bind_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {k: _shape(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_shape(v) for v in parameters]
+    return None
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# EXPLAIN в фоне
+# ───────────────────────────────────────────────────────────────────────────────
+def _cached_plan(sql: str):
+    with _lock:
+        cached = _plans.get(sql)
+        if cached is not None:
+            _plans.move_to_end(sql)
+        return cached
+
+
+def _remember_plan(sql: str, value: tuple):
+    with _lock:
+        _plans[sql] = value
+        _plans.move_to_end(sql)
+        while len(_plans) > PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+
+
+def _explain(entry: dict, statement: str, parameters, analyze: bool):
+    global _pending
+    try:
+        raw = _explain_engine.raw_connection()
+        try:
+            cur = raw.cursor()
+            cur.execute(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+            options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+            cur.execute(f"EXPLAIN ({options}) {statement}", parameters or None)
+            plan = cur.fetchone()[0]
+            error = None
+        finally:
+            raw.rollback()  # ANALYZE не должен ничего оставить
+            raw.close()
+    except Exception as e:
+        plan, error = None, f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+    _remember_plan(entry["sql"], (time.monotonic(), plan, error))
+    entry["plan"] = plan
+    entry["plan_error"] = error
+    with _lock:
+        _pending -= 1
+
+
+def _schedule_explain(entry: dict, statement: str, parameters, executemany: bool):
+    global _pending
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    if executemany or verb not in EXPLAINABLE:
+        return
+    cached = _cached_plan(entry["sql"])
+    if cached is not None and time.monotonic() - cached[0] < EXPLAIN_TTL:
+        entry["plan"], entry["plan_error"] = cached[1], cached[2]
+        entry["plan_cached"] = True
+        return
+    with _lock:
+        if _pending >= MAX_PENDING:
+            entry["plan_error"] = "очередь EXPLAIN переполнена"
+            return
+        _pending += 1
+    entry["plan"] = "pending"
+    analyze = ANALYZE and verb == "SELECT"
+    _executor.submit(_explain, entry, statement, parameters, analyze)
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Хуки движка
+# ───────────────────────────────────────────────────────────────────────────────
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._slowlog_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - context._slowlog_start) * 1000
+    if elapsed_ms < SLOW_QUERY_MS:
+        return
+    stats = current_request()
+    scope = stats.scope if stats is not None else None
+    route = scope.get("route") if scope is not None else None
+    entry = {
+        "at": time.time(),
+        "duration_ms": round(elapsed_ms, 2),
+        "sql": normalize_sql(statement),
+        "params": bind_shape(parameters, executemany),
+        "rows": cursor.rowcount,
+        "route": f"{scope['method']} {route.path if route is not None else scope['path']}" if scope else None,
+        "plan": None,
+        "plan_error": None,
+    }
+    ENTRIES.append(entry)
+    logger.warning("slow query %.1f ms [%s]: %s", elapsed_ms, entry["route"] or "-", entry["sql"][:500])
+    if EXPLAIN:
+        _schedule_explain(entry, statement, parameters, executemany)
+
+
+def instrument_slow_queries(engine):
+    """Подключает журнал к движку. План снимается через отдельный движок на
+    одно соединение — без хуков (нет рекурсии) и без занятия пула приложения."""
+    global _executor, _explain_engine
+    if SLOW_QUERY_MS <= 0 or event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        return
+    if EXPLAIN and _explain_engine is None:
+        _explain_engine = create_engine(engine.url, pool_size=1, max_overflow=0, pool_pre_ping=True)
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slowlog-explain")
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def slow_queries(limit: int = 50, plans: bool = True):
+    """Последние медленные запросы, свежие первыми."""
+    out = []
+    for entry in list(ENTRIES)[::-1][:limit]:
+        item = dict(entry)
+        if not plans and isinstance(item["plan"], list):
+            item["plan"] = "omitted"
+        out.append(item)
+    return out
@@ -1,13 +1,15 @@
 # tasks.py
-from celery_app import celery
-from database import SessionLocal
+import time
+from celery_app import celery, task_options
+from database import SessionLocal, engine
 from models import Subscription
 from datetime import datetime, timedelta
 from celery.utils.log import get_task_logger
+from sqlalchemy import text
 
 logger = get_task_logger(__name__)
 
-@celery.task
+@celery.task(**task_options("maintenance"))
 def check_subscriptions():
     db = SessionLocal()
     try:
@@ -29,4 +31,54 @@ def check_subscriptions():
                         sub.user_id, sub.end_date.date())
 
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Бэкфилл items.product_id: позиции → товары по ключу названия
+# ───────────────────────────────────────────────────────────────────────────────
+BACKFILL_ITEMS_SQL = text("""
+WITH batch AS (
+    SELECT x.id, i.user_id, product_name_key(x.name) AS name_key
+    FROM items x
+    JOIN invoices i ON i.id = x.invoice_id
+    WHERE x.id > :after_id AND x.product_id IS NULL
+    ORDER BY x.id
+    LIMIT :batch
+), linked AS (
+    UPDATE items x
+    SET product_id = p.id
+    FROM batch b
+    JOIN products p ON p.user_id = b.user_id AND product_name_key(p.name) = b.name_key
+    WHERE x.id = b.id
+    RETURNING x.id
+)
+SELECT (SELECT max(id) FROM batch), (SELECT count(*) FROM batch), (SELECT count(*) FROM linked)
+""")
+
+
+@celery.task(**task_options("maintenance"))
+def backfill_item_products(after_id: int = 0, batch: int = 5000, pause: float = 0.2, run_for: float = 300):
+    """Пачки по batch позиций, каждая — своя короткая транзакция; через run_for
+    секунд задача ставит своё продолжение с последнего id (лимит времени не
+    упирается, воркер не занят надолго). Позиции без товара остаются NULL."""
+    started = time.monotonic()
+    linked_total = scanned_total = 0
+    while True:
+        with engine.begin() as conn:
+            last_id, scanned, linked = conn.execute(
+                BACKFILL_ITEMS_SQL, {"after_id": after_id, "batch": batch}
+            ).one()
+        if last_id is None:
+            logger.info("backfill items.product_id: готово (просмотрено %d, связано %d)",
+                        scanned_total, linked_total)
+            return {"done": True, "after_id": after_id}
+        after_id = last_id
+        scanned_total += scanned
+        linked_total += linked
+        if time.monotonic() - started > run_for:
+            logger.info("backfill items.product_id: до id=%d (связано %d), продолжение в новой задаче",
+                        after_id, linked_total)
+            backfill_item_products.delay(after_id=after_id, batch=batch, pause=pause, run_for=run_for)
+            return {"done": False, "after_id": after_id}
+        time.sleep(pause)
@@ -0,0 +1,50 @@
+# tests/test_backfill.py — бэкфилл items.product_id пачками с продолжением
+import pytest
+from sqlalchemy import text
+
+
+@pytest.fixture
+def continuations(monkeypatch):
+    """Продолжения, которые поставила задача (брокер не нужен)."""
+    monkeypatch.setenv("REDIS_URL", "redis://localhost:6379/0")
+    import tasks
+    queued = []
+    monkeypatch.setattr(tasks.backfill_item_products, "delay", lambda **kw: queued.append(kw))
+    return queued
+
+
+def test_backfill_batches_and_continues(engine, owner, create_invoice, continuations):
+    from tasks import backfill_item_products
+
+    invoice_id = create_invoice(owner, items=[
+        {"name": "Молоко", "quantity": 1, "price": 300},
+        {"name": "Хлеб", "quantity": 1, "price": 150},
+        {"name": "  хлеб ", "quantity": 2, "price": 150},
+    ])["invoice_id"]
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO items (invoice_id, name, quantity, price) VALUES (:id, 'Без товара', 1, 10)"
+        ), {"id": invoice_id})
+        expected = dict(conn.execute(text(
+            "SELECT id, product_id FROM items WHERE invoice_id = :id ORDER BY id"
+        ), {"id": invoice_id}).all())
+        conn.execute(text("UPDATE items SET product_id = NULL WHERE invoice_id = :id"), {"id": invoice_id})
+    item_ids = sorted(expected)
+    start = item_ids[0] - 1
+
+    # run_for=0: одна пачка, затем задача ставит продолжение с последнего id
+    result = backfill_item_products(after_id=start, batch=1, pause=0, run_for=0)
+    assert result == {"done": False, "after_id": item_ids[0]}
+    assert continuations == [{"after_id": item_ids[0], "batch": 1, "pause": 0, "run_for": 0}]
+
+    result = backfill_item_products(after_id=item_ids[0], batch=2, pause=0, run_for=60)
+    assert result["done"] is True
+    assert len(continuations) == 1
+
+    with engine.connect() as conn:
+        linked = dict(conn.execute(text(
+            "SELECT id, product_id FROM items WHERE invoice_id = :id"
+        ), {"id": invoice_id}).all())
+    assert linked == expected
+    assert expected[item_ids[1]] == expected[item_ids[2]] is not None  # «Хлеб» и «  хлеб »
+    assert expected[item_ids[3]] is None
@@ -0,0 +1,53 @@
+# tests/test_balances.py — балансы клиентов и список должников
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from querybudget import record_queries
+
+
+def test_apply_accumulates(client, engine, owner):
+    import balances
+    from routes.invoice import resolve_client
+
+    tenant = client.get("/me", headers=owner).json()["id"]
+    with Session(engine) as db:
+        client_id = resolve_client(db, tenant, "Покупатель", "+7 701 900 00 01")
+        balances.apply(db, tenant, client_id, datetime(2026, 3, 2), invoiced=1000)
+        balances.apply(db, tenant, client_id, datetime(2026, 3, 1), paid=300)  # более ранняя операция
+        balances.apply(db, tenant, client_id, datetime(2026, 3, 5), invoiced=500, paid=100)
+        db.commit()
+        row = db.execute(text(
+            "SELECT invoiced, paid, outstanding, last_activity_at FROM client_balances WHERE client_id = :id"
+        ), {"id": client_id}).one()
+    # outstanding — вычисляемая колонка invoiced - paid; время — последней операции
+    assert tuple(row) == (1500, 400, 1100, datetime(2026, 3, 5))
+
+
+def test_debtors(client, engine, owner, owner_factory, create_invoice):
+    # 750 = 2 × 300 + 150 (позиции create_invoice по умолчанию)
+    big = create_invoice(owner, client="Крупный", phone="+7 701 900 00 02")
+    create_invoice(owner, client="Крупный", phone="+7 701 900 00 02", paid_amount=150)
+    create_invoice(owner, client="Мелкий", phone="+7 701 900 00 03", paid_amount=700)
+    create_invoice(owner, client="Оплатил", phone="+7 701 900 00 04", paid_amount=750)
+    create_invoice(owner_factory(), client="Чужой", phone="+7 701 900 00 05")
+
+    with record_queries(engine) as log:
+        r = client.get("/clients/debtors", headers=owner)
+    assert r.status_code == 200, r.text
+    assert log.count == 2, log.report()
+    rows = r.json()
+    assert [(d["name"], d["invoiced"], d["paid"], d["outstanding"]) for d in rows] == [
+        ("Крупный", 1500, 150, 1350),
+        ("Мелкий", 750, 700, 50),
+    ]
+    assert rows[0]["last_activity_at"].endswith("+00:00")
+
+    # оплата через журнал уменьшает долг, погашенный — уходит из списка
+    r = client.post(f"/invoices/{big['invoice_id']}/payments", headers=owner, json={"amount": 750})
+    assert r.status_code == 200, r.text
+    rows = client.get("/clients/debtors", headers=owner, params={"limit": 1}).json()
+    assert [(d["name"], d["outstanding"]) for d in rows] == [("Крупный", 600)]
+    rows = client.get("/clients/debtors", headers=owner, params={"limit": 1, "offset": 1}).json()
+    assert [d["name"] for d in rows] == ["Мелкий"]
@@ -0,0 +1,73 @@
+# tests/test_catalog.py — ETag номенклатуры, версия при записи, дельта /products/changes
+from querybudget import record_queries
+
+
+def version(client, headers) -> int:
+    return client.get("/products/changes", headers=headers, params={"since_version": 0}).json()["version"]
+
+
+def test_etag_not_modified(client, engine, owner):
+    client.post("/products/", headers=owner, json={"name": "Сахар", "price": 500})
+    r = client.get("/products/", headers=owner)
+    assert r.status_code == 200
+    tag = r.headers["etag"]
+
+    with record_queries(engine) as log:
+        r = client.get("/products/", headers={**owner, "If-None-Match": tag})
+    assert r.status_code == 304
+    assert r.headers["etag"] == tag
+    # только актор: версия — из строки владельца, товары не читаются
+    assert log.count == 1, log.report()
+
+    for value in ("*", f'"other", W/{tag}'):
+        r = client.get("/products/", headers={**owner, "If-None-Match": value})
+        assert r.status_code == 304, value
+    r = client.get("/products/", headers={**owner, "If-None-Match": '"other"'})
+    assert r.status_code == 200
+
+
+def test_write_bumps_version(client, owner):
+    before = version(client, owner)
+    tag = client.get("/products/", headers=owner).headers["etag"]
+
+    r = client.post("/products/", headers=owner, json={"name": "Соль", "price": 100})
+    product_id = r.json()["id"]
+    assert version(client, owner) == before + 1
+    r = client.get("/products/", headers={**owner, "If-None-Match": tag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != tag
+    assert [p["name"] for p in r.json()] == ["Соль"]
+
+    client.put(f"/products/{product_id}", headers=owner, json={"name": "Соль", "price": 120})
+    assert version(client, owner) == before + 2
+
+
+def test_unchanged_invoice_keeps_version(client, owner, create_invoice):
+    create_invoice(owner)
+    before = version(client, owner)
+    create_invoice(owner)  # те же товары и цены
+    assert version(client, owner) == before
+    create_invoice(owner, items=[{"name": "Молоко", "quantity": 1, "price": 310}])
+    assert version(client, owner) == before + 1
+
+
+def test_changes_feed(client, owner):
+    client.post("/products/", headers=owner, json={"name": "Сахар", "price": 500})
+    seen = version(client, owner)
+    r = client.post("/products/", headers=owner, json={"name": "Соль", "price": 100})
+    salt = r.json()["id"]
+
+    r = client.get("/products/changes", headers=owner, params={"since_version": seen})
+    assert r.status_code == 200
+    delta = r.json()
+    assert (delta["version"], delta["full"]) == (seen + 1, False)
+    assert delta["products"] == [{"id": salt, "name": "Соль", "price": 100}]
+
+    # нет изменений
+    r = client.get("/products/changes", headers=owner, params={"since_version": seen + 1})
+    assert r.json()["products"] == []
+
+    # версия из будущего — весь список с full=True
+    r = client.get("/products/changes", headers=owner, params={"since_version": seen + 10})
+    assert r.json()["full"] is True
+    assert {p["name"] for p in r.json()["products"]} == {"Сахар", "Соль"}
@@ -0,0 +1,217 @@
+# tests/test_clients.py — справочник клиентов арендатора
+import os
+import threading
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Миграция e4c8a1f6b2d7: деление общих клиентов и слияние дублей
+# ───────────────────────────────────────────────────────────────────────────────
+@pytest.fixture
+def scratch_url(engine, monkeypatch):
+    """Отдельная пустая база рядом с тестовой — для прогона миграций."""
+    name = f"enote_migrate_{uuid.uuid4().hex[:8]}"
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql(f'CREATE DATABASE "{name}"')
+    url = engine.url.set(database=name).render_as_string(hide_password=False)
+    monkeypatch.setenv("DATABASE_URL", url)  # alembic/env.py берёт адрес отсюда
+    yield url
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql(f'DROP DATABASE "{name}" WITH (FORCE)')
+
+
+def migrate(url: str, revision: str):
+    from alembic import command
+    from alembic.config import Config
+
+    cfg = Config(os.path.join(ROOT, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    cfg.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    command.upgrade(cfg, revision)
+
+
+def test_migration_splits_and_merges_clients(scratch_url):
+    migrate(scratch_url, "d7b3f9a2c4e1")
+    scratch = create_engine(scratch_url)
+    try:
+        with scratch.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO users (id, name, email, phone, password_hash) VALUES
+                    (1, 'A', 'a@example.com', '+77000000001', 'x'),
+                    (2, 'B', 'b@example.com', '+77000000002', 'x');
+                INSERT INTO clients (id, name, phone) VALUES
+                    (10, 'Общий', '+7 701 111 22 33'),
+                    (11, 'Дубль', '87011112233'),
+                    (12, 'Без накладных', '+77015556677');
+                SELECT setval(pg_get_serial_sequence('clients', 'id'), 12);
+                INSERT INTO invoices (id, client, amount, client_id, user_id, invoice_number) VALUES
+                    (100, 'Общий', 0, 10, 1, 'A-1'),
+                    (101, 'Общий', 0, 10, 2, 'B-1'),
+                    (102, 'Дубль', 0, 11, 1, 'A-2');
+            """))
+        migrate(scratch_url, "e4c8a1f6b2d7")
+        with scratch.connect() as conn:
+            clients = conn.execute(text(
+                "SELECT id, user_id, phone_key, name FROM clients ORDER BY id"
+            )).all()
+            invoices = dict(conn.execute(text("SELECT id, client_id FROM invoices")).all())
+    finally:
+        scratch.dispose()
+
+    copy_id = invoices[101]
+    assert clients == [
+        (10, 1, "7011112233", "Общий"),        # первому арендатору — исходная строка
+        (12, None, "7015556677", "Без накладных"),
+        (copy_id, 2, "7011112233", "Общий"),   # второму — копия
+    ]
+    # «87011112233» — тот же номер у A: слит в строку с меньшим id
+    assert invoices == {100: 10, 101: copy_id, 102: 10}
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# resolve_client
+# ───────────────────────────────────────────────────────────────────────────────
+def owner_id(client, headers) -> int:
+    return client.get("/me", headers=headers).json()["id"]
+
+
+def test_phone_variants_resolve_to_one_client(client, engine, owner, create_invoice):
+    ids = {create_invoice(owner, phone=phone)["invoice_id"]
+           for phone in ("+7 701 222 33 44", "87012223344", "7012223344")}
+    with engine.connect() as conn:
+        client_ids = conn.execute(text(
+            "SELECT DISTINCT client_id FROM invoices WHERE id = ANY(:ids)"
+        ), {"ids": list(ids)}).scalars().all()
+    assert len(client_ids) == 1
+
+
+def test_resolve_client_concurrent_insert(client, engine, owner):
+    from routes.invoice import resolve_client
+
+    tenant = owner_id(client, owner)
+    result = {}
+    with Session(engine) as first:
+        first_id = resolve_client(first, tenant, "Покупатель", "+7 701 333 44 55")  # ещё не закоммичено
+
+        def second():
+            with Session(engine) as db:
+                # SELECT не видит строку первой транзакции, INSERT ждёт её commit
+                result["id"] = resolve_client(db, tenant, "Покупатель", "8 701 333 44 55")
+                db.commit()
+
+        worker = threading.Thread(target=second)
+        worker.start()
+        worker.join(0.5)
+        assert worker.is_alive()
+        first.commit()
+    worker.join(10)
+    assert result["id"] == first_id
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# GET /clients/search
+# ───────────────────────────────────────────────────────────────────────────────
+@pytest.fixture
+def contacts(owner, create_invoice):
+    for name, phone in [("Айгуль Сериковна", "+7 701 444 55 66"),
+                        ("Сергей", "8 702 444 11 22"),
+                        ("Магазин Серик", "+7 705 000 44 55"),
+                        ("Ольга", "+7 700 702 00 00"),
+                        ("Бессеров", "+7 707 123 45 67")]:
+        create_invoice(owner, client=name, phone=phone)
+
+
+def search(client, headers, q, **params):
+    r = client.get("/clients/search", headers=headers, params={"q": q, **params})
+    assert r.status_code == 200, r.text
+    return [c["name"] for c in r.json()]
+
+
+def test_search_by_phone(client, owner, contacts):
+    assert search(client, owner, "8701444") == ["Айгуль Сериковна"]
+    assert search(client, owner, "+7 (702) 444-11-22") == ["Сергей"]
+    # начало номера (с 7/8 и без) — раньше вхождения
+    assert search(client, owner, "702") == ["Сергей", "Ольга"]
+    assert search(client, owner, "4455") == ["Айгуль Сериковна", "Магазин Серик"]
+    assert search(client, owner, "44") == []  # меньше трёх цифр — не номер
+
+
+def test_search_by_name_without_trgm(client, owner, contacts, monkeypatch):
+    import reads
+    monkeypatch.setattr(reads, "_clients_trgm", False)
+    # начало имени, начало слова, вхождение
+    assert search(client, owner, "сер") == ["Сергей", "Айгуль Сериковна", "Магазин Серик", "Бессеров"]
+    assert search(client, owner, "сер", limit=1) == ["Сергей"]
+    assert search(client, owner, "сергии") == []
+
+
+def test_search_by_name_with_trgm(client, engine, owner, contacts, monkeypatch):
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")).scalar():
+            pytest.skip("pg_trgm не установлено в тестовой базе")
+    import reads
+    monkeypatch.setattr(reads, "_clients_trgm", True)
+    assert search(client, owner, "сер")[:1] == ["Сергей"]
+    # опечатка находится по word_similarity
+    assert "Сергей" in search(client, owner, "сергии")
+
+
+def test_search_is_per_tenant(client, owner, owner_factory, contacts):
+    assert search(client, owner_factory(), "сер") == []
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# POST /clients/bulk
+# ───────────────────────────────────────────────────────────────────────────────
+def test_bulk_sync_maps_contacts(client, engine, owner, create_invoice):
+    from querybudget import record_queries
+
+    existing = create_invoice(owner, client="Айгуль", phone="+7 701 444 55 66")["invoice_id"]
+    with engine.connect() as conn:
+        existing_id = conn.execute(text("SELECT client_id FROM invoices WHERE id = :id"), {"id": existing}).scalar()
+
+    contacts = [
+        {"name": "Айгуль (телефон)", "phone": "87014445566"},  # уже в справочнике
+        {"name": "Сергей", "phone": "+7 702 444 11 22"},
+        {"name": "", "phone": "8 702 444 11 22"},              # дубль номера
+        {"name": "Без номера", "phone": "12-34"},
+        {"name": None, "phone": "+7 705 000 44 55"},
+    ]
+    with record_queries(engine) as log:
+        r = client.post("/clients/bulk", headers=owner, json={"contacts": contacts})
+    assert r.status_code == 200, r.text
+    # актор, временная таблица, слияние, выборка id (COPY мимо счётчика)
+    assert log.count == 4, log.report()
+    report = r.json()
+    assert {k: report[k] for k in ("received", "inserted", "existing", "duplicates", "rejected")} == {
+        "received": 5, "inserted": 2, "existing": 1, "duplicates": 1, "rejected": 1,
+    }
+    assert report["errors"] == [{"index": 3, "error": "Неполный номер телефона"}]
+
+    ids = {c["index"]: c["id"] for c in report["clients"]}
+    assert sorted(ids) == [0, 1, 2, 4]
+    assert ids[0] == existing_id
+    assert ids[1] == ids[2] != ids[4]
+
+    # имя существующего клиента не меняется, у контакта без имени — номер
+    names = {c["name"] for c in client.get("/clients/search", headers=owner, params={"q": "870"}).json()}
+    assert names == {"Айгуль", "Сергей", "+7 705 000 44 55"}
+
+    # повторная синхронизация ничего не вставляет и отдаёт те же id
+    again = client.post("/clients/bulk", headers=owner, json={"contacts": contacts}).json()
+    assert (again["inserted"], again["existing"]) == (0, 3)
+    assert {c["index"]: c["id"] for c in again["clients"]} == ids
+
+
+def test_bulk_sync_limit(client, owner, monkeypatch):
+    import client_io
+    monkeypatch.setattr(client_io, "MAX_CONTACTS", 2)
+    contacts = [{"name": "К", "phone": f"+7 701 000 00 0{i}"} for i in range(3)]
+    r = client.post("/clients/bulk", headers=owner, json={"contacts": contacts})
+    assert r.status_code == 413
@@ -0,0 +1,97 @@
+# tests/test_deadlines.py — отмена SQL по дедлайну и потолки соединений
+import asyncio
+import threading
+import time
+
+from deadlines import RequestGuard
+
+
+class SlowCancelConn:
+    """dbapi-соединение, у которого cancel() — медленный сетевой обмен."""
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        time.sleep(0.3)
+        self.cancelled.set()
+
+
+def test_abort_does_not_block_event_loop():
+    guard = RequestGuard({})
+    conn = SlowCancelConn()
+    guard.enter(conn)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while not conn.cancelled.is_set():
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(guard.abort_async("deadline"), ticker())
+        return ticks
+
+    # пока идёт cancel(), цикл событий продолжает работать
+    assert asyncio.run(run()) > 5
+    assert guard.reason == "deadline"
+
+
+def test_leave_waits_for_cancel():
+    # соединение не выходит из запроса (и не возвращается в пул), пока
+    # CancelRequest не отправлен
+    guard = RequestGuard({})
+    conn = SlowCancelConn()
+    guard.enter(conn)
+    aborter = threading.Thread(target=guard.abort, args=("deadline",))
+    aborter.start()
+    time.sleep(0.05)
+    guard.leave(conn)
+    assert conn.cancelled.is_set()
+    aborter.join()
+
+
+def test_deadline_cancels_statement(engine):
+    from fastapi import Depends, FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy import text
+
+    from database import get_db
+    from deadlines import DeadlineMiddleware, deadline, instrument_cancellation
+
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware)
+    instrument_cancellation(engine)
+
+    @app.get("/slow")
+    @deadline(0.5)
+    def slow(db=Depends(get_db)):
+        db.execute(text("SELECT pg_sleep(5)"))
+        return {"ok": True}
+
+    started = time.monotonic()
+    with TestClient(app) as client:
+        r = client.get("/slow")
+    assert r.status_code == 504
+    assert time.monotonic() - started < 3
+    with engine.connect() as conn:
+        sleeping = conn.execute(text(
+            "SELECT count(*) FROM pg_stat_activity WHERE query = 'SELECT pg_sleep(5)' AND state = 'active'"
+        )).scalar()
+    assert sleeping == 0
+
+
+def test_connection_timeouts(engine):
+    from sqlalchemy import text
+
+    import database
+    with engine.connect() as conn:
+        settings = dict(conn.execute(text(
+            "SELECT name, setting::int FROM pg_settings"
+            " WHERE name IN ('statement_timeout', 'idle_in_transaction_session_timeout')"
+        )).all())
+    assert settings == {"statement_timeout": database.STATEMENT_TIMEOUT_MS,
+                        "idle_in_transaction_session_timeout": database.IDLE_TX_TIMEOUT_MS}
+    assert engine.pool.timeout() == database.DEFAULT_DEADLINE
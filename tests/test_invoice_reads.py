@@ -0,0 +1,42 @@
+# tests/test_invoice_reads.py — список накладных в пределах бюджета запросов
+import pytest
+
+from querybudget import QueryBudgetExceeded, record_queries
+
+
+@pytest.fixture(autouse=True)
+def python_read_mode(monkeypatch):
+    monkeypatch.delenv("READ_MODE_INVOICES", raising=False)
+
+
+@pytest.mark.parametrize("count", [1, 50])
+def test_list_invoices_within_budget(client, engine, owner, create_invoice, count):
+    for _ in range(count):
+        create_invoice(owner)
+    with record_queries(engine) as log:
+        r = client.get("/invoices", headers=owner)
+    assert r.status_code == 200
+    invoices = r.json()
+    assert len(invoices) == count
+    assert all(len(inv["items"]) == 2 for inv in invoices)
+    # актор, позиции, накладные — сколько бы накладных ни было
+    assert log.count <= 3, log.report()
+
+
+def test_lazy_items_exceed_budget(client, owner, create_invoice, monkeypatch):
+    import reads
+    from models import Invoice
+
+    def lazy_invoices(db, owner_id, seller_employee_id=None):
+        # ORM-сборка вместо reads.invoices: позиции каждой накладной — отдельным запросом
+        return [
+            {"id": inv.id, "items": [{"name": it.name, "quantity": it.quantity, "price": it.price}
+                                     for it in inv.items]}
+            for inv in db.query(Invoice).filter(Invoice.user_id == owner_id).order_by(Invoice.id)
+        ]
+
+    for _ in range(5):
+        create_invoice(owner)
+    monkeypatch.setattr(reads, "invoices", lazy_invoices)
+    with pytest.raises(QueryBudgetExceeded, match="N\\+1"):
+        client.get("/invoices", headers=owner)
@@ -0,0 +1,55 @@
+# tests/test_metrics.py — счётчики метрик под конкурентной записью
+import sys
+import threading
+
+import pytest
+
+import metrics
+
+THREADS, N = 8, 20_000
+
+
+@pytest.fixture
+def contended():
+    # частое переключение потоков; потерю инкремента без замка так не поймать
+    # детерминированно, но счёт и согласованность снимка под нагрузкой проверяем
+    old = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(old)
+
+
+def _hammer(fn):
+    threads = [threading.Thread(target=lambda: [fn() for _ in range(N)]) for _ in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_histogram_observe_is_atomic(contended):
+    hist = metrics.Histogram(metrics.LATENCY_BUCKETS)
+    _hammer(lambda: hist.observe(0.02))
+    counts, total, count = hist.snapshot()
+    assert count == sum(counts) == THREADS * N
+    assert total == pytest.approx(0.02 * THREADS * N)
+
+
+def test_route_counters_are_atomic(contended):
+    m = metrics.RouteMetrics()
+    _hammer(lambda: m.record(200, 1, 0.5))
+    statuses, rows, pool_wait = m.counters()
+    assert statuses == {200: THREADS * N}
+    assert rows == THREADS * N
+    assert pool_wait == THREADS * N * 0.5
+
+
+def test_render_prometheus(monkeypatch):
+    m = metrics.RouteMetrics()
+    m.latency.observe(0.02)
+    m.record(201, 3, 0.0)
+    monkeypatch.setattr(metrics, "ROUTES", {("POST", "/invoices/"): m})
+    text = metrics.render_prometheus()
+    assert 'http_requests_total{method="POST",route="/invoices/",status="201"} 1' in text
+    assert 'http_request_duration_seconds_bucket{method="POST",route="/invoices/",le="0.025"} 1' in text
+    assert 'http_request_db_rows_total{method="POST",route="/invoices/"} 3' in text
@@ -0,0 +1,96 @@
+# tests/test_payments.py — оплаты накладных: статус, переплата, параллельные оплаты
+import threading
+import time
+
+from sqlalchemy import text
+
+from querybudget import record_queries
+
+TOTAL = 750  # позиции create_invoice по умолчанию: 2 × 300 + 150
+
+
+def pay(client, headers, invoice_id, amount):
+    return client.post(f"/invoices/{invoice_id}/payments", headers=headers, json={"amount": amount})
+
+
+def test_payments_derive_status(client, engine, owner, create_invoice):
+    invoice_id = create_invoice(owner, paid_amount=100)["invoice_id"]
+
+    with record_queries(engine) as log:
+        r = pay(client, owner, invoice_id, 200)
+    assert r.status_code == 200, r.text
+    # актор, UPDATE накладной, оплата, баланс клиента
+    assert log.count == 4, log.report()
+    assert r.json() | {"payment_id": None} == {
+        "payment_id": None, "invoice_id": invoice_id, "amount": 200,
+        "paid_amount": 300, "outstanding": TOTAL - 300, "status": "частично оплачен",
+    }
+
+    r = pay(client, owner, invoice_id, TOTAL - 300)
+    assert r.status_code == 200, r.text
+    assert (r.json()["status"], r.json()["outstanding"]) == ("оплачен", 0)
+
+    r = client.get(f"/invoices/{invoice_id}/payments", headers=owner)
+    assert [p["amount"] for p in r.json()] == [100, 200, TOTAL - 300]
+
+
+def test_overpayment_rejected(client, owner, create_invoice):
+    invoice_id = create_invoice(owner, paid_amount=700)["invoice_id"]
+    r = pay(client, owner, invoice_id, 51)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Сумма больше остатка по накладной: 50"
+    r = pay(client, owner, invoice_id, 0)
+    assert r.status_code == 422
+    invoices = {i["id"]: i for i in client.get("/invoices", headers=owner).json()}
+    assert invoices[invoice_id]["paid_amount"] == 700
+
+
+def test_foreign_invoice_not_found(client, owner, owner_factory, create_invoice):
+    invoice_id = create_invoice(owner)["invoice_id"]
+    other = owner_factory()
+    assert pay(client, other, invoice_id, 10).status_code == 404
+
+
+def test_concurrent_payments_serialize(client, engine, owner, create_invoice):
+    invoice_id = create_invoice(owner)["invoice_id"]
+    result = {}
+
+    # вторая сессия уже оплатила накладную целиком, но ещё не закоммитила
+    with engine.connect() as conn:
+        conn.execute(text(
+            "UPDATE invoices SET paid_amount = amount, status = 'оплачен' WHERE id = :id"
+        ), {"id": invoice_id})
+
+        payer = threading.Thread(target=lambda: result.update(r=pay(client, owner, invoice_id, TOTAL)))
+        payer.start()
+        time.sleep(0.5)
+        # оплата через API ждёт блокировку строки накладной
+        assert payer.is_alive()
+        conn.commit()
+    payer.join(10)
+
+    # после блокировки условие paid <= amount перечитано: переплаты нет
+    assert result["r"].status_code == 400, result["r"].text
+    with engine.connect() as conn:
+        paid, payments = conn.execute(text(
+            "SELECT paid_amount, (SELECT count(*) FROM payments WHERE invoice_id = :id)"
+            " FROM invoices WHERE id = :id"
+        ), {"id": invoice_id}).one()
+    assert (paid, payments) == (TOTAL, 0)
+
+
+def test_create_invoice_validates_initial_payment(client, owner, create_invoice):
+    statuses = {}
+    for paid in (0, 100, TOTAL):
+        # присланный клиентом статус не используется
+        invoice_id = create_invoice(owner, paid_amount=paid, status="оплачен")["invoice_id"]
+        statuses[paid] = invoice_id
+    invoices = {i["id"]: i["status"] for i in client.get("/invoices", headers=owner).json()}
+    assert [invoices[statuses[p]] for p in (0, 100, TOTAL)] == ["не оплачен", "частично оплачен", "оплачен"]
+
+    for paid in (-1, TOTAL + 1):
+        r = client.post("/invoices/", headers=owner, json={
+            "client": "Покупатель", "phone": "+77010000001", "paid_amount": paid,
+            "items": [{"name": "Молоко", "quantity": 2, "price": 300}, {"name": "Хлеб", "quantity": 1, "price": 150}],
+        })
+        assert r.status_code == 400, r.text
@@ -0,0 +1,56 @@
+# tests/test_price_history.py — история цен товара и фильтр по датам
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from querybudget import record_queries
+
+
+@pytest.fixture
+def product(client, engine, owner):
+    """Товар с ценами 100 → 120 → 150 на 2026-03-01, 03-15 и 04-01 (полдень)."""
+    product_id = client.post("/products/", headers=owner, json={"name": "Сахар", "price": 100}).json()["id"]
+    client.put(f"/products/{product_id}", headers=owner, json={"name": "Сахар", "price": 120})
+    client.put(f"/products/{product_id}", headers=owner, json={"name": "Сахар", "price": 150})
+    # PUT без смены цены историю не пишет
+    client.put(f"/products/{product_id}", headers=owner, json={"name": "Сахар", "price": 150})
+    days = [datetime(2026, 3, 1, 12), datetime(2026, 3, 15, 12), datetime(2026, 4, 1, 12)]
+    with engine.begin() as conn:
+        stamps = conn.execute(text(
+            "SELECT changed_at FROM product_prices WHERE product_id = :id ORDER BY changed_at"
+        ), {"id": product_id}).scalars().all()
+        assert len(stamps) == 3
+        for old, new in zip(stamps, days):
+            conn.execute(text(
+                "UPDATE product_prices SET changed_at = :new WHERE product_id = :id AND changed_at = :old"
+            ), {"id": product_id, "old": old, "new": new})
+    return product_id
+
+
+def prices(client, headers, product_id, **params):
+    r = client.get(f"/products/{product_id}/prices", headers=headers, params=params)
+    assert r.status_code == 200, r.text
+    return [p["price"] for p in r.json()]
+
+
+def test_history_newest_first(client, engine, owner, product):
+    with record_queries(engine) as log:
+        assert prices(client, owner, product) == [150, 120, 100]
+    assert log.count == 2, log.report()
+    assert prices(client, owner, product, limit=1) == [150]
+
+
+def test_date_range(client, owner, product):
+    # границы включительно, date_to — день целиком
+    assert prices(client, owner, product, date_from="2026-03-15") == [150, 120]
+    assert prices(client, owner, product, date_to="2026-03-15") == [120, 100]
+    assert prices(client, owner, product, date_from="2026-03-02", date_to="2026-03-31") == [120]
+    assert prices(client, owner, product, date_from="2026-05-01") == []
+
+
+def test_bad_date_and_foreign_product(client, owner, owner_factory, product):
+    r = client.get(f"/products/{product}/prices", headers=owner, params={"date_from": "15.03.2026"})
+    assert r.status_code == 400
+    r = client.get(f"/products/{product}/prices", headers=owner_factory())
+    assert r.status_code == 404
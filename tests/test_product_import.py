@@ -0,0 +1,52 @@
+# tests/test_product_import.py — импорт номенклатуры CSV/XLSX
+import io
+
+import pytest
+
+CSV = "name;price\nСахар;500\nСоль;100\nСоль;120\n;5\n".encode()
+
+
+def test_import_csv(client, engine, owner):
+    r = client.post("/products/import", headers=owner, content=CSV)
+    assert r.status_code == 200, r.text
+    report = r.json()
+    assert (report["received"], report["loaded"], report["inserted"], report["duplicates"], report["rejected"]) == (4, 3, 2, 1, 1)
+    prices = {p["name"]: p["price"] for p in client.get("/products/", headers=owner).json()}
+    assert prices == {"Сахар": 500, "Соль": 120}
+
+
+def test_import_xlsx(client, engine, owner):
+    openpyxl = pytest.importorskip("openpyxl")
+    wb = openpyxl.Workbook()
+    wb.active.append(["Название", "Цена"])
+    wb.active.append(["Мука", 350])
+    buf = io.BytesIO()
+    wb.save(buf)
+    r = client.post("/products/import", headers=owner, content=buf.getvalue())
+    assert r.status_code == 200, r.text
+    assert r.json()["inserted"] == 1
+
+
+def test_import_too_large(client, engine, owner, monkeypatch):
+    import product_io
+    monkeypatch.setattr(product_io, "MAX_BYTES", 10)
+    r = client.post("/products/import", headers=owner, content=CSV)
+    assert r.status_code == 413
+
+
+def test_upload_holds_no_connection(client, engine, owner, monkeypatch):
+    # пока принимается тело, ни сессия актора, ни импорт не держат соединений пула
+    import product_io
+    real_import = product_io.import_products
+    checked_out = []
+
+    def spy(engine_, owner_id, next_chunk, fmt=None):
+        def counted_chunk():
+            checked_out.append(engine.pool.checkedout())
+            return next_chunk()
+        return real_import(engine_, owner_id, counted_chunk, fmt)
+
+    monkeypatch.setattr(product_io, "import_products", spy)
+    r = client.post("/products/import", headers=owner, content=CSV)
+    assert r.status_code == 200, r.text
+    assert checked_out and set(checked_out) == {0}
@@ -0,0 +1,74 @@
+# tests/test_products.py — номенклатура из позиций накладных
+from sqlalchemy import text
+
+
+def item_products(engine, invoice_id):
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text(
+            "SELECT product_id FROM items WHERE invoice_id = :id ORDER BY id"
+        ), {"id": invoice_id})]
+
+
+def test_name_variants_share_product(client, engine, owner, create_invoice):
+    first = create_invoice(owner, items=[{"name": "Молоко Домик", "quantity": 1, "price": 300}])
+    second = create_invoice(owner, items=[
+        {"name": "  МОЛОКО   домик ", "quantity": 1, "price": 320},
+        {"name": "Хлеб", "quantity": 1, "price": 150},
+    ])
+    third = create_invoice(owner, items=[{"name": "молоко\tдомик", "quantity": 2, "price": 320}])
+
+    [milk] = item_products(engine, first["invoice_id"])
+    assert milk is not None
+    assert item_products(engine, second["invoice_id"])[0] == milk
+    assert item_products(engine, third["invoice_id"]) == [milk]
+
+    # конфликт по ключу — обновление существующего товара: название прежнее, цена новая
+    products = {p["name"]: p["price"] for p in client.get("/products/", headers=owner).json()}
+    assert products == {"Молоко Домик": 320, "Хлеб": 150}
+
+
+def test_product_id_where_sql_key_differs(client, engine, owner, create_invoice):
+    # «İ»: Python lower() даёт i + точку сверху, Postgres — просто i;
+    # позиция всё равно получает id товара
+    invoice = create_invoice(owner, items=[{"name": "İzmir инжир", "quantity": 1, "price": 900}])
+    [product_id] = item_products(engine, invoice["invoice_id"])
+    assert product_id is not None
+    again = create_invoice(owner, items=[{"name": "İzmir инжир", "quantity": 1, "price": 950}])
+    assert item_products(engine, again["invoice_id"]) == [product_id]
+
+
+def test_suggest_order(client, engine, owner, create_invoice):
+    from datetime import datetime
+
+    from querybudget import record_queries
+    from routes.products import sale_weight
+
+    client.post("/products/", headers=owner, json={"name": "Сыр новый", "price": 100})  # не продавался
+    old = client.post("/products/", headers=owner, json={"name": "Сыр старый", "price": 100}).json()["id"]
+    for _ in range(2):
+        create_invoice(owner, items=[{"name": "Сыр ходовой", "quantity": 1, "price": 100}])
+    create_invoice(owner, items=[{"name": "Сыр редкий", "quantity": 5, "price": 100}])
+    create_invoice(owner, items=[{"name": "Хлеб", "quantity": 1, "price": 100}])
+    # единственная продажа — до эпохи популярности: вес отрицательный, но это продажа
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE products SET sale_count = 1, popularity = :w WHERE id = :id"),
+                     {"w": sale_weight(datetime(2024, 6, 1)), "id": old})
+
+    with record_queries(engine) as log:
+        r = client.get("/products/suggest", headers=owner, params={"q": "  сыР"})
+    assert r.status_code == 200
+    assert log.count == 2, log.report()
+    assert [p["name"] for p in r.json()] == ["Сыр ходовой", "Сыр редкий", "Сыр старый", "Сыр новый"]
+
+    r = client.get("/products/suggest", headers=owner, params={"q": "сыр х", "limit": 1})
+    assert [p["name"] for p in r.json()] == ["Сыр ходовой"]
+
+
+def test_sale_count_counts_invoices(client, engine, owner, create_invoice):
+    create_invoice(owner, items=[{"name": "Соль", "quantity": 5, "price": 100}])
+    invoice = create_invoice(owner, items=[{"name": "Соль", "quantity": 3, "price": 100}])
+    [product_id] = item_products(engine, invoice["invoice_id"])
+    with engine.connect() as conn:
+        sale_count = conn.execute(text("SELECT sale_count FROM products WHERE id = :id"), {"id": product_id}).scalar()
+    # продажа — накладная, а не штука
+    assert sale_count == 2
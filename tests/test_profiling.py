@@ -0,0 +1,33 @@
+# tests/test_profiling.py — отчёт сэмплера во время записи
+import threading
+
+from profiling import Sampler
+
+
+def test_report_while_sampling():
+    stop = threading.Event()
+
+    def work(depth=0):
+        # разная глубина — новые стеки, счётчик растёт во время чтения
+        if depth < 20:
+            return work(depth + 1) if not stop.is_set() else None
+        while not stop.is_set():
+            pass
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    sampler = Sampler()
+    try:
+        assert sampler.start(1, interval=0.0005)
+        reports = 0
+        while sampler.running:
+            summary = sampler.summary()
+            sampler.collapsed()
+            reports += 1
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+    assert reports > 1
+    assert summary["sample_rounds"] > 0
@@ -0,0 +1,18 @@
+# tests/test_slowlog.py — кэш планов медленных запросов
+import slowlog
+
+
+def test_plan_cache_is_bounded_lru(monkeypatch):
+    monkeypatch.setattr(slowlog, "_plans", slowlog.OrderedDict())
+    monkeypatch.setattr(slowlog, "PLAN_CACHE_SIZE", 3)
+    for i in range(3):
+        slowlog._remember_plan(f"SELECT {i}", (0.0, None, None))
+    assert slowlog._cached_plan("SELECT 0") is not None  # освежили — вытеснится следующий
+
+    slowlog._remember_plan("SELECT 3", (0.0, None, None))
+    assert list(slowlog._plans) == ["SELECT 2", "SELECT 0", "SELECT 3"]
+    assert slowlog._cached_plan("SELECT 1") is None
+
+    for i in range(100):
+        slowlog._remember_plan(f"SELECT {i} FROM t", (0.0, None, None))
+    assert len(slowlog._plans) == 3
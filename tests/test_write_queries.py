@@ -0,0 +1,117 @@
+# tests/test_write_queries.py — точное число SQL у эндпоинтов записи
+# (актор считается: один SELECT на запрос с токеном)
+import uuid
+
+import pytest
+
+from querybudget import record_queries
+from tests.conftest import new_phone
+
+
+@pytest.fixture
+def run(client, engine):
+    """run(метод, путь, **kwargs) → (ответ, журнал запросов)."""
+    def call(method, path, **kwargs):
+        with record_queries(engine, f"{method} {path}") as log:
+            r = client.request(method, path, **kwargs)
+        return r, log
+    return call
+
+
+@pytest.fixture
+def employee(client, owner):
+    r = client.post("/employees/", headers=owner, json={"name": "Продавец", "phone": new_phone("+7702"), "password": "pw"})
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+def test_register(run):
+    r, log = run("POST", "/register/", json={
+        "name": "Тест", "phone": new_phone(), "email": f"{uuid.uuid4().hex[:12]}@example.com",
+        "password": "pw", "terms_accepted_at": "2025-01-01T00:00:00",
+    })
+    assert r.status_code == 200, r.text
+    # проверка дубля, пользователь, подписка — один commit
+    assert log.count == 3, log.report()
+
+
+@pytest.mark.parametrize("method, path, body, expected", [
+    # UPDATE ... WHERE id AND owner RETURNING — без SELECT до и после
+    ("PUT", "/employees/{id}/phone", lambda: {"phone": new_phone("+7703")}, 2),
+    # проверка владельца до bcrypt, затем UPDATE
+    ("PUT", "/employees/{id}/password", lambda: {"password": "pw2"}, 3),
+    ("POST", "/employees/{id}/block", lambda: None, 2),
+    ("POST", "/employees/{id}/unblock", lambda: None, 2),
+    ("DELETE", "/employees/{id}", lambda: None, 2),
+])
+def test_employee_writes(run, owner, employee, method, path, body, expected):
+    r, log = run(method, path.format(id=employee), headers=owner, json=body())
+    assert r.status_code in (200, 204), r.text
+    assert log.count == expected, log.report()
+
+
+def test_employee_writes_not_found(run, owner):
+    # чужой или несуществующий сотрудник — тот же запрос, 0 строк, без хэширования
+    for method, path, body in [("PUT", "/employees/0/phone", {"phone": new_phone("+7703")}),
+                               ("PUT", "/employees/0/password", {"password": "pw2"}),
+                               ("POST", "/employees/0/block", None),
+                               ("DELETE", "/employees/0", None)]:
+        r, log = run(method, path, headers=owner, json=body)
+        assert r.status_code == 404, r.text
+        assert log.count == 2, log.report()
+
+
+def test_create_employee(run, owner):
+    r, log = run("POST", "/employees/", headers=owner,
+                 json={"name": "Продавец", "phone": new_phone("+7702"), "password": "pw"})
+    assert r.status_code == 201, r.text
+    assert log.count == 3, log.report()
+
+
+def test_product_create_and_update(run, owner):
+    r, log = run("POST", "/products/", headers=owner, json={"name": "Сахар", "price": 500})
+    assert r.status_code == 200, r.text
+    # актор, версия номенклатуры, товар, история цены
+    assert log.count == 4, log.report()
+    r, log = run("PUT", f"/products/{r.json()['id']}", headers=owner, json={"name": "Сахар песок", "price": 550})
+    assert r.status_code == 200, r.text
+    assert log.count == 4, log.report()
+
+
+@pytest.mark.parametrize("method, path, body", [
+    ("PUT", "/me", {"company": "ТОО Тест"}),
+    ("POST", "/feedback/", {"message": "Спасибо"}),
+])
+def test_profile_writes(run, owner, method, path, body):
+    r, log = run(method, path, headers=owner, json=body)
+    assert r.status_code == 200, r.text
+    assert log.count == 2, log.report()
+
+
+def test_create_invoice(run, owner):
+    body = {"client": "Покупатель", "phone": new_phone("+7704"), "paid_amount": 100,
+            "items": [{"name": "Молоко", "quantity": 2, "price": 300},
+                      {"name": "Хлеб", "quantity": 1, "price": 150}]}
+    r, log = run("POST", "/invoices/", headers=owner, json=body)
+    assert r.status_code == 200, r.text
+    # актор, клиент + вставка, номер, накладная, оплата, баланс,
+    # версия номенклатуры, upsert товаров с историей, позиции
+    assert log.count == 10, log.report()
+
+    # тот же клиент, те же цены, без оплаты: ни вставки клиента, ни истории
+    r, log = run("POST", "/invoices/", headers=owner, json={**body, "paid_amount": 0})
+    assert r.status_code == 200, r.text
+    assert log.count == 8, log.report()
+
+
+def test_create_invoice_has_no_refresh(run, owner):
+    r, log = run("POST", "/invoices/", headers=owner, json={
+        "client": "Покупатель", "phone": new_phone("+7704"), "paid_amount": 0,
+        "items": [{"name": "Молоко", "quantity": 1, "price": 300}],
+    })
+    assert r.status_code == 200, r.text
+    inserted = next(i for i, sql in enumerate(log.statements) if sql.startswith("INSERT INTO invoices"))
+    # id накладной — из INSERT ... RETURNING, после него накладную не перечитываем
+    assert not [sql for sql in log.statements[inserted:] if sql.startswith("SELECT") and "FROM invoices" in sql], log.report()
+    # последний запрос — позиции; после commit ничего не выполняется
+    assert log.statements[-1].startswith("INSERT INTO items"), log.report()
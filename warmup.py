@@ -0,0 +1,188 @@
+# warmup.py
+#
+# Прогрев после старта: первые запросы после деплоя не должны платить за пустой
+# пул, первую компиляцию SQL в SQLAlchemy, инициализацию bcrypt и т.п.
+# Запускается в фоне из lifespan; /ready отвечает 503, пока прогрев не закончен.
+#
+#   WARMUP=1                  включить прогрев (0 — сразу ready)
+#   WARMUP_CONNECTIONS=5      сколько соединений открыть заранее (не больше размера пула)
+#   WARMUP_TENANTS=20         сколько недавно активных арендаторов прогреть
+#   WARMUP_BCRYPT=1           инициализировать bcrypt (один хэш — ~0.3 с CPU)
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+from sqlalchemy import func
+
+from database import SessionLocal
+from models import Invoice
+
+ENABLED = os.getenv("WARMUP", "1") == "1"
+CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "5"))
+TENANTS = int(os.getenv("WARMUP_TENANTS", "20"))
+BCRYPT = os.getenv("WARMUP_BCRYPT", "1") == "1"
+
+logger = logging.getLogger("warmup")
+
+STATE = {"ready": not ENABLED, "started": None, "finished": None, "steps": {}}
+
+# прогрев данных арендатора: fn(db, user_id); кэши регистрируют сюда свои
+# (номенклатура — catalog.py)
+PRIMERS = []
+
+
+def register_primer(fn):
+    PRIMERS.append(fn)
+    return fn
+
+
+def is_ready() -> bool:
+    return STATE["ready"]
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Шаги
+# ───────────────────────────────────────────────────────────────────────────────
+def _pool(engine):
+    """Открывает N соединений одновременно — все остаются в пуле."""
+    n = CONNECTIONS
+    size = getattr(engine.pool, "size", None)
+    if callable(size):
+        n = min(n, size())
+    conns = []
+    try:
+        for _ in range(n):
+            conn = engine.connect()
+            conns.append(conn)
+            conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in conns:
+            conn.close()
+    return n
+
+
+def _fake_actors():
+    user = SimpleNamespace(id=-1, name="warmup", company=None, phone="", email="",
+                           terms_accepted_at=None, catalog_version=0)
+    emp = SimpleNamespace(id=-1, owner_id=-1, name="warmup", phone="", is_blocked=False)
+    return (
+        {"role": "user", "user": user, "employee": None},
+        {"role": "employee", "user": None, "employee": emp},
+    )
+
+
+def _queries():
+    """Горячие запросы через настоящие функции роутов с несуществующими id:
+    SQLAlchemy компилирует и кэширует SQL, в БД ничего не находится."""
+    from routes.auth import get_actor, get_me
+    from routes.clients import list_debtors, search_clients
+    from routes.employees import employees_stats, list_employees
+    from routes.invoice import _list_invoices, generate_invoice_number
+    from routes.products import list_products
+    from jose import jwt
+    from routes.auth import ALGORITHM, SECRET_KEY
+
+    owner, employee = _fake_actors()
+    db = SessionLocal()
+    try:
+        for sub in ("-1", "emp:-1"):
+            try:
+                get_actor(token=jwt.encode({"sub": sub}, SECRET_KEY, algorithm=ALGORITHM), db=db)
+            except HTTPException:
+                pass
+        for actor in (owner, employee):
+            get_me(actor=actor, db=db)
+            _list_invoices(db, actor, None)
+            list_products(q=None, db=db, actor=actor, if_none_match=None)
+            list_products(q="warmup", db=db, actor=actor, if_none_match=None)
+            search_clients(q="warmup", limit=10, db=db, actor=actor)
+            search_clients(q="8701", limit=10, db=db, actor=actor)
+            list_debtors(limit=20, offset=0, db=db, actor=actor)
+        _list_invoices(db, owner, -1)
+        generate_invoice_number(db, -1)
+        list_employees(db=db, current_user=owner["user"])
+        employees_stats(db=db, current_user=owner["user"], date_from=None, date_to=None)
+    finally:
+        db.rollback()
+        db.close()
+
+
+def _models():
+    """Первая валидация горячих моделей и сериализация ответа."""
+    from responses import FastJSONResponse
+    from routes.auth import LoginRequest, RegisterRequest
+    from routes.invoice import InvoiceCreate
+    from routes.products import ProductIn
+
+    InvoiceCreate.model_validate({
+        "client": "Прогрев", "phone": "+77000000000", "status": "не оплачен", "paid_amount": 0,
+        "items": [{"name": "Товар", "quantity": 1, "price": 100}],
+    })
+    RegisterRequest.model_validate({
+        "name": "Прогрев", "phone": "+77000000000", "email": "warmup@example.com",
+        "password": "warmup", "terms_accepted_at": "2025-01-01T00:00:00",
+    })
+    LoginRequest.model_validate({"phone": "+77000000000", "password": "warmup"})
+    ProductIn.model_validate({"name": "Товар", "price": 100})
+    FastJSONResponse({"warmup": [1, "строка", None]})
+
+
+def _bcrypt():
+    from routes.auth import get_pwd_context
+    get_pwd_context().hash("warmup")
+
+
+def recent_tenants(db, limit: int):
+    since = datetime.utcnow() - timedelta(days=7)
+    rows = (
+        db.query(Invoice.user_id)
+        .filter(Invoice.created_at >= since)
+        .group_by(Invoice.user_id)
+        .order_by(func.max(Invoice.created_at).desc())
+        .limit(limit)
+        .all()
+    )
+    return [r[0] for r in rows]
+
+
+def _tenants():
+    db = SessionLocal()
+    try:
+        ids = recent_tenants(db, TENANTS) if TENANTS > 0 else []
+        for user_id in ids:
+            for primer in PRIMERS:
+                primer(db, user_id)
+            db.rollback()
+        return len(ids)
+    finally:
+        db.close()
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Запуск
+# ───────────────────────────────────────────────────────────────────────────────
+def run_warmup(engine):
+    """Прогрев по шагам; ошибка шага не останавливает остальные и не держит
+    сервис в not-ready вечно."""
+    steps = [("pool", lambda: _pool(engine)), ("queries", _queries), ("models", _models)]
+    if BCRYPT:
+        steps.append(("bcrypt", _bcrypt))
+    steps.append(("tenants", _tenants))
+
+    STATE["started"] = time.time()
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            result = step()
+            STATE["steps"][name] = {"ms": round((time.perf_counter() - start) * 1000, 1)}
+            if result is not None:
+                STATE["steps"][name]["count"] = result
+        except Exception as e:
+            logger.warning("warmup step %s failed: %s", name, e)
+            STATE["steps"][name] = {"error": f"{type(e).__name__}: {e}"}
+    STATE["finished"] = time.time()
+    STATE["ready"] = True
+    logger.info("warmup done in %.2f s", STATE["finished"] - STATE["started"])